@@ -12,9 +12,26 @@ import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import numpy as np
-from utils.loaders import load_all_data
-from utils.indicators import calculate_correlations
+from utils.loaders import (load_all_data, load_indicator_panel, load_diversity_table,
+                           load_correlation_tables, load_correlation_uncertainty,
+                           load_outlier_tables, load_food_security_table,
+                           load_gender_impact_table, load_bloc_statistics,
+                           load_smoothed_panel, load_ssr_nowcast, load_item_ssr_table,
+                           load_item_rollups, load_trade_matrix_store,
+                           load_supplier_concentration)
+from utils.indicators import (calculate_correlations, lookup_correlation,
+                              calculate_sustainability_panel, find_constant_components,
+                              SUSTAINABILITY_COMPONENTS, NORMALIZATION_MODES)
+from utils.nowcast import SSR_CUTOFF_YEAR
+from utils.items import item_dependency, expand_item_group, country_item_rows
+from utils.shock import simulate_export_ban, summarize_shock
 from utils.plotting import create_color_palette, plot_choropleth_map
+from utils.profiling import (profile_section, profile_chart, track_rows,
+                             get_latest_records, summarize_records, PANEL_STATE_KEY)
+from utils.export import build_download_file, export_file_name, EXPORT_FORMATS
+from utils.diagnostics import (frame_memory_report, dataset_memory_summary,
+                               cache_memory_report, trace_top_allocations, format_bytes)
+from utils.prerender import collect_figure
 
 # ==========================================
 # CONFIGURACIÓ PRINCIPAL
@@ -107,6 +124,14 @@ def format_number(value, decimals=2, suffix=""):
         return "N/D"
     return f"{value:.{decimals}f}{suffix}"
 
+def show_chart(fig):
+    """Mostra un gràfic Plotly i en registra el cost si el perfilat és actiu"""
+    # Durant la generació estàtica (scripts/prerender.py) només es recull la figura
+    if collect_figure(fig):
+        return
+    with profile_chart(fig):
+        st.plotly_chart(fig, use_container_width=True)
+
 def create_metric_card(title, value, help_text="", delta=None):
     """Crea una targeta de mètrica personalitzada"""
     with st.container():
@@ -125,6 +150,31 @@ def create_metric_card(title, value, help_text="", delta=None):
 # SECCIONS DEL DASHBOARD
 # ==========================================
 
+OUTLIER_METHODS = {
+    'IQR': ('IQROutlier', 'fora de Q1 - 1.5·IQR / Q3 + 1.5·IQR'),
+    'MAD': ('MADOutlier', 'z-score robust |z| > 3.5'),
+}
+
+def add_outlier_overlay(fig, outliers, value_col, selected_year, selected_regions, method):
+    """Afegeix a un histograma els valors atípics del seu any i bloc; retorna quants n'hi ha"""
+    flag_col, _ = OUTLIER_METHODS[method]
+    flagged = outliers[(outliers['Year'] == selected_year) & outliers[flag_col]]
+    if selected_regions != ["Tots"]:
+        flagged = flagged[flagged['BlocRegional'].isin(selected_regions)]
+    if flagged.empty:
+        return 0
+    
+    fig.add_trace(go.Scatter(
+        x=flagged[value_col],
+        y=np.zeros(len(flagged)),
+        mode='markers',
+        marker=dict(symbol='x', size=10, color='#dc2626'),
+        name=f'Atípics ({method} per bloc)',
+        customdata=flagged[['AreaName', 'BlocRegional']].to_numpy(),
+        hovertemplate='%{customdata[0]} (%{customdata[1]}): %{x:.3f}<extra></extra>'
+    ))
+    return len(flagged)
+
 def render_summary_section(data_dict, selected_year, selected_regions):
     """SECCIÓ 1: Resum i Indicadors Principals"""
     st.markdown('<h2 class="section-header" id="resum">📊 Indicadors Principals</h2>', 
@@ -152,16 +202,27 @@ def render_summary_section(data_dict, selected_year, selected_regions):
     if selected_regions != ["Tots"]:
         ssr_year = ssr_year[ssr_year['BlocRegional'].isin(selected_regions)]
         ff_year = ff_year[ff_year['BlocRegional'].isin(selected_regions)]
+    track_rows(ssr_year, ff_year)
+    
+    # Estadístiques dels blocs seleccionats combinant les sumes precalculades per any i bloc
+    bloc_stats = load_bloc_statistics()
+    ssr_summary = bloc_stats['ssr'].combine(selected_regions)
+    ff_summary = bloc_stats['footprint'].combine(selected_regions)
+    
+    def year_stat(summary, column):
+        return summary[column].get(selected_year, np.nan)
     
     # Mètriques principals
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        avg_ssr = ssr_year['SelfSufficiency'].mean()
+        avg_ssr = year_stat(ssr_summary, 'SelfSufficiency_mean')
         create_metric_card(
             "Autosuficiència Mitjana",
             format_number(avg_ssr, 5),
-            "Ràtio mitjana d'autosuficiència alimentària (1.0 = autosuficient)"
+            "Ràtio mitjana d'autosuficiència alimentària (1.0 = autosuficient). "
+            f"Ponderada per producció: {format_number(year_stat(ssr_summary, 'SelfSufficiency_weighted_mean'), 5)} · "
+            f"desviació: {format_number(year_stat(ssr_summary, 'SelfSufficiency_std'), 5)}"
         )
     
     with col2:
@@ -173,16 +234,17 @@ def render_summary_section(data_dict, selected_year, selected_regions):
         )
     
     with col3:
-        avg_ff = ff_year['FoodFootprintCO2'].mean()
+        avg_ff = year_stat(ff_summary, 'FoodFootprintCO2_mean')
         create_metric_card(
             "Petjada CO₂ Mitjana",
             format_number(avg_ff, 5),  
-            "Emissions mitjanes de CO₂ per unitat de producció alimentària"
+            "Emissions mitjanes de CO₂ per unitat de producció alimentària. "
+            f"Ponderada per producció: {format_number(year_stat(ff_summary, 'FoodFootprintCO2_weighted_mean'), 5)}"
         )
     
     with col4:
         if 'WomenAgriShare' in ssr_year.columns:
-            avg_women = ssr_year['WomenAgriShare'].mean()
+            avg_women = year_stat(ssr_summary, 'WomenAgriShare_mean')
             create_metric_card(
                 "% Dones en Agricultura",
                 format_number(avg_women, 2, "%"),  # Mantenim 1 decimal per percentatges
@@ -192,6 +254,10 @@ def render_summary_section(data_dict, selected_year, selected_regions):
     # Distribucions dels indicadors
     st.subheader("Distribució dels Indicadors")
     
+    outlier_method = st.radio("Valors atípics per any i bloc", ['Cap'] + list(OUTLIER_METHODS),
+                              horizontal=True, key='outlier_method')
+    outlier_tables = load_outlier_tables() if outlier_method != 'Cap' else {}
+    
     col1, col2 = st.columns(2)
     
     with col1:
@@ -205,7 +271,14 @@ def render_summary_section(data_dict, selected_year, selected_regions):
                 color_discrete_sequence=['#2E8B57']
             )
             fig_ssr_dist.update_layout(height=400)
-            st.plotly_chart(fig_ssr_dist, use_container_width=True)
+            if outlier_tables:
+                n_ssr_outliers = add_outlier_overlay(fig_ssr_dist, outlier_tables['SelfSufficiency'],
+                                                     'SelfSufficiency', selected_year,
+                                                     selected_regions, outlier_method)
+            show_chart(fig_ssr_dist)
+            if outlier_tables:
+                st.caption(f"{n_ssr_outliers} països atípics dins del seu bloc "
+                           f"({OUTLIER_METHODS[outlier_method][1]})")
     
     with col2:
         if not ff_year.empty:
@@ -218,7 +291,94 @@ def render_summary_section(data_dict, selected_year, selected_regions):
                 color_discrete_sequence=['#CD853F']
             )
             fig_ff_dist.update_layout(height=400)
-            st.plotly_chart(fig_ff_dist, use_container_width=True)
+            if outlier_tables:
+                n_ff_outliers = add_outlier_overlay(fig_ff_dist, outlier_tables['FoodFootprintCO2'],
+                                                    'FoodFootprintCO2', selected_year,
+                                                    selected_regions, outlier_method)
+            show_chart(fig_ff_dist)
+            if outlier_tables:
+                st.caption(f"{n_ff_outliers} països atípics dins del seu bloc "
+                           f"({OUTLIER_METHODS[outlier_method][1]})")
+    
+    # Rànquing de l'índex de sostenibilitat (pesos i normalització ajustables)
+    st.subheader("🏅 Rànquing de Sostenibilitat")
+    
+    component_names = {
+        'SelfSufficiency': 'Autosuficiència',
+        'FoodFootprintCO2': 'Petjada CO₂',
+        'WomenAgriShare': '% Dones en Agricultura',
+    }
+    component_labels = {
+        'SelfSufficiency': 'Pes Autosuficiència',
+        'FoodFootprintCO2': 'Pes Petjada CO₂ (menys és millor)',
+        'WomenAgriShare': 'Pes % Dones en Agricultura',
+    }
+    normalization_labels = {'minmax': 'Min-max (0-100)', 'rank': 'Percentil del rang (0-100)',
+                            'zscore': 'Z-score'}
+    
+    weight_cols = st.columns(len(SUSTAINABILITY_COMPONENTS) + 1)
+    weights = {}
+    for col, (name, spec) in zip(weight_cols, SUSTAINABILITY_COMPONENTS.items()):
+        with col:
+            weights[name] = st.slider(component_labels[name], 0.0, 1.0, spec['weight'], 0.05,
+                                      key=f'sustainability_weight_{name}')
+    with weight_cols[-1]:
+        normalization = st.selectbox("Normalització", NORMALIZATION_MODES,
+                                     format_func=normalization_labels.get,
+                                     key='sustainability_normalization')
+    
+    panel = load_indicator_panel()
+    index_table = calculate_sustainability_panel(panel, weights, normalization)
+    constant = find_constant_components(panel, weights)
+    dropped = ([component_names[name] for name in constant.columns if constant.at[selected_year, name]]
+               if selected_year in constant.index else [])
+    ranking = pd.DataFrame({
+        'AreaName': index_table.index,
+        'BlocRegional': panel.blocs,
+        'SustainabilityIndex': index_table[selected_year].to_numpy() if selected_year in index_table.columns else np.nan,
+    })
+    if selected_regions != ["Tots"]:
+        ranking = ranking[ranking['BlocRegional'].isin(selected_regions)]
+    ranking = ranking.dropna(subset=['SustainabilityIndex'])
+    
+    if dropped:
+        st.caption(f"⚠️ L'any {selected_year} no tenen variància entre països: {', '.join(dropped)}. "
+                   "Queden fora de l'índex i es reponderen els altres components.")
+    
+    if ranking.empty:
+        if dropped and len(dropped) == len(constant.columns):
+            st.info(f"Cap component de l'índex té variància entre països l'any {selected_year}")
+        else:
+            st.info(f"No hi ha països amb tots els components de l'índex l'any {selected_year} "
+                    "(o tots els pesos són 0)")
+    else:
+        ranking = ranking.sort_values('SustainabilityIndex', ascending=False)
+        ranking.insert(0, 'Posició', np.arange(1, len(ranking) + 1))
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            top_ranking = ranking.head(15)
+            fig_ranking = px.bar(
+                top_ranking,
+                x='SustainabilityIndex',
+                y='AreaName',
+                color='BlocRegional',
+                orientation='h',
+                title=f'Top 15 Països per Índex de Sostenibilitat ({selected_year})',
+                labels={'SustainabilityIndex': 'Índex de Sostenibilitat', 'AreaName': 'País',
+                        'BlocRegional': 'Bloc Regional'}
+            )
+            fig_ranking.update_layout(height=500, yaxis=dict(categoryorder='total ascending'))
+            show_chart(fig_ranking)
+        
+        with col2:
+            st.dataframe(
+                ranking.rename(columns={'AreaName': 'País', 'BlocRegional': 'Bloc Regional',
+                                        'SustainabilityIndex': 'Índex'}).round({'Índex': 2}),
+                hide_index=True,
+                height=500
+            )
 
 def render_map_section(data_dict, selected_year, selected_regions):
     """SECCIÓ 2: Visualització Geogràfica"""
@@ -238,6 +398,7 @@ def render_map_section(data_dict, selected_year, selected_regions):
     
     # Preparar dades per al mapa
     ssr_map_data = data_dict['ssr'][data_dict['ssr']['Year'] == selected_year]
+    track_rows(ssr_map_data)
     
     if not ssr_map_data.empty:
         ssr_aggregated = ssr_map_data.groupby('AreaName')['SelfSufficiency'].mean().reset_index()
@@ -262,10 +423,69 @@ def render_map_section(data_dict, selected_year, selected_regions):
             )
         )
         
-        st.plotly_chart(fig_map, use_container_width=True)
+        show_chart(fig_map)
+        
+        # Dependència de proveïdors (matrius bilaterals de comerç)
+        concentration, concentration_summary = load_supplier_concentration()
+        if not concentration_summary.empty and selected_year in set(concentration_summary['Year']):
+            concentration_metrics = {
+                'Nombre efectiu de proveïdors': ('EffectiveSuppliers', 'RdYlGn'),
+                'Quota del principal proveïdor (%)': ('TopSupplierShare', 'RdYlGn_r'),
+                'HHI de proveïdors': ('HHI', 'RdYlGn_r'),
+            }
+            area_names = data_dict['area_map'].set_index('AreaCode')['AreaName']
+            item_names = data_dict['item_map'].set_index('ItemCode')['ItemName']
+            year_items = sorted(concentration.loc[concentration['Year'] == selected_year, 'ItemCode'].unique())
+            
+            col_metric, col_item = st.columns(2)
+            with col_metric:
+                concentration_metric = st.radio("Dependència de proveïdors", list(concentration_metrics),
+                                                horizontal=True, key='concentration_metric')
+            with col_item:
+                concentration_item = st.selectbox(
+                    "Producte", [None] + [int(code) for code in year_items], key='concentration_item',
+                    format_func=lambda code: 'Tots els productes' if code is None else item_names.get(code, str(code)))
+            
+            metric_col, metric_scale = concentration_metrics[concentration_metric]
+            if concentration_item is None:
+                concentration_year = concentration_summary[concentration_summary['Year'] == selected_year]
+                hover_cols = ['ImportQuantity', 'NItems']
+            else:
+                concentration_year = concentration[(concentration['Year'] == selected_year)
+                                                   & (concentration['ItemCode'] == concentration_item)]
+                concentration_year = concentration_year.assign(
+                    TopSupplierName=concentration_year['TopSupplier'].map(area_names))
+                hover_cols = ['ImportQuantity', 'NSuppliers', 'TopSupplierName']
+            concentration_year = concentration_year.assign(AreaName=concentration_year['AreaCode'].map(area_names))
+            track_rows(concentration_year)
+            
+            fig_concentration = px.choropleth(
+                concentration_year.dropna(subset=['AreaName']),
+                locations='AreaName',
+                color=metric_col,
+                locationmode='country names',
+                hover_data=hover_cols,
+                title=f'{concentration_metric} per País ({selected_year})',
+                color_continuous_scale=metric_scale,
+                labels={metric_col: concentration_metric, 'ImportQuantity': 'Importacions (t)',
+                        'NItems': 'Productes', 'NSuppliers': 'Proveïdors',
+                        'TopSupplierName': 'Principal proveïdor'}
+            )
+            fig_concentration.update_layout(
+                height=600,
+                geo=dict(
+                    showframe=False,
+                    showcoastlines=True,
+                    projection_type='equirectangular'
+                )
+            )
+            show_chart(fig_concentration)
+            st.caption("Concentració de les importacions de cada país entre els seus proveïdors. Amb tots els "
+                       "productes, cada mètrica és la mitjana dels productes ponderada per la quantitat importada.")
         
         # Mapa de petjada de carboni
         ff_map_data = data_dict['footprint'][data_dict['footprint']['Year'] == selected_year]
+        track_rows(ff_map_data)
         
         if not ff_map_data.empty:
             ff_aggregated = ff_map_data.groupby('AreaName')['FoodFootprintCO2'].mean().reset_index()
@@ -289,7 +509,7 @@ def render_map_section(data_dict, selected_year, selected_regions):
                 )
             )
             
-            st.plotly_chart(fig_map_ff, use_container_width=True)
+            show_chart(fig_map_ff)
 
 def render_evolution_section(data_dict, selected_regions):
     """SECCIÓ 3: Evolució Temporal"""
@@ -307,24 +527,61 @@ def render_evolution_section(data_dict, selected_regions):
     </div>
     """, unsafe_allow_html=True)
     
-    # Evolució de l'autosuficiència per blocs regionals
-    ssr_data = data_dict['ssr'].copy()
+    # Panell dens país × any: les mitjanes per bloc i any són reduccions de matriu
+    panel = load_indicator_panel()
+    region_mask = panel.bloc_mask(selected_regions)
+    
+    # Suavitzat opcional de la sèrie de cada país abans d'agregar per bloc
+    smoothing_labels = {'Cap': None, 'Mitjana mòbil': 'mean', 'Mediana mòbil': 'median',
+                        'Exponencial': 'ewm'}
+    col_method, col_window = st.columns([3, 2])
+    with col_method:
+        smoothing = st.radio("Suavitzat de les sèries", list(smoothing_labels), horizontal=True,
+                             key='smoothing_method')
+    with col_window:
+        smoothing_window = st.slider("Finestra (anys)", 3, 11, 5, 2, key='smoothing_window',
+                                     disabled=smoothing_labels[smoothing] is None)
+    
+    if smoothing_labels[smoothing] is not None:
+        trend_panel = load_smoothed_panel(panel, panel.version, smoothing_labels[smoothing],
+                                          smoothing_window)
+        smoothing_suffix = f" ({smoothing.lower()}, {smoothing_window} anys)"
+        st.caption("Cada sèrie de país es suavitza abans de fer la mitjana per bloc. La mitjana i la "
+                   "mediana mòbils estan centrades; l'exponencial només fa servir anys anteriors. "
+                   "Els anys sense dada no s'omplen.")
+    else:
+        trend_panel = panel
+        smoothing_suffix = ""
+    
+    # Previsió opcional de l'SSR posterior a l'últim any amb dades reals
+    nowcast_labels = {'Regressió (petjada i producció)': 'regression',
+                      'Tendència lineal': 'trend', 'Tendència esmorteïda': 'damped'}
+    col_nowcast, col_model = st.columns([2, 3])
+    with col_nowcast:
+        show_nowcast = st.checkbox(f"🔮 Previsió de l'SSR després de {SSR_CUTOFF_YEAR}",
+                                   key='show_nowcast')
+    with col_model:
+        nowcast_model = st.selectbox("Model de previsió", list(nowcast_labels), key='nowcast_model',
+                                     disabled=not show_nowcast)
     
+    # Evolució de l'autosuficiència per blocs regionals
     # Calcular mitjana mundial (sempre amb totes les dades)
-    global_evolution = data_dict['ssr'].groupby('Year')['SelfSufficiency'].mean().reset_index()
-    
-    if selected_regions != ["Tots"]:
-        ssr_data = ssr_data[ssr_data['BlocRegional'].isin(selected_regions)]
-    
-    if not ssr_data.empty:
-        ssr_evolution = ssr_data.groupby(['Year', 'BlocRegional'])['SelfSufficiency'].mean().reset_index()
+    global_evolution = trend_panel.global_reduce('SelfSufficiency').dropna().reset_index()
+    
+    if region_mask.any():
+        ssr_evolution = trend_panel.bloc_frame('SelfSufficiency', regions=selected_regions)
+        if show_nowcast:
+            # Després del tall l'SSR de les dades és 1.0 de farciment: se substitueix per la previsió
+            ssr_evolution = ssr_evolution[ssr_evolution['Year'] <= SSR_CUTOFF_YEAR]
+            global_evolution = global_evolution[global_evolution['Year'] <= SSR_CUTOFF_YEAR]
+        track_rows(ssr_evolution)
         
         fig_evolution = px.line(
             ssr_evolution,
             x='Year',
             y='SelfSufficiency',
             color='BlocRegional',
-            title='Evolució de l\'Autosuficiència per Bloc Regional',
+            title='Evolució de l\'Autosuficiència per Bloc Regional' + smoothing_suffix,
             labels={'SelfSufficiency': 'Autosuficiència', 'Year': 'Any'}
         )
         
@@ -340,6 +597,30 @@ def render_evolution_section(data_dict, selected_regions):
             )
         )
         
+        if show_nowcast:
+            forecast_panel, nowcast_backtest = load_ssr_nowcast(nowcast_labels[nowcast_model])
+            # Les línies discontínues comencen a l'últim any observat per enllaçar amb la sèrie
+            forecast_blocs = forecast_panel.bloc_frame('SelfSufficiency', regions=selected_regions)
+            forecast_blocs = forecast_blocs[forecast_blocs['Year'] >= SSR_CUTOFF_YEAR]
+            bloc_colors = {trace.name: trace.line.color for trace in fig_evolution.data}
+            for bloc, bloc_forecast in forecast_blocs.groupby('BlocRegional'):
+                fig_evolution.add_trace(go.Scatter(
+                    x=bloc_forecast['Year'], y=bloc_forecast['SelfSufficiency'],
+                    mode='lines', name=f'{bloc} (previsió)', legendgroup=bloc, showlegend=False,
+                    line=dict(color=bloc_colors.get(bloc), dash='dash'),
+                    hovertemplate=f'<b>{bloc} (previsió)</b><br>Any: %{{x}}<br>Autosuficiència: %{{y:.3f}}<extra></extra>'
+                ))
+            global_forecast = forecast_panel.global_reduce('SelfSufficiency').dropna().reset_index()
+            global_forecast = global_forecast[global_forecast['Year'] >= SSR_CUTOFF_YEAR]
+            fig_evolution.add_trace(go.Scatter(
+                x=global_forecast['Year'], y=global_forecast['SelfSufficiency'],
+                mode='lines', name='🔮 Previsió Mundial',
+                line=dict(color='black', width=4, dash='dash'),
+                hovertemplate='<b>Previsió Mundial</b><br>Any: %{x}<br>Autosuficiència: %{y:.3f}<extra></extra>'
+            ))
+            fig_evolution.add_vline(x=SSR_CUTOFF_YEAR, line_dash='dot', line_color='gray',
+                                    annotation_text='Previsió', annotation_position='top right')
+        
         fig_evolution.update_layout(
             height=500,
             hovermode='x unified',
@@ -351,25 +632,29 @@ def render_evolution_section(data_dict, selected_regions):
                 x=1
             )
         )
-        st.plotly_chart(fig_evolution, use_container_width=True)
+        show_chart(fig_evolution)
+        
+        if show_nowcast:
+            model_check = nowcast_backtest.set_index('Model').loc[nowcast_labels[nowcast_model]]
+            st.caption(f"Les línies discontínues són previsions, no dades observades: cada país s'ajusta "
+                       f"amb els seus darrers 15 anys reals (fins a {SSR_CUTOFF_YEAR}). Validació amagant "
+                       f"{SSR_CUTOFF_YEAR - 4}-{SSR_CUTOFF_YEAR}: RMSE {model_check['RMSE']:.5f} davant "
+                       f"{model_check['NaiveRMSE']:.5f} de repetir l'últim valor "
+                       f"({int(model_check['Points'])} punts).")
       # Evolució de la petjada de carboni
-    ff_data = data_dict['footprint'].copy()
-    
     # Calcular mitjana mundial de petjada de carboni
-    global_ff_evolution = data_dict['footprint'].groupby('Year')['FoodFootprintCO2'].mean().reset_index()
-    
-    if selected_regions != ["Tots"]:
-        ff_data = ff_data[ff_data['BlocRegional'].isin(selected_regions)]
+    global_ff_evolution = trend_panel.global_reduce('FoodFootprintCO2').dropna().reset_index()
     
-    if not ff_data.empty:
-        ff_evolution = ff_data.groupby(['Year', 'BlocRegional'])['FoodFootprintCO2'].mean().reset_index()
+    if region_mask.any():
+        ff_evolution = trend_panel.bloc_frame('FoodFootprintCO2', regions=selected_regions)
+        track_rows(ff_evolution)
         
         fig_ff_evolution = px.line(
             ff_evolution,
             x='Year',
             y='FoodFootprintCO2',
             color='BlocRegional',
-            title='Evolució de la Petjada de Carboni per Bloc Regional',
+            title='Evolució de la Petjada de Carboni per Bloc Regional' + smoothing_suffix,
             labels={'FoodFootprintCO2': 'Petjada CO₂', 'Year': 'Any'}
         )
         
@@ -395,7 +680,7 @@ def render_evolution_section(data_dict, selected_regions):
                 xanchor="right",
                 x=1
             )        )
-        st.plotly_chart(fig_ff_evolution, use_container_width=True)
+        show_chart(fig_ff_evolution)
     
     # Anàlisi de canvis temporals en l'autosuficiència
     st.subheader("📊 Canvis Temporals en l'Autosuficiència")
@@ -467,22 +752,20 @@ def render_evolution_section(data_dict, selected_regions):
         for country in countries:
             country_to_bloc_map[country] = bloc_name
     
-    # Filtrar dades útils per al canvi temporal
-    ssr_useful = data_dict['ssr'][data_dict['ssr']['SelfSufficiency'] != 1].copy()
-    
-    if not ssr_useful.empty and 'AreaName' in ssr_useful.columns:
-        # Calcular canvi SSR (2000-2013)
-        ssr_2000 = ssr_useful[ssr_useful['Year'] == 2000]
-        ssr_2013 = ssr_useful[ssr_useful['Year'] == 2013]
-        
-        if not ssr_2000.empty and not ssr_2013.empty:
-            change_df = pd.merge(
-                ssr_2000[['AreaCode', 'AreaName', 'SelfSufficiency']],
-                ssr_2013[['AreaCode', 'AreaName', 'SelfSufficiency']], 
-                on=['AreaCode', 'AreaName'], 
-                suffixes=('_2000', '_2013')
-            )
-            change_df['Variació SSR'] = change_df['SelfSufficiency_2013'] - change_df['SelfSufficiency_2000']
+    # Filtrar dades útils per al canvi temporal (els valors exactament 1 no són informatius)
+    if 'SelfSufficiency' in panel.indicators:
+        # Calcular canvi SSR (2000-2013) directament sobre les columnes del panell
+        if 2000 in panel.years and 2013 in panel.years:
+            # El farciment es mira sobre les dades d'origen: a float32 un SSR proper a 1 arrodoneix a 1
+            filler = (panel.filler_mask('SelfSufficiency', 2000)
+                      | panel.filler_mask('SelfSufficiency', 2013))
+            variation = np.where(~filler,
+                                 panel.deltas('SelfSufficiency', 2000, 2013), np.nan)
+            change_df = pd.DataFrame({
+                'AreaCode': panel.area_codes,
+                'AreaName': panel.area_names,
+                'Variació SSR': variation.astype(np.float64)
+            })
             change_df = change_df.dropna(subset=['Variació SSR']).sort_values('Variació SSR', ascending=False)
             
             if len(change_df) >= 20: 
@@ -508,7 +791,7 @@ def render_evolution_section(data_dict, selected_regions):
                     yaxis_visible=False,
                     height=600
                 )
-                st.plotly_chart(fig_top_bottom, use_container_width=True)
+                show_chart(fig_top_bottom)
 
 def create_color_palette_for_products(prod_top_df=None, imports_top_df=None, exports_top_df=None):
     """Crea una paleta de colors consistents per als productes entre diferents gràfics (del notebook)"""
@@ -556,9 +839,15 @@ def render_products_section(data_dict, selected_year):
     """, unsafe_allow_html=True)
     
     # Preparar dades agregades per a tots els gràfics
-    prod_year = data_dict['production'][data_dict['production']['Year'] == selected_year] if 'production' in data_dict else pd.DataFrame()
-    imports_year = data_dict['imports'][data_dict['imports']['Year'] == selected_year] if 'imports' in data_dict else pd.DataFrame()
-    exports_year = data_dict['exports'][data_dict['exports']['Year'] == selected_year] if 'exports' in data_dict else pd.DataFrame()
+    prod_year = data_dict['production'][data_dict['production']['Year'] == selected_year] if 'production' in data_dict and not data_dict['production'].empty else pd.DataFrame()
+    imports_year = data_dict['imports'][data_dict['imports']['Year'] == selected_year] if 'imports' in data_dict and not data_dict['imports'].empty else pd.DataFrame()
+    exports_year = data_dict['exports'][data_dict['exports']['Year'] == selected_year] if 'exports' in data_dict and not data_dict['exports'].empty else pd.DataFrame()
+    # Els agregats regionals (World, continents, UE...) i les files de grup (p. ex. "Cereals -
+    # Excluding Beer") ja sumen països i productes: com a la vista per grups, només països i productes
+    prod_year, imports_year, exports_year = (
+        country_item_rows(df) if not df.empty else df
+        for df in (prod_year, imports_year, exports_year))
+    track_rows(prod_year, imports_year, exports_year)
     
     # Calcular tops per a cada categoria
     prod_top = prod_year.groupby('ItemName')['Production'].sum().sort_values(ascending=False).head(20) if not prod_year.empty else pd.Series()
@@ -593,7 +882,7 @@ def render_products_section(data_dict, selected_year):
                 color_discrete_map=product_color_map
             )
             fig_prod.update_layout(height=500, showlegend=False)
-            st.plotly_chart(fig_prod, use_container_width=True)
+            show_chart(fig_prod)
     
     with col2:
         st.markdown("**Importacions Mundials**")
@@ -611,7 +900,7 @@ def render_products_section(data_dict, selected_year):
                 color_discrete_map=product_color_map
             )
             fig_imports.update_layout(height=500, showlegend=False)
-            st.plotly_chart(fig_imports, use_container_width=True)
+            show_chart(fig_imports)
     
     # 2. TOP PRODUCTES PER EXPORTACIÓ
     if not exports_top.empty:
@@ -630,8 +919,114 @@ def render_products_section(data_dict, selected_year):
         )
         fig_exports.update_xaxes(tickangle=45)
         fig_exports.update_layout(showlegend=False, height=500)
-        st.plotly_chart(fig_exports, use_container_width=True)
-      # 3. ANÀLISI AVANÇADA DE BALANÇ COMERCIAL
+        show_chart(fig_exports)
+    
+    # 3. GRUPS DE PRODUCTES (totals per any i grup precalculats)
+    group_totals, item_totals = load_item_rollups()
+    group_year = group_totals[group_totals['Year'] == selected_year] if not group_totals.empty else pd.DataFrame()
+    track_rows(group_year)
+    
+    if not group_year.empty:
+        st.subheader("🗂️ Productes per Grup")
+        element_labels = {label: value_col for label, value_col in (('Producció', 'Production'),
+                                                                    ('Importacions', 'ImportQuantity'),
+                                                                    ('Exportacions', 'ExportQuantity'))
+                          if value_col in group_year.columns}
+        
+        col_element, col_group = st.columns(2)
+        with col_element:
+            element = st.radio("Magnitud", list(element_labels), horizontal=True,
+                               key='item_group_element')
+        value_col = element_labels[element]
+        ranked_groups = group_year.dropna(subset=[value_col]).sort_values(value_col, ascending=False)
+        group_names = ranked_groups.set_index('GroupCode')['GroupName']
+        with col_group:
+            group_code = st.selectbox("Desplega el grup", list(group_names.index),
+                                      format_func=lambda code: group_names[code], key='item_group')
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            fig_groups = px.bar(
+                ranked_groups.assign(Value=ranked_groups[value_col] / 1000,
+                                     Selected=ranked_groups['GroupCode'] == group_code).sort_values('Value'),
+                x='Value',
+                y='GroupName',
+                orientation='h',
+                color='Selected',
+                color_discrete_map={True: '#2E8B57', False: '#B0C4B1'},
+                hover_data={'NItems': True, 'Selected': False},
+                title=f'{element} per Grup de Productes ({selected_year})',
+                labels={'Value': f'{element} (Milions de Tones)', 'GroupName': 'Grup', 'NItems': 'Productes'}
+            )
+            fig_groups.update_layout(height=600, showlegend=False)
+            show_chart(fig_groups)
+        
+        with col2:
+            # Desplegar el grup és un tram de la taula per producte: no es tornen a llegir les files
+            group_items = expand_item_group(item_totals, selected_year, group_code).dropna(subset=[value_col])
+            fig_group_items = px.bar(
+                group_items.assign(Value=group_items[value_col] / 1000).sort_values('Value'),
+                x='Value',
+                y='ItemName',
+                orientation='h',
+                title=f'{element}: {group_names[group_code]} ({selected_year})',
+                labels={'Value': f'{element} (Milions de Tones)', 'ItemName': 'Producte'},
+                color_discrete_sequence=['#2E8B57']
+            )
+            fig_group_items.update_layout(height=600)
+            show_chart(fig_group_items)
+        
+        st.caption("Els grups segueixen la classificació dels balanços alimentaris de FAOSTAT; els totals de "
+                   "grup són la suma dels seus productes.")
+    
+    # 4. DIVERSITAT DE PRODUCTES PER PAÍS (precalculada per a tots els països i anys)
+    diversity, diversity_source = load_diversity_table()
+    diversity_year = diversity[diversity['Year'] == selected_year] if not diversity.empty else pd.DataFrame()
+    track_rows(diversity_year)
+    
+    if not diversity_year.empty:
+        st.subheader("🌐 Diversitat de Productes per País")
+        source_label = 'la producció' if diversity_source == 'production' else 'les exportacions'
+        st.caption(f"Índexs de Shannon, Simpson i Herfindahl-Hirschman (HHI) calculats sobre {source_label} "
+                   "de cada país. El nombre efectiu de productes és exp(Shannon).")
+        
+        top_diverse = diversity_year.nlargest(15, 'EffectiveItems')
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            fig_diversity = px.bar(
+                top_diverse.sort_values('EffectiveItems'),
+                x='EffectiveItems',
+                y='AreaName',
+                orientation='h',
+                color='HHI',
+                color_continuous_scale='Viridis_r',
+                hover_data={'Shannon': ':.3f', 'Simpson': ':.3f', 'NItems': True},
+                title=f'Països amb Major Diversitat de Productes ({selected_year})',
+                labels={'EffectiveItems': 'Nombre Efectiu de Productes', 'AreaName': 'País',
+                        'NItems': 'Productes', 'HHI': 'HHI'}
+            )
+            fig_diversity.update_layout(height=500)
+            show_chart(fig_diversity)
+        
+        with col2:
+            # Trajectòria dels cinc països més diversificats en tot el període
+            trajectories = diversity[diversity['AreaName'].isin(top_diverse['AreaName'].head(5))]
+            fig_trajectories = px.line(
+                trajectories,
+                x='Year',
+                y='Shannon',
+                color='AreaName',
+                title='Evolució de la Diversitat (Shannon) dels 5 Països més Diversificats',
+                labels={'Shannon': 'Índex de Shannon', 'Year': 'Any', 'AreaName': 'País'}
+            )
+            fig_trajectories.add_vline(x=selected_year, line_dash="dash", line_color="gray", opacity=0.5)
+            fig_trajectories.update_layout(height=500)
+            show_chart(fig_trajectories)
+    
+    # 5. ANÀLISI AVANÇADA DE BALANÇ COMERCIAL
     st.subheader("⚖️ Anàlisi Detallada del Balanç Comercial")
     
     if not imports_year.empty and not exports_year.empty:
@@ -687,7 +1082,7 @@ def render_products_section(data_dict, selected_year):
                     )
                     fig_balance_net.add_vline(x=0, line_dash="dash", line_color="black", opacity=0.5)
                     fig_balance_net.update_layout(height=500)
-                    st.plotly_chart(fig_balance_net, use_container_width=True)
+                    show_chart(fig_balance_net)
                 
                 with col2:
                     # Gràfic comparatiu imports vs exports
@@ -728,7 +1123,7 @@ def render_products_section(data_dict, selected_year):
                     # Afegir línia vertical a zero
                     fig_balance_comp.add_vline(x=0, line_dash="dash", line_color="black", opacity=0.5)
                     
-                    st.plotly_chart(fig_balance_comp, use_container_width=True)
+                    show_chart(fig_balance_comp)
                 
                 # Estadístiques del balanç comercial
                 st.subheader("📈 Estadístiques del Balanç Comercial")
@@ -766,6 +1161,220 @@ def render_products_section(data_dict, selected_year):
                         f"{avg_balance:.1f}M",
                         "Desequilibri absolut mitjà entre imports i exports"
                     )
+    
+    # 6. DEPENDÈNCIA PER PRODUCTE (SSR per país, producte i any precalculat)
+    st.subheader("🔍 Dependència per Producte")
+    item_ssr = load_item_ssr_table()
+    item_ssr_year = item_ssr[item_ssr['Year'] == selected_year] if not item_ssr.empty else pd.DataFrame()
+    
+    if item_ssr_year.empty:
+        st.info("L'autosuficiència per producte necessita les dades de producció, importacions i "
+                "exportacions per producte, que no estan disponibles per a aquest any.")
+    else:
+        area_names = data_dict['area_map'].set_index('AreaCode')['AreaName']
+        country_codes = [code for code in area_names.index if code in set(item_ssr_year['AreaCode'])]
+        country_code = st.selectbox("País", country_codes, format_func=lambda code: area_names[code],
+                                    key='item_ssr_country')
+        item_names = data_dict['item_map'].set_index('ItemCode')['ItemName']
+        dependency = item_dependency(item_ssr, country_code, selected_year, item_names)
+        dependency = dependency[dependency['NetImports'] > 0]
+        track_rows(dependency)
+        
+        if dependency.empty:
+            st.info(f"{area_names[country_code]} no és importador net de cap producte el {selected_year}.")
+        else:
+            fig_dependency = px.bar(
+                dependency.sort_values('NetImports'),
+                x='NetImports',
+                y='ItemName',
+                orientation='h',
+                color='SelfSufficiency',
+                color_continuous_scale='RdYlGn',
+                range_color=[0, 1],
+                hover_data={'Production': ':.1f', 'ImportQuantity': ':.1f', 'ExportQuantity': ':.1f'},
+                title=f'Productes amb Major Importació Neta: {area_names[country_code]} ({selected_year})',
+                labels={'NetImports': 'Importació Neta (milers de tones)', 'ItemName': 'Producte',
+                        'SelfSufficiency': 'SSR', 'Production': 'Producció',
+                        'ImportQuantity': 'Importacions', 'ExportQuantity': 'Exportacions'}
+            )
+            fig_dependency.update_layout(height=500)
+            show_chart(fig_dependency)
+            st.caption("Productes ordenats per importació neta (importacions - exportacions); el color "
+                       "és l'autosuficiència del producte, SSR = P / (P + I - E).")
+    
+    # 7. QUI ALIMENTA QUI (matrius bilaterals de comerç de FAOSTAT)
+    st.subheader("🔄 Qui Alimenta Qui")
+    trade_store = load_trade_matrix_store()
+    trade_items = [int(code) for code in trade_store.items(selected_year)] if trade_store is not None else []
+    
+    if not trade_items:
+        st.info("La matriu bilateral de comerç no està disponible per a aquest any. Es genera amb "
+                "`python scripts/build_trade_matrix.py` a partir del fitxer TM de FAOSTAT.")
+    else:
+        item_names = data_dict['item_map'].set_index('ItemCode')['ItemName']
+        area_names = data_dict['area_map'].set_index('AreaCode')['AreaName']
+        
+        col_item, col_importer = st.columns(2)
+        with col_item:
+            trade_item = st.selectbox("Producte", trade_items, key='trade_item',
+                                      format_func=lambda code: item_names.get(code, str(code)))
+        flows = trade_store.flows(selected_year, trade_item, area_names.to_dict())
+        flows['SupplierName'] = flows['SupplierName'].fillna(flows['Supplier'].astype(str))
+        flows['ImporterName'] = flows['ImporterName'].fillna(flows['Importer'].astype(str))
+        track_rows(flows)
+        importer_totals = flows.groupby('Importer')['Quantity'].sum().sort_values(ascending=False)
+        with col_importer:
+            importer = st.selectbox("Importador", list(importer_totals.index), key='trade_importer',
+                                    format_func=lambda code: area_names.get(code, str(code)))
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            # Els 20 fluxos més grans: proveïdors a l'esquerra, importadors a la dreta
+            top_flows = flows.head(20)
+            suppliers = list(top_flows['SupplierName'].unique())
+            importers = list(top_flows['ImporterName'].unique())
+            fig_sankey = go.Figure(go.Sankey(
+                node=dict(label=suppliers + importers, pad=12, thickness=14,
+                          color=['#2E8B57'] * len(suppliers) + ['#4682B4'] * len(importers)),
+                link=dict(source=[suppliers.index(name) for name in top_flows['SupplierName']],
+                          target=[len(suppliers) + importers.index(name) for name in top_flows['ImporterName']],
+                          value=top_flows['Quantity'])
+            ))
+            fig_sankey.update_layout(
+                title=f'Principals Fluxos de {item_names.get(trade_item, trade_item)} ({selected_year})',
+                height=550
+            )
+            show_chart(fig_sankey)
+        
+        with col2:
+            importer_flows = flows[flows['Importer'] == importer].head(15)
+            importer_flows = importer_flows.assign(
+                Share=importer_flows['Quantity'] / importer_totals[importer] * 100)
+            fig_suppliers = px.bar(
+                importer_flows.sort_values('Quantity'),
+                x='Quantity',
+                y='SupplierName',
+                orientation='h',
+                hover_data={'Share': ':.1f'},
+                title=f'Proveïdors de {area_names.get(importer, importer)} ({selected_year})',
+                labels={'Quantity': 'Quantitat (tones)', 'SupplierName': 'Proveïdor',
+                        'Share': '% de les importacions'},
+                color_discrete_sequence=['#4682B4']
+            )
+            fig_suppliers.update_layout(height=550)
+            show_chart(fig_suppliers)
+        
+        st.caption("Quantitats declarades per cada importador; per als països que no declaren importacions "
+                   "s'utilitzen les exportacions declarades pels seus proveïdors (dades mirall).")
+
+        # 8. SIMULADOR DE RESTRICCIONS A L'EXPORTACIÓ (propagació per la matriu bilateral)
+        st.subheader("🚫 Simulador de Restriccions a l'Exportació")
+        supplier_totals = flows.groupby('Supplier')['Quantity'].sum().sort_values(ascending=False)
+
+        col_exporters, col_items = st.columns(2)
+        with col_exporters:
+            shock_exporters = st.multiselect(
+                "Països que restringeixen", [int(code) for code in trade_store.area_codes],
+                default=[int(code) for code in supplier_totals.index[:3]], key='shock_exporters',
+                format_func=lambda code: area_names.get(code, str(code)))
+        with col_items:
+            shock_items = st.multiselect(
+                "Productes (cap = tots)", trade_items, default=[trade_item], key='shock_items',
+                format_func=lambda code: item_names.get(code, str(code)))
+        col_cut, col_rounds = st.columns(2)
+        with col_cut:
+            shock_cut = st.slider("Retallada de les exportacions (%)", 0, 100, 50, 5, key='shock_cut')
+        with col_rounds:
+            shock_rounds = st.slider("Rondes de reexportació", 0, 20, 10, key='shock_rounds')
+
+        if not shock_exporters or shock_cut == 0:
+            st.info("Tria almenys un país i una retallada superior a 0 per simular la restricció.")
+        else:
+            shock, rounds_used = simulate_export_ban(
+                trade_store, selected_year, shock_exporters, shock_cut / 100, items=shock_items or None,
+                production=data_dict['production'], max_rounds=shock_rounds)
+            shock_summary = summarize_shock(shock)
+            shock_summary['AreaName'] = shock_summary['AreaCode'].map(area_names)
+            affected = shock_summary[~shock_summary['Restricting'] & (shock_summary['ImportShortfall'] > 0)]
+            track_rows(shock)
+
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                create_metric_card(
+                    "Pèrdua Directa",
+                    f"{shock['DirectShortfall'].sum() / 1e6:.2f}M t",
+                    "Exportacions retallades pels països que restringeixen"
+                )
+            with col2:
+                create_metric_card(
+                    "Pèrdua Total d'Importacions",
+                    f"{shock['ImportShortfall'].sum() / 1e6:.2f}M t",
+                    f"Inclou les reexportacions perdudes ({rounds_used} rondes)"
+                )
+            with col3:
+                create_metric_card(
+                    "Països Afectats",
+                    str(len(affected)),
+                    "Importadors que perden part del seu subministrament"
+                )
+            with col4:
+                most_affected = affected.sort_values('ShortfallShare', ascending=False).head(1)
+                create_metric_card(
+                    "Màxima Pèrdua Relativa",
+                    f"{most_affected['ShortfallShare'].iloc[0]:.1f}%" if not most_affected.empty else "-",
+                    most_affected['AreaName'].fillna('').iloc[0] if not most_affected.empty else ""
+                )
+
+            fig_shock = px.choropleth(
+                affected.dropna(subset=['AreaName']),
+                locations='AreaName',
+                color='ShortfallShare',
+                locationmode='country names',
+                hover_data={'ImportShortfall': ':,.0f', 'DirectShortfall': ':,.0f', 'Imports': ':,.0f'},
+                title=f"Pèrdua d'Importacions per País ({selected_year})",
+                color_continuous_scale='Reds',
+                labels={'ShortfallShare': "% de les importacions", 'ImportShortfall': 'Pèrdua total (t)',
+                        'DirectShortfall': 'Pèrdua directa (t)', 'Imports': 'Importacions (t)'}
+            )
+            fig_shock.update_layout(
+                height=600,
+                geo=dict(
+                    showframe=False,
+                    showcoastlines=True,
+                    projection_type='equirectangular'
+                )
+            )
+            show_chart(fig_shock)
+
+            # Països més afectats, amb l'SSR abans i després si hi ha producció del producte
+            top_affected = shock[~shock['Restricting'] & (shock['ImportShortfall'] > 0)].nlargest(15, 'ImportShortfall')
+            st.dataframe(
+                pd.DataFrame({
+                    'País': top_affected['AreaCode'].map(area_names).fillna(top_affected['AreaCode'].astype(str)),
+                    'Producte': top_affected['ItemCode'].map(item_names).fillna(top_affected['ItemCode'].astype(str)),
+                    'Importacions (t)': top_affected['Imports'].round(0),
+                    'Pèrdua directa (t)': top_affected['DirectShortfall'].round(0),
+                    'Pèrdua total (t)': top_affected['ImportShortfall'].round(0),
+                    'Pèrdua (%)': top_affected['ShortfallShare'].round(1),
+                    'Canvi del subministrament (%)': top_affected['SupplyChange'].round(1),
+                    'SSR abans': top_affected['SSRBefore'].round(3),
+                    'SSR després': top_affected['SSRAfter'].round(3),
+                }),
+                hide_index=True
+            )
+            st.caption("La pèrdua directa és la part retallada dels fluxos dels països que restringeixen. A cada "
+                       "ronda, cada país que perd importacions exporta menys en proporció a la part de la seva "
+                       "disponibilitat (producció + importacions) que exporta, i la pèrdua passa als seus clients. "
+                       "Sense dades de producció l'SSR no es pot calcular.")
+
+def render_correlation_uncertainty(uncertainty, selected_year, first, second):
+    """Mostra l'interval bootstrap i el p-valor per permutacions d'una correlació"""
+    row = lookup_correlation(uncertainty, selected_year, first, second)
+    if row is None or pd.isna(row['CILow']):
+        return
+    st.caption(f"IC 95% bootstrap: [{row['CILow']:.3f}, {row['CIHigh']:.3f}] · "
+               f"p per permutacions: {row['PermPValue']:.3g} · n = {row['N']}")
 
 def render_correlations_section(data_dict, selected_year):
     """SECCIÓ 5: Anàlisi de Correlacions"""
@@ -784,9 +1393,15 @@ def render_correlations_section(data_dict, selected_year):
     </div>
     """, unsafe_allow_html=True)
     
+    # Correlacions de tots els anys, blocs i parells (calculades una vegada per versió de dades)
+    panel = load_indicator_panel()
+    corr_table, rolling_corr = load_correlation_tables(panel, panel.version)
+    corr_uncertainty = load_correlation_uncertainty(panel, panel.version, selected_year)
+    
     # Combinar dades per a l'anàlisi de correlacions
     ssr_year = data_dict['ssr'][data_dict['ssr']['Year'] == selected_year]
     ff_year = data_dict['footprint'][data_dict['footprint']['Year'] == selected_year]
+    track_rows(ssr_year, ff_year)
     
     # 1. CORRELACIONS BÀSIQUES (scatter plots)
     if not ssr_year.empty and not ff_year.empty:
@@ -829,22 +1444,33 @@ def render_correlations_section(data_dict, selected_year):
                         hover_data=['AreaName']
                     )
                 fig_corr1.update_traces(marker=dict(size=8, opacity=0.7))
-                st.plotly_chart(fig_corr1, use_container_width=True)
+                show_chart(fig_corr1)
                 
                 # Estadístiques de correlació
-                correlation_1 = merged_data['SelfSufficiency'].corr(merged_data['FoodFootprintCO2'])
+                row_1 = lookup_correlation(corr_table, selected_year,
+                                           'SelfSufficiency', 'FoodFootprintCO2')
+                if row_1 is not None:
+                    correlation_1 = row_1['Pearson']
+                    p_text_1 = f" (p = {row_1['PearsonPValue']:.3g})"
+                else:
+                    correlation_1 = merged_data['SelfSufficiency'].corr(merged_data['FoodFootprintCO2'])
+                    p_text_1 = ""
                 
                 if correlation_1 < -0.3:
-                    st.success(f"📈 Correlació negativa moderada: {correlation_1:.3f}")
+                    st.success(f"📈 Correlació negativa moderada: {correlation_1:.3f}{p_text_1}")
                 elif correlation_1 > 0.3:
-                    st.warning(f"📉 Correlació positiva moderada: {correlation_1:.3f}")
+                    st.warning(f"📉 Correlació positiva moderada: {correlation_1:.3f}{p_text_1}")
                 else:
-                    st.info(f"➡️ Correlació feble: {correlation_1:.3f}")
+                    st.info(f"➡️ Correlació feble: {correlation_1:.3f}{p_text_1}")
+                render_correlation_uncertainty(corr_uncertainty, selected_year,
+                                               'SelfSufficiency', 'FoodFootprintCO2')
             
             with col2:
                 # Correlació Participació Femenina vs Autosuficiència
-                if 'WomenAgriShare' in merged_data.columns:
-                    merged_gender = merged_data.dropna(subset=['WomenAgriShare'])
+                if 'WomenAgriShare' in ssr_year.columns:
+                    # Mateixa mostra que la correlació del panell: tots els països amb SSR i
+                    # participació femenina, tinguin o no petjada
+                    merged_gender = ssr_year.dropna(subset=['WomenAgriShare', 'SelfSufficiency'])
                     if len(merged_gender) > 5:
                         try:
                             fig_corr2 = px.scatter(
@@ -873,15 +1499,95 @@ def render_correlations_section(data_dict, selected_year):
                                 hover_data=['AreaName']
                             )
                         fig_corr2.update_traces(marker=dict(size=8, opacity=0.7))
-                        st.plotly_chart(fig_corr2, use_container_width=True)
+                        show_chart(fig_corr2)
                         
-                        correlation_2 = merged_gender['WomenAgriShare'].corr(merged_gender['SelfSufficiency'])
+                        row_2 = lookup_correlation(corr_table, selected_year,
+                                                   'WomenAgriShare', 'SelfSufficiency')
+                        if row_2 is not None:
+                            correlation_2 = row_2['Pearson']
+                            p_text_2 = f" (p = {row_2['PearsonPValue']:.3g})"
+                        else:
+                            correlation_2 = merged_gender['WomenAgriShare'].corr(merged_gender['SelfSufficiency'])
+                            p_text_2 = ""
                         
                         if correlation_2 < -0.3:
-                            st.warning(f"📉 Correlació negativa moderada: {correlation_2:.3f}")
+                            st.warning(f"📉 Correlació negativa moderada: {correlation_2:.3f}{p_text_2}")
                         elif correlation_2 > 0.3:
-                            st.success(f"📈 Correlació positiva moderada: {correlation_2:.3f}")
-                        else:                            st.info(f"➡️ Correlació feble: {correlation_2:.3f}")    
+                            st.success(f"📈 Correlació positiva moderada: {correlation_2:.3f}{p_text_2}")
+                        else:
+                            st.info(f"➡️ Correlació feble: {correlation_2:.3f}{p_text_2}")
+                        render_correlation_uncertainty(corr_uncertainty, selected_year,
+                                                       'WomenAgriShare', 'SelfSufficiency')
+    
+    # 2. MATRIU DE CORRELACIONS PER BLOCS I EVOLUCIÓ TEMPORAL
+    if not corr_table.empty:
+        st.subheader("🧮 Correlacions per Bloc Regional")
+        
+        indicator_labels = {
+            'SelfSufficiency': 'Autosuficiència',
+            'FoodFootprintCO2': 'Petjada CO₂',
+            'WomenAgriShare': '% Dones',
+        }
+        
+        def pair_label(df):
+            return df['Indicator1'].map(indicator_labels) + ' ↔ ' + df['Indicator2'].map(indicator_labels)
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            method = st.radio("Mètode", ['Pearson', 'Spearman'], horizontal=True,
+                              key='correlation_method')
+            year_corr = corr_table[corr_table['Year'] == selected_year].copy()
+            year_corr = year_corr.dropna(subset=[method])
+            
+            if not year_corr.empty:
+                year_corr['Parell'] = pair_label(year_corr)
+                heat = year_corr.pivot(index='BlocRegional', columns='Parell', values=method)
+                p_values = year_corr.pivot(index='BlocRegional', columns='Parell',
+                                           values=f'{method}PValue').reindex_like(heat)
+                # Un asterisc per a p < 0.05 i dos per a p < 0.01
+                stars = np.where(p_values < 0.01, '**', np.where(p_values < 0.05, '*', ''))
+                text = np.where(heat.isna(), '', heat.round(2).astype(str) + stars)
+                
+                fig_heat = go.Figure(go.Heatmap(
+                    z=heat.values,
+                    x=heat.columns,
+                    y=heat.index,
+                    text=text,
+                    texttemplate='%{text}',
+                    colorscale='RdBu',
+                    zmin=-1,
+                    zmax=1,
+                    colorbar=dict(title='r')
+                ))
+                fig_heat.update_layout(
+                    title=f'Correlació de {method} per Bloc ({selected_year})',
+                    height=450
+                )
+                show_chart(fig_heat)
+                st.caption("* p < 0.05 · ** p < 0.01 (distribució t exacta). "
+                           "Les cel·les buides tenen menys de 5 països amb dades.")
+            else:
+                st.info(f"No hi ha prou dades per calcular correlacions l'any {selected_year}")
+        
+        with col2:
+            global_rolling = rolling_corr[rolling_corr['BlocRegional'] == 'Tots'].dropna(subset=['Pearson'])
+            if not global_rolling.empty:
+                global_rolling = global_rolling.assign(Parell=pair_label(global_rolling))
+                fig_rolling = px.line(
+                    global_rolling,
+                    x='Year',
+                    y='Pearson',
+                    color='Parell',
+                    title='Correlació de Pearson en Finestra Mòbil de 5 Anys',
+                    labels={'Year': 'Any final de la finestra', 'Pearson': 'r', 'Parell': 'Parell'},
+                    hover_data=['N', 'PearsonPValue']
+                )
+                fig_rolling.add_hline(y=0, line_dash="dot", line_color="gray")
+                fig_rolling.add_vline(x=selected_year, line_dash="dash", line_color="red")
+                fig_rolling.update_layout(height=450, yaxis=dict(range=[-1, 1]))
+                show_chart(fig_rolling)
+    
     # 3. GRÀFIC ANIMAT DE CORRELACIÓ PER BLOCS REGIONALS (del notebook)
     st.subheader("🎬 Evolució Anual: Autosuficiència vs. Petjada de Carboni per Blocs")
     
@@ -968,6 +1674,7 @@ def render_correlations_section(data_dict, selected_year):
                 how='inner'
             )
 
+            track_rows(combined_scatter)
             if not combined_scatter.empty:
                 # Assignar bloc regional
                 combined_scatter['BlocRegional'] = combined_scatter['AreaName'].map(country_to_bloc_map)
@@ -1038,7 +1745,7 @@ def render_correlations_section(data_dict, selected_year):
                             yaxis=dict(range=range_y),
                             height=600
                         )
-                        st.plotly_chart(fig_scatter_blocs, use_container_width=True)
+                        show_chart(fig_scatter_blocs)
                         
                         st.info("💡 **Consell:** Utilitza els controls d'animació per veure l'evolució temporal de la relació entre autosuficiència i petjada de carboni per cada bloc regional.")
 
@@ -1067,6 +1774,11 @@ def render_gender_section(data_dict, selected_year, selected_regions):
         
         gender_data = ssr_data[ssr_data['WomenAgriShare'].notna()]
         gender_year = gender_data[gender_data['Year'] == selected_year]
+        track_rows(gender_data)
+        
+        # Mitjanes per any i bloc a partir de les estadístiques suficients precalculades
+        ssr_stats = load_bloc_statistics()['ssr']
+        gender_by_year_bloc = ssr_stats.per_bloc('WomenAgriShare', selected_regions)
         
         if not gender_year.empty:
             col1, col2 = st.columns(2)
@@ -1103,11 +1815,13 @@ def render_gender_section(data_dict, selected_year, selected_regions):
                 )
                 
                 fig_gender_dist.update_layout(height=400, template='plotly_white')
-                st.plotly_chart(fig_gender_dist, use_container_width=True)
+                show_chart(fig_gender_dist)
             
             with col2:
-                # Participació femenina per bloc regional                if 'BlocRegional' in gender_year.columns:
-                    gender_by_bloc = gender_year.groupby('BlocRegional')['WomenAgriShare'].mean().sort_values(ascending=True)
+                # Participació femenina per bloc regional
+                if 'BlocRegional' in gender_year.columns:
+                    gender_by_bloc = (gender_by_year_bloc[gender_by_year_bloc['Year'] == selected_year]
+                                      .set_index('BlocRegional')['mean'].sort_values(ascending=True))
                     
                     # Crear DataFrame per facilitar la coloració per bloc
                     gender_bloc_df = pd.DataFrame({
@@ -1129,18 +1843,19 @@ def render_gender_section(data_dict, selected_year, selected_regions):
                         height=400,
                         showlegend=False  # Amagar la llegenda ja que és redundant amb l'eix Y
                     )
-                    st.plotly_chart(fig_gender_bloc, use_container_width=True)
+                    show_chart(fig_gender_bloc)
         
         # Evolució temporal de la participació femenina
         st.subheader("Evolució de la Participació Femenina")
         
         if not gender_data.empty:
             # Calcular evolució per blocs regionals
-            gender_evolution = gender_data.groupby(['Year', 'BlocRegional'])['WomenAgriShare'].mean().reset_index()
+            gender_evolution = (gender_by_year_bloc[['Year', 'BlocRegional', 'mean']]
+                                .rename(columns={'mean': 'WomenAgriShare'}))
             
             # Calcular mitjana mundial (sempre amb totes les dades disponibles)
-            all_gender_data = data_dict['ssr'][data_dict['ssr']['WomenAgriShare'].notna()]
-            global_gender_evolution = all_gender_data.groupby('Year')['WomenAgriShare'].mean().reset_index()
+            global_gender_evolution = (ssr_stats.combine(value_cols=['WomenAgriShare'])['WomenAgriShare_mean']
+                                       .dropna().rename('WomenAgriShare').reset_index())
             
             fig_gender_evolution = px.line(
                 gender_evolution,
@@ -1175,7 +1890,46 @@ def render_gender_section(data_dict, selected_year, selected_regions):
                     x=1
                 )
             )
-            st.plotly_chart(fig_gender_evolution, use_container_width=True)
+            show_chart(fig_gender_evolution)
+        
+        # Bretxa d'SSR entre països amb participació femenina alta i baixa
+        panel = load_indicator_panel()
+        gender_impact = load_gender_impact_table(panel, panel.version)
+        if not gender_impact.empty:
+            st.subheader("Autosuficiència segons la Participació Femenina")
+            
+            if selected_regions != ["Tots"]:
+                impact_plot = gender_impact[gender_impact['BlocRegional'].isin(selected_regions + ["Tots"])]
+            else:
+                impact_plot = gender_impact
+            impact_plot = impact_plot.dropna(subset=['GenderImpact'])
+            
+            fig_gender_impact = px.line(
+                impact_plot,
+                x='Year',
+                y='GenderImpact',
+                color='BlocRegional',
+                title='Diferència d\'SSR: Països amb Participació Femenina Alta − Baixa (per sobre/sota de la mediana)',
+                labels={'GenderImpact': 'Diferència d\'SSR', 'Year': 'Any',
+                        'BlocRegional': 'Bloc Regional'},
+                hover_data={'Correlation': ':.3f', 'N': True, 'WomenMedian': ':.1f'}
+            )
+            fig_gender_impact.update_traces(selector=dict(name='Tots'),
+                                            line=dict(color='black', width=4))
+            fig_gender_impact.add_hline(y=0, line_dash="dot", line_color="gray")
+            fig_gender_impact.add_vline(x=selected_year, line_dash="dash", line_color="red")
+            fig_gender_impact.update_layout(height=500, hovermode='x unified')
+            show_chart(fig_gender_impact)
+            
+            year_impact = gender_impact[(gender_impact['Year'] == selected_year)
+                                        & (gender_impact['BlocRegional'] == "Tots")]
+            if not year_impact.empty:
+                row = year_impact.iloc[0]
+                # Sense variació d'SSR (anys posteriors a 2013) la correlació no està definida
+                corr_text = f" · correlació {row['Correlation']:.3f}" if pd.notna(row['Correlation']) else ""
+                st.caption(f"{selected_year}: SSR mitjà {row['SSRHighWomen']:.4f} (participació alta) vs "
+                           f"{row['SSRLowWomen']:.4f} (baixa){corr_text} · {row['N']} països. "
+                           "Només es mostren els grups amb 5 països o més.")
 
 def render_global_analysis_section(data_dict, selected_year):
     """SECCIÓ: Anàlisi Global del Sistema Alimentari"""
@@ -1205,6 +1959,7 @@ def render_global_analysis_section(data_dict, selected_year):
     
     # Preparar dades per imports i exports mundials
     ssr_data = data_dict['ssr']
+    track_rows(data_dict['production'], ssr_data, data_dict['footprint'])
     if not ssr_data.empty:
         imports_global = ssr_data.groupby('Year')['Imports'].sum().reset_index()
         exports_global = ssr_data.groupby('Year')['Exports'].sum().reset_index()
@@ -1282,7 +2037,7 @@ def render_global_analysis_section(data_dict, selected_year):
             secondary_y=True
         )
         
-        st.plotly_chart(fig_global_flows, use_container_width=True)
+        show_chart(fig_global_flows)
     
     # 2. Distribucions Estadístiques Avançades
     st.subheader("📈 Distribucions Estadístiques Globals")
@@ -1325,7 +2080,7 @@ def render_global_analysis_section(data_dict, selected_year):
             )
             
             fig_ssr_dist.update_layout(height=400, template='plotly_white')
-            st.plotly_chart(fig_ssr_dist, use_container_width=True)
+            show_chart(fig_ssr_dist)
     
     with col2:
         st.markdown("**Distribució de la Petjada de Carboni**")
@@ -1365,7 +2120,7 @@ def render_global_analysis_section(data_dict, selected_year):
                 )
                 
                 fig_ff_dist.update_layout(height=400, template='plotly_white')
-                st.plotly_chart(fig_ff_dist, use_container_width=True)
+                show_chart(fig_ff_dist)
     
     # 3. Estadístiques Globals Destacades
     st.subheader("🎯 Estadístiques Clau del Sistema Alimentari Mundial")
@@ -1408,6 +2163,299 @@ def render_global_analysis_section(data_dict, selected_year):
                 f"{co2_total:.2e}",
                 "Emissions totals acumulades del sistema alimentari"
             )
+    
+    # 4. Evolució dels indicadors de seguretat alimentària (tots els anys d'una passada)
+    food_security, food_source = load_food_security_table()
+    if not food_security.empty:
+        st.subheader("🛡️ Evolució dels Indicadors de Seguretat Alimentària")
+        
+        years_fs = food_security.index
+        fig_food_security = make_subplots(
+            rows=2, cols=2,
+            subplot_titles=('SSR Mitjà Global (± desviació)', 'Països per Nivell d\'SSR',
+                            'Volum Total (M tones)', 'Volum Mitjà per País (tones)')
+        )
+        
+        if 'global_ssr_mean' in food_security.columns:
+            ssr_mean = food_security['global_ssr_mean']
+            ssr_std = food_security['global_ssr_std'].fillna(0)
+            fig_food_security.add_trace(go.Scatter(
+                x=list(years_fs) + list(years_fs[::-1]),
+                y=list(ssr_mean + ssr_std) + list((ssr_mean - ssr_std)[::-1]),
+                fill='toself', fillcolor='rgba(46, 139, 87, 0.2)', line=dict(width=0),
+                hoverinfo='skip', showlegend=False
+            ), row=1, col=1)
+            fig_food_security.add_trace(go.Scatter(
+                x=years_fs, y=ssr_mean, name='SSR mitjà', line=dict(color='#2E8B57')
+            ), row=1, col=1)
+            fig_food_security.add_trace(go.Scatter(
+                x=years_fs, y=food_security['countries_above_1'], name='SSR ≥ 1.0',
+                line=dict(color='royalblue')
+            ), row=1, col=2)
+            fig_food_security.add_trace(go.Scatter(
+                x=years_fs, y=food_security['countries_below_0_5'], name='SSR < 0.5',
+                line=dict(color='#dc2626')
+            ), row=1, col=2)
+        
+        if 'total_production' in food_security.columns:
+            fig_food_security.add_trace(go.Scatter(
+                x=years_fs, y=food_security['total_production'] / 1_000_000, name='Volum total',
+                line=dict(color='#CD853F')
+            ), row=2, col=1)
+            fig_food_security.add_trace(go.Scatter(
+                x=years_fs, y=food_security['mean_production_per_country'], name='Mitjana per país',
+                line=dict(color='#8B4513')
+            ), row=2, col=2)
+        
+        fig_food_security.update_layout(height=650, template='plotly_white')
+        show_chart(fig_food_security)
+        if food_source and food_source != 'production':
+            st.caption(f"Els volums es calculen sobre el dataset '{food_source}' "
+                       "perquè no hi ha dades de producció.")
+
+# ==========================================
+# FRAGMENTS I DEPENDÈNCIES DELS CONTROLS
+# ==========================================
+
+# Controls del sidebar (claus de session_state) dels quals depèn cada secció.
+# Un canvi en un control només reexecuta els fragments que el declaren.
+SECTION_DEPENDENCIES = {
+    'resum': ('selected_year', 'selected_regions'),
+    'mapa': ('selected_year',),
+    'global': (),
+    'evolucio': ('selected_regions',),
+    'productes': ('selected_year',),
+    'correlacions': ('selected_year',),
+    'genere': ('selected_year', 'selected_regions'),
+}
+
+SECTION_TITLES = {
+    'resum': "📊 Indicadors Principals",
+    'mapa': "🗺️ Distribució Global",
+    'global': "🌍 Anàlisi Global",
+    'evolucio': "📈 Evolució Temporal",
+    'productes': "🥗 Anàlisi de Productes",
+    'correlacions': "🔗 Anàlisi de Correlacions",
+    'genere': "👩‍🌾 Perspectiva de Gènere",
+}
+
+def render_section(section, data_dict, selected_year, selected_regions):
+    """Renderitza una secció pel seu nom amb els valors dels controls indicats"""
+    if section == 'resum':
+        render_summary_section(data_dict, selected_year, selected_regions)
+    elif section == 'mapa':
+        render_map_section(data_dict, selected_year, selected_regions)
+    elif section == 'global':
+        render_global_analysis_section(data_dict, selected_year)
+    elif section == 'evolucio':
+        render_evolution_section(data_dict, selected_regions)
+    elif section == 'productes':
+        render_products_section(data_dict, selected_year)
+    elif section == 'correlacions':
+        render_correlations_section(data_dict, selected_year)
+    elif section == 'genere':
+        render_gender_section(data_dict, selected_year, selected_regions)
+    else:
+        raise ValueError(f"Secció desconeguda: {section}")
+
+def get_selected_year():
+    """Retorna l'any seleccionat al sidebar"""
+    return st.session_state['selected_year']
+
+def get_selected_regions():
+    """Retorna els blocs regionals seleccionats ("Tots" si no n'hi ha cap)"""
+    return st.session_state.get('selected_regions') or ["Tots"]
+
+def get_dependent_sections(control):
+    """Retorna les seccions que depenen d'un control del sidebar"""
+    return [section for section, controls in SECTION_DEPENDENCIES.items()
+            if control in controls]
+
+def is_memory_debug_page():
+    """Indica si s'està mostrant la pàgina oculta de diagnòstic de memòria (?debug=memoria)"""
+    return st.query_params.get('debug') == 'memoria'
+
+def rerun_dependent_sections(control):
+    """Callback dels controls: reexecuta només els fragments afectats"""
+    # La pàgina de diagnòstic no registra fragments: el canvi fa una reexecució completa
+    if is_memory_debug_page():
+        return
+    sections = get_dependent_sections(control)
+    if sections:
+        if st.session_state.get(PANEL_STATE_KEY):
+            sections.append('rendiment')
+        st.rerun(scope=sections)
+
+# Datasets que hi ha darrere dels gràfics de cada secció. Els filtres aplicats
+# a l'exportació són els controls dels quals depèn la secció.
+SECTION_EXPORTS = {
+    'resum': ['ssr', 'footprint'],
+    'mapa': ['ssr', 'footprint'],
+    'global': ['production', 'exports', 'ssr', 'footprint'],
+    'evolucio': ['ssr', 'footprint'],
+    'productes': ['production', 'imports', 'exports'],
+    'correlacions': ['ssr', 'footprint'],
+    'genere': ['ssr'],
+}
+
+def render_export_controls(section, data_dict):
+    """Botons de descàrrega de les dades filtrades d'una secció"""
+    controls = SECTION_DEPENDENCIES[section]
+    year = get_selected_year() if 'selected_year' in controls else None
+    regions = get_selected_regions() if 'selected_regions' in controls else None
+    datasets = [name for name in SECTION_EXPORTS[section]
+                if name in data_dict and not data_dict[name].empty]
+    if not datasets:
+        return
+    
+    with st.expander("⬇️ Descarrega les dades d'aquesta secció"):
+        fmt = st.radio("Format", list(EXPORT_FORMATS), horizontal=True,
+                       key=f'export_format_{section}')
+        cols = st.columns(len(datasets))
+        for col, name in zip(cols, datasets):
+            with col:
+                # La generació es difereix fins al clic i es fa per blocs de files
+                st.download_button(
+                    f"📥 {name}",
+                    data=lambda name=name: build_download_file(data_dict[name], fmt, year, regions),
+                    file_name=export_file_name(name, fmt, year, regions),
+                    mime=EXPORT_FORMATS[fmt]['mime'],
+                    on_click='ignore',
+                    key=f'export_{section}_{name}'
+                )
+
+@st.fragment(key='resum')
+def summary_fragment(data_dict):
+    """Fragment de la secció de resum"""
+    with profile_section('resum'):
+        render_summary_section(data_dict, get_selected_year(), get_selected_regions())
+    render_export_controls('resum', data_dict)
+
+@st.fragment(key='mapa')
+def map_fragment(data_dict):
+    """Fragment de la secció del mapa"""
+    with profile_section('mapa'):
+        render_map_section(data_dict, get_selected_year(), get_selected_regions())
+    render_export_controls('mapa', data_dict)
+
+@st.fragment(key='global')
+def global_analysis_fragment(data_dict):
+    """Fragment de la secció d'anàlisi global"""
+    with profile_section('global'):
+        render_global_analysis_section(data_dict, get_selected_year())
+    render_export_controls('global', data_dict)
+
+@st.fragment(key='evolucio')
+def evolution_fragment(data_dict):
+    """Fragment de la secció d'evolució temporal"""
+    with profile_section('evolucio'):
+        render_evolution_section(data_dict, get_selected_regions())
+    render_export_controls('evolucio', data_dict)
+
+@st.fragment(key='productes')
+def products_fragment(data_dict):
+    """Fragment de la secció de productes"""
+    with profile_section('productes'):
+        render_products_section(data_dict, get_selected_year())
+    render_export_controls('productes', data_dict)
+
+@st.fragment(key='correlacions')
+def correlations_fragment(data_dict):
+    """Fragment de la secció de correlacions"""
+    with profile_section('correlacions'):
+        render_correlations_section(data_dict, get_selected_year())
+    render_export_controls('correlacions', data_dict)
+
+@st.fragment(key='genere')
+def gender_fragment(data_dict):
+    """Fragment de la secció de gènere"""
+    with profile_section('genere'):
+        render_gender_section(data_dict, get_selected_year(), get_selected_regions())
+    render_export_controls('genere', data_dict)
+
+@st.fragment(key='rendiment')
+def performance_panel_fragment():
+    """Panell de depuració amb el cost de l'última execució de cada secció"""
+    with st.sidebar:
+        st.markdown("### 🛠️ Rendiment")
+        records = get_latest_records()
+        if not records:
+            st.caption("Encara no hi ha mesures registrades.")
+            return
+        
+        st.dataframe(pd.DataFrame(summarize_records(records)), hide_index=True)
+        
+        chart_rows = [
+            {'Secció': record['name'], 'Gràfic': chart['title'],
+             'Temps (ms)': round(chart['wall_ms'], 1), 'Punts': chart['points'],
+             'Payload (KB)': round(chart['fig_bytes'] / 1024, 1)}
+            for record in records for chart in record['charts']
+        ]
+        if chart_rows:
+            with st.expander("Detall per gràfic"):
+                st.dataframe(pd.DataFrame(chart_rows), hide_index=True)
+
+# ==========================================
+# PÀGINA OCULTA DE DIAGNÒSTIC (?debug=memoria)
+# ==========================================
+
+def render_all_sections(data_dict, selected_year, selected_regions):
+    """Renderitza totes les seccions directament, sense fragments"""
+    for section in SECTION_DEPENDENCIES:
+        render_section(section, data_dict, selected_year, selected_regions)
+
+def render_memory_debug_page(data_dict):
+    """Pàgina de depuració amb la memòria de les dades, les caches i les assignacions"""
+    st.markdown('<h2 class="section-header" id="memoria">🧠 Diagnòstic de Memòria</h2>', 
+                unsafe_allow_html=True)
+    
+    report = frame_memory_report(data_dict)
+    caches = cache_memory_report()
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        create_metric_card(
+            "Memòria de les Dades",
+            format_bytes(report['Bytes'].sum() if not report.empty else 0),
+            "Ús profund de tots els DataFrames retornats per load_all_data()"
+        )
+    with col2:
+        create_metric_card(
+            "Memòria de les Caches",
+            format_bytes(caches['Bytes'].sum() if not caches.empty else 0),
+            "Mida dels valors desats a st.cache_data i st.cache_resource"
+        )
+    
+    st.subheader("📦 Memòria per Dataset i Dtype (MB)")
+    summary = dataset_memory_summary(report)
+    if not summary.empty:
+        numeric_cols = summary.columns.drop('Dataset')
+        summary[numeric_cols] = (summary[numeric_cols] / (1024 * 1024)).round(2)
+        st.dataframe(summary, hide_index=True, use_container_width=True)
+    
+    st.subheader("🧾 Memòria per Columna")
+    st.dataframe(report, hide_index=True, use_container_width=True)
+    
+    st.subheader("🗄️ Caches de Streamlit")
+    if caches.empty:
+        st.info("Les caches són buides.")
+    else:
+        st.dataframe(caches, hide_index=True, use_container_width=True)
+    
+    st.subheader("🔬 Principals Assignacions durant una Execució")
+    if st.button("Traça una execució de totes les seccions"):
+        placeholder = st.empty()
+        
+        def rerun_sections():
+            with placeholder.container():
+                render_all_sections(data_dict, get_selected_year(), get_selected_regions())
+        
+        with st.spinner("Traçant l'execució..."):
+            top_allocations, peak_bytes = trace_top_allocations(rerun_sections, limit=25)
+        placeholder.empty()
+        
+        st.metric("Pic de memòria traçada", format_bytes(peak_bytes))
+        st.dataframe(top_allocations, hide_index=True, use_container_width=True)
 
 # ==========================================
 # APLICACIÓ PRINCIPAL
@@ -1438,31 +2486,35 @@ def main():
     # Càrrega de dades
     with st.spinner("Carregant dades..."):
         try:
-            data_dict = load_all_data()
+            with profile_section('load_all_data', kind='load'):
+                data_dict = load_all_data()
             st.sidebar.success("✅ Dades carregades correctament")
         except Exception as e:
             st.error(f"❌ Error carregant dades: {str(e)}")
             st.stop()
     
-    # Controls del sidebar
+    # Controls del sidebar (cada canvi només reexecuta les seccions que en depenen)
     years_available = sorted(data_dict['ssr']['Year'].dropna().unique())
-    selected_year = st.sidebar.selectbox(
+    st.sidebar.selectbox(
         "📅 Selecciona l'any:",
         years_available,
-        index=len(years_available)-5 if len(years_available) > 5 else -1
+        index=len(years_available)-5 if len(years_available) > 5 else -1,
+        key='selected_year',
+        on_change=rerun_dependent_sections,
+        args=('selected_year',)
     )
     
     # Filtre per blocs regionals
     available_blocs = ['Tots'] + sorted(data_dict['ssr']['BlocRegional'].dropna().unique().tolist())
-    selected_regions = st.sidebar.multiselect(
+    st.sidebar.multiselect(
         "🌐 Selecciona blocs regionals:",
         available_blocs,
-        default=["Tots"]
+        default=["Tots"],
+        key='selected_regions',
+        on_change=rerun_dependent_sections,
+        args=('selected_regions',)
     )
     
-    if not selected_regions:
-        selected_regions = ["Tots"]
-    
     # Informació del sidebar
     st.sidebar.markdown("---")
     st.sidebar.info("""
@@ -1473,14 +2525,24 @@ def main():
     **Període:** 1961-2023
     **Països:** 245+
     """)
-      # Renderitzar totes les seccions
-    render_summary_section(data_dict, selected_year, selected_regions)
-    render_map_section(data_dict, selected_year, selected_regions)
-    render_global_analysis_section(data_dict, selected_year)
-    render_evolution_section(data_dict, selected_regions)
-    render_products_section(data_dict, selected_year)
-    render_correlations_section(data_dict, selected_year)
-    render_gender_section(data_dict, selected_year, selected_regions)
+    st.sidebar.toggle("🛠️ Panell de rendiment", key=PANEL_STATE_KEY,
+                      help="Mostra el temps, les files i la mida dels gràfics de cada secció")
+    
+    # Pàgina oculta de diagnòstic de memòria
+    if is_memory_debug_page():
+        render_memory_debug_page(data_dict)
+        return
+      # Renderitzar totes les seccions (cada una com a fragment independent)
+    summary_fragment(data_dict)
+    map_fragment(data_dict)
+    global_analysis_fragment(data_dict)
+    evolution_fragment(data_dict)
+    products_fragment(data_dict)
+    correlations_fragment(data_dict)
+    gender_fragment(data_dict)
+    
+    if st.session_state.get(PANEL_STATE_KEY):
+        performance_panel_fragment()
     
     # Footer
     st.markdown("---")
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+API HTTP de només lectura sobre els agregats del panell
+
+Carrega les dades una vegada amb load_all_data(), precalcula totes les
+respostes JSON (cos pla, cos gzip i ETag) i les serveix des de memòria amb
+un servidor multifil. Cada petició és només una consulta a un diccionari:
+no es fa cap càlcul ni serialització en temps de petició.
+
+Ús:
+    python scripts/api_server.py --port 8600
+    curl -s localhost:8600/api/routes
+    curl -s "localhost:8600/api/ssr?year=2010&bloc=EU27"
+    curl -s -H "Accept-Encoding: gzip" "localhost:8600/api/top-items?metric=exports&year=2010" | gunzip
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from utils.loaders import load_all_data
+from utils.api import build_api_payloads, canonical_key, encode_payload
+
+# Les respostes només canvien quan es reinicia el servei amb dades noves
+CACHE_CONTROL = 'public, max-age=300'
+
+def build_response_table(data_dict) -> Dict[str, Tuple[bytes, bytes, str]]:
+    """Precalcula i serialitza totes les respostes de l'API"""
+    return {key: encode_payload(payload) for key, payload in build_api_payloads(data_dict).items()}
+
+class ApiRequestHandler(BaseHTTPRequestHandler):
+    """Serveix les respostes precalculades amb ETag/304 i gzip"""
+
+    protocol_version = 'HTTP/1.1'
+    # Capçaleres i cos van en escriptures separades: sense TCP_NODELAY la
+    # connexió persistent queda frenada per l'ACK retardat
+    disable_nagle_algorithm = True
+    responses_table: Dict[str, Tuple[bytes, bytes, str]] = {}
+    quiet = True
+
+    def do_GET(self):
+        self._respond(send_body=True)
+
+    def do_HEAD(self):
+        self._respond(send_body=False)
+
+    def _respond(self, send_body: bool) -> None:
+        """Resol la clau canònica de la petició i envia la resposta"""
+        url = urlsplit(self.path)
+        key = canonical_key(url.path.rstrip('/') or '/', dict(parse_qsl(url.query)))
+        entry = self.responses_table.get(key)
+
+        if entry is None:
+            body = json.dumps({'error': 'not found', 'path': self.path,
+                               'routes': '/api/routes'}).encode('utf-8')
+            self.send_response(HTTPStatus.NOT_FOUND)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            if send_body:
+                self.wfile.write(body)
+            return
+
+        body, gzip_body, etag = entry
+        if etag in self.headers.get('If-None-Match', ''):
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', CACHE_CONTROL)
+            self.end_headers()
+            return
+
+        use_gzip = 'gzip' in self.headers.get('Accept-Encoding', '')
+        payload = gzip_body if use_gzip else body
+
+        self.send_response(HTTPStatus.OK)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(payload)))
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', CACHE_CONTROL)
+        self.send_header('Vary', 'Accept-Encoding')
+        if use_gzip:
+            self.send_header('Content-Encoding', 'gzip')
+        self.end_headers()
+        if send_body:
+            self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        if not self.quiet:
+            super().log_message(format, *args)
+
+def main():
+    """Funció principal del script."""
+    parser = argparse.ArgumentParser(description="API HTTP de només lectura sobre els agregats del panell")
+    parser.add_argument('--host', default='127.0.0.1', help="Adreça on escoltar")
+    parser.add_argument('--port', type=int, default=8600, help="Port on escoltar")
+    parser.add_argument('--verbose', action='store_true', help="Registra cada petició")
+    args = parser.parse_args()
+
+    os.chdir(ROOT_DIR)
+
+    print("🌐 === API DEL PANELL ===")
+    start = time.perf_counter()
+    data_dict = load_all_data()
+    responses_table = build_response_table(data_dict)
+    total_bytes = sum(len(body) for body, _, _ in responses_table.values())
+    print(f"📦 {len(responses_table):,} respostes precalculades "
+          f"({total_bytes / 1024 / 1024:.1f} MB) en {time.perf_counter() - start:.1f} s")
+
+    ApiRequestHandler.responses_table = responses_table
+    ApiRequestHandler.quiet = not args.verbose
+
+    server = ThreadingHTTPServer((args.host, args.port), ApiRequestHandler)
+    server.daemon_threads = True
+    print(f"🚀 Escoltant a http://{args.host}:{args.port}/api/routes")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Servei aturat")
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
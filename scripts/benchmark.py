@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Benchmark headless de les seccions del panell (render_*_section)
+
+Executa app.py amb l'AppTest de Streamlit per a una matriu d'anys, blocs
+regionals i factors d'escala sintètics, i mesura per secció la latència en
+fred i en calent, la mida dels gràfics i el pic de memòria de cada execució.
+Els resultats es desen en JSON i es poden comparar amb una línia base.
+
+Ús:
+    python scripts/benchmark.py
+    python scripts/benchmark.py --years 2000 2010 --regions Tots EU27 --scale 1 4
+    python scripts/benchmark.py --save-baseline
+    python scripts/benchmark.py --baseline benchmarks/baseline.json --threshold 0.2
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Dict, List
+
+import pandas as pd
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from utils.loaders import DATA_DIR_ENV
+from utils.profiling import PROFILE_ENV, LATEST_STATE_KEY
+
+APP_PATH = ROOT_DIR / 'app.py'
+DEFAULT_OUTPUT = ROOT_DIR / 'benchmarks' / 'results.json'
+DEFAULT_BASELINE = ROOT_DIR / 'benchmarks' / 'baseline.json'
+
+SECTIONS = ['resum', 'mapa', 'global', 'evolucio', 'productes', 'correlacions', 'genere']
+
+# Fitxers amb granularitat de país que es repliquen per escalar les dades
+SCALABLE_FILES = ['ssr_women.csv.gz', 'food_footprint.csv.gz', 'production.csv.gz',
+                  'imports.csv.gz', 'exports.csv.gz']
+
+# ==========================================
+# DADES SINTÈTIQUES
+# ==========================================
+
+def build_scaled_data_dir(scale: int, source_dir: Path) -> Path:
+    """
+    Crea un directori temporal amb les dades replicades `scale` vegades.
+
+    Cada rèplica rep AreaCode i AreaName nous, de manera que els països
+    sintètics compten com a països diferents (bloc "Altres").
+    """
+    target_dir = Path(tempfile.mkdtemp(prefix=f'bench_x{scale}_'))
+    for path in source_dir.glob('*.csv.gz'):
+        if path.name not in SCALABLE_FILES:
+            shutil.copy(path, target_dir / path.name)
+            continue
+
+        df = pd.read_csv(path, compression='gzip')
+        replicas = [df]
+        for k in range(1, scale):
+            replica = df.copy()
+            replica['AreaCode'] = replica['AreaCode'] + k * 100_000
+            replica['AreaName'] = replica['AreaName'].astype(str) + f' #{k}'
+            replicas.append(replica)
+        pd.concat(replicas, ignore_index=True).to_csv(
+            target_dir / path.name, index=False, compression='gzip'
+        )
+    return target_dir
+
+# ==========================================
+# EXECUCIÓ AMB APPTEST
+# ==========================================
+
+def clear_streamlit_caches() -> None:
+    """Buida les caches de Streamlit per forçar una execució en fred"""
+    import streamlit as st
+    st.cache_data.clear()
+    st.cache_resource.clear()
+
+def run_app(year: int, regions: List[str], timeout: float):
+    """Executa una vegada app.py amb l'any i els blocs indicats"""
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(str(APP_PATH), default_timeout=timeout)
+    at.session_state['selected_year'] = year
+    at.session_state['selected_regions'] = regions
+
+    start = time.perf_counter()
+    at.run()
+    total_ms = (time.perf_counter() - start) * 1000
+
+    if at.exception:
+        raise RuntimeError(f"Error executant app.py: {at.exception[0].value}")
+
+    records = dict(at.session_state[LATEST_STATE_KEY]) if LATEST_STATE_KEY in at.session_state else {}
+    return at, total_ms, records
+
+def benchmark_case(year: int, regions: List[str], repeat: int,
+                   timeout: float, sections: List[str]) -> Dict:
+    """Mesura un cas (any, blocs) en fred, en calent i amb traçat de memòria"""
+    clear_streamlit_caches()
+    gc.collect()
+    _, cold_total, cold_records = run_app(year, regions, timeout)
+
+    warm_totals = []
+    warm_records = {name: [] for name in cold_records}
+    for _ in range(repeat):
+        _, total_ms, records = run_app(year, regions, timeout)
+        warm_totals.append(total_ms)
+        for name, record in records.items():
+            warm_records.setdefault(name, []).append(record['wall_ms'])
+
+    # Execució separada amb tracemalloc per no contaminar les latències
+    gc.collect()
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    run_app(year, regions, timeout)
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    section_results = {}
+    for name, record in cold_records.items():
+        if record['kind'] == 'section' and name not in sections:
+            continue
+        section_results[name] = {
+            'cold_ms': round(record['wall_ms'], 2),
+            'warm_ms': round(statistics.median(warm_records[name]), 2) if warm_records.get(name) else None,
+            'rows': record['rows'],
+            'charts': len(record['charts']),
+            'fig_bytes': record['fig_bytes']
+        }
+
+    return {
+        'year': int(year),
+        'regions': regions,
+        'cold_total_ms': round(cold_total, 2),
+        'warm_total_ms': round(statistics.median(warm_totals), 2) if warm_totals else None,
+        'peak_mem_mb': round(peak_bytes / (1024 * 1024), 2),
+        'sections': section_results
+    }
+
+# ==========================================
+# LÍNIA BASE
+# ==========================================
+
+def case_key(case: Dict) -> str:
+    """Clau estable d'un cas per comparar resultats entre execucions"""
+    return f"x{case['scale']}|{case['year']}|{'+'.join(case['regions'])}"
+
+def compare_with_baseline(results: Dict, baseline: Dict,
+                          threshold: float, min_delta_ms: float) -> List[Dict]:
+    """Retorna les seccions on la latència en calent empitjora més del llindar"""
+    baseline_cases = {case_key(case): case for case in baseline.get('cases', [])}
+    regressions = []
+
+    for case in results['cases']:
+        base_case = baseline_cases.get(case_key(case))
+        if base_case is None:
+            continue
+        for name, current in case['sections'].items():
+            previous = base_case['sections'].get(name)
+            if not previous or previous.get('warm_ms') is None or current.get('warm_ms') is None:
+                continue
+            delta = current['warm_ms'] - previous['warm_ms']
+            if delta > min_delta_ms and current['warm_ms'] > previous['warm_ms'] * (1 + threshold):
+                regressions.append({
+                    'case': case_key(case),
+                    'section': name,
+                    'baseline_ms': previous['warm_ms'],
+                    'current_ms': current['warm_ms'],
+                    'change_pct': round(delta / previous['warm_ms'] * 100, 1)
+                })
+    return regressions
+
+# ==========================================
+# INFORME
+# ==========================================
+
+def print_case(case: Dict) -> None:
+    """Imprimeix un resum llegible d'un cas"""
+    warm_total = f"{case['warm_total_ms']:.0f}" if case['warm_total_ms'] is not None else '-'
+    print(f"\n📊 {case_key(case)}  fred={case['cold_total_ms']:.0f} ms  "
+          f"calent={warm_total} ms  pic={case['peak_mem_mb']:.1f} MB")
+    print(f"   {'Secció':<16}{'Fred (ms)':>12}{'Calent (ms)':>13}{'Files':>10}{'KB':>10}")
+    for name, section in sorted(case['sections'].items(), key=lambda item: -item[1]['cold_ms']):
+        warm = f"{section['warm_ms']:.1f}" if section['warm_ms'] is not None else '-'
+        print(f"   {name:<16}{section['cold_ms']:>12.1f}{warm:>13}"
+              f"{section['rows']:>10}{section['fig_bytes'] / 1024:>10.1f}")
+
+def default_years() -> List[int]:
+    """Anys per defecte: el seleccionat inicialment al panell i dos anys amb SSR complet"""
+    ssr = pd.read_csv(ROOT_DIR / 'data' / 'ssr_women.csv.gz', compression='gzip', usecols=['Year'])
+    years = sorted(ssr['Year'].dropna().unique())
+    initial = years[len(years) - 5] if len(years) > 5 else years[-1]
+    return sorted({int(initial), 2000, 2013})
+
+def main():
+    """Funció principal del script."""
+    parser = argparse.ArgumentParser(description="Benchmark headless de les seccions del panell")
+    parser.add_argument('--years', type=int, nargs='+', help="Anys a mesurar")
+    parser.add_argument('--regions', nargs='+', default=['Tots', 'EU27'],
+                        help="Seleccions de blocs; separa blocs d'una mateixa selecció amb '+'")
+    parser.add_argument('--sections', nargs='+', default=SECTIONS, choices=SECTIONS,
+                        help="Seccions a incloure a l'informe")
+    parser.add_argument('--scale', type=int, nargs='+', default=[1],
+                        help="Factors d'escala sintètics de les dades")
+    parser.add_argument('--repeat', type=int, default=3, help="Execucions en calent per cas")
+    parser.add_argument('--timeout', type=float, default=300, help="Temps màxim per execució (s)")
+    parser.add_argument('--output', type=Path, default=DEFAULT_OUTPUT)
+    parser.add_argument('--baseline', type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true',
+                        help="Desa els resultats com a nova línia base")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="Empitjorament relatiu tolerat respecte la línia base")
+    parser.add_argument('--min-delta-ms', type=float, default=20,
+                        help="Empitjorament absolut mínim per considerar una regressió")
+    args = parser.parse_args()
+
+    os.chdir(ROOT_DIR)
+    os.environ[PROFILE_ENV] = '1'
+
+    years = args.years or default_years()
+    region_sets = [selection.split('+') for selection in args.regions]
+
+    print("🚀 === BENCHMARK DEL PANELL ===")
+    print(f"   Anys: {years}  Blocs: {args.regions}  Escala: {args.scale}")
+
+    results = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeat': args.repeat,
+        'cases': []
+    }
+
+    for scale in args.scale:
+        data_dir = None
+        if scale > 1:
+            print(f"\n🧪 Generant dades sintètiques x{scale}...")
+            data_dir = build_scaled_data_dir(scale, ROOT_DIR / 'data')
+            os.environ[DATA_DIR_ENV] = str(data_dir)
+        else:
+            os.environ.pop(DATA_DIR_ENV, None)
+
+        try:
+            for year in years:
+                for regions in region_sets:
+                    case = benchmark_case(year, regions, args.repeat, args.timeout, args.sections)
+                    case['scale'] = scale
+                    results['cases'].append(case)
+                    print_case(case)
+        finally:
+            if data_dir is not None:
+                shutil.rmtree(data_dir, ignore_errors=True)
+                os.environ.pop(DATA_DIR_ENV, None)
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(results, indent=2, ensure_ascii=False), encoding='utf-8')
+    print(f"\n💾 Resultats desats a {args.output}")
+
+    if args.save_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(results, indent=2, ensure_ascii=False), encoding='utf-8')
+        print(f"📌 Línia base actualitzada a {args.baseline}")
+        return
+
+    if args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text(encoding='utf-8'))
+        regressions = compare_with_baseline(results, baseline, args.threshold, args.min_delta_ms)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regressions respecte {args.baseline}:")
+            for regression in regressions:
+                print(f"   {regression['case']} · {regression['section']}: "
+                      f"{regression['baseline_ms']:.1f} → {regression['current_ms']:.1f} ms "
+                      f"(+{regression['change_pct']}%)")
+            sys.exit(1)
+        print(f"\n✅ Cap regressió respecte {args.baseline}")
+    else:
+        print(f"\nℹ️  No hi ha línia base a {args.baseline} (usa --save-baseline per crear-la)")
+
+if __name__ == "__main__":
+    main()
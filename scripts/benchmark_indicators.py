@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Benchmark dels càlculs d'indicadors: implementació anterior vs vectoritzada
+
+Per a cada cas executa la implementació anterior (groupby().apply amb una
+funció Python per grup) i la nova implementació vectoritzada de
+utils/indicators.py sobre les dades reals, en mesura el temps (mediana de
+--repeat execucions) i comprova que els resultats coincideixen allà on les
+dues definicions són equivalents.
+
+Ús:
+    python scripts/benchmark_indicators.py
+    python scripts/benchmark_indicators.py --cases growth --repeat 5
+    python scripts/benchmark_indicators.py --cases correlations
+    python scripts/benchmark_indicators.py --json benchmarks/indicators.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from streamlit.config import set_option
+from streamlit.logger import set_log_level
+
+# Els loaders s'executen fora del servidor de Streamlit
+set_option('logger.level', 'error')
+set_log_level('error')
+
+from utils.loaders import load_all_data, load_indicator_panel
+from utils.items import country_item_rows
+from utils.indicators import (calculate_growth_table, calculate_diversity_table,
+                              calculate_correlation_table, calculate_correlations)
+
+# ==========================================
+# IMPLEMENTACIONS ANTERIORS
+# ==========================================
+
+def legacy_yearly_growth(df: pd.DataFrame, value_col: str,
+                         group_cols: List[str] = ['AreaName']) -> pd.DataFrame:
+    """calculate_yearly_growth abans de la versió vectoritzada"""
+
+    def growth_rate(series):
+        if len(series) < 2:
+            return np.nan
+        return ((series.iloc[-1] / series.iloc[0]) ** (1 / (len(series) - 1)) - 1) * 100
+
+    growth_data = df.groupby(group_cols)[value_col].apply(growth_rate).reset_index()
+    growth_data.columns = group_cols + ['growth_rate']
+
+    return growth_data
+
+def legacy_diversity_index(data: pd.DataFrame, group_cols: List[str] = ['AreaName'],
+                           value_col: str = 'Production') -> pd.DataFrame:
+    """calculate_diversity_index abans de la versió vectoritzada (amb grups de diverses columnes)"""
+
+    def shannon_diversity(series):
+        proportions = series / series.sum()
+        return -np.sum(proportions * np.log(proportions + 1e-10))  # Evitar log(0)
+
+    diversity = data.groupby(group_cols)[value_col].apply(shannon_diversity).reset_index()
+    diversity.columns = group_cols + ['DiversityIndex']
+
+    return diversity
+
+def legacy_correlation_table(data_dict: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """Correlació SSR-petjada de cada (any, bloc) amb calculate_correlations per grup"""
+    rows = []
+    for (year, bloc), ssr_group in data_dict['ssr'].groupby(['Year', 'BlocRegional']):
+        footprint = data_dict['footprint']
+        footprint_group = footprint[(footprint['Year'] == year) & (footprint['BlocRegional'] == bloc)]
+        if len(ssr_group) < 5 or footprint_group.empty:
+            continue
+        result = calculate_correlations(ssr_group, footprint_group,
+                                        'SelfSufficiency', 'FoodFootprintCO2')
+        rows.append({'Year': year, 'BlocRegional': bloc, 'Pearson': result['correlation'],
+                     'N': result['n_samples']})
+    return pd.DataFrame(rows)
+
+# ==========================================
+# CASOS
+# ==========================================
+
+def trade_frame(data_dict: Dict[str, pd.DataFrame]) -> tuple:
+    """Taula país × producte × any més gran disponible (producció o exportacions)"""
+    for name, value_col in (('production', 'Production'), ('exports', 'ExportQuantity')):
+        df = data_dict.get(name, pd.DataFrame())
+        if not df.empty:
+            return name, df, value_col
+    raise RuntimeError("No hi ha dades de producció ni d'exportacions")
+
+def case_growth(data_dict: Dict[str, pd.DataFrame], repeat: int) -> Dict:
+    """CAGR de tots els països × productes"""
+    name, df, value_col = trade_frame(data_dict)
+    group_cols = ['AreaName', 'ItemName']
+    # L'anterior implementació suposa les files ordenades per any
+    df = df.sort_values('Year')
+
+    # Les sèries que comencen a 0 donen divisions per zero a la versió anterior
+    with np.errstate(divide='ignore', invalid='ignore'):
+        legacy_s, legacy = time_call(lambda: legacy_yearly_growth(df, value_col, group_cols), repeat)
+    vector_s, vector = time_call(lambda: calculate_growth_table(df, value_col, group_cols), repeat)
+
+    # Les dues definicions coincideixen per a sèries contigües amb valor inicial positiu
+    merged = legacy.merge(vector, on=group_cols, suffixes=('_legacy', ''))
+    comparable = merged[(merged['gap_years'] == 0) & (merged['first_value'] > 0)
+                        & (merged['n_points'] >= 2)
+                        & (merged['n_points'] == merged['last_year'] - merged['first_year'] + 1)]
+    comparable = comparable.dropna(subset=['growth_rate_legacy', 'growth_rate'])
+    max_diff = float((comparable['growth_rate_legacy'] - comparable['growth_rate']).abs().max())
+
+    return {
+        'case': 'growth',
+        'dataset': name,
+        'rows': len(df),
+        'groups': len(vector),
+        'legacy_s': legacy_s,
+        'vectorized_s': vector_s,
+        'speedup': legacy_s / vector_s if vector_s > 0 else None,
+        'compared_groups': len(comparable),
+        'max_abs_diff': max_diff,
+        'groups_with_gaps': int((vector['gap_years'] > 0).sum()),
+    }
+
+def case_diversity(data_dict: Dict[str, pd.DataFrame], repeat: int) -> Dict:
+    """Shannon de tots els països × anys (la versió nova calcula també Simpson i HHI)"""
+    name, df, value_col = trade_frame(data_dict)
+    # Les dues versions reben només països i productes individuals
+    df = country_item_rows(df)
+    group_cols = ['AreaName', 'Year']
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        legacy_s, legacy = time_call(lambda: legacy_diversity_index(df, group_cols, value_col), repeat)
+    vector_s, vector = time_call(lambda: calculate_diversity_table(df, value_col, group_cols), repeat)
+
+    # Diferències esperades: la versió anterior suma 1e-10 dins del logaritme i
+    # inclou els pocs valors negatius de les dades, que la nova descarta
+    merged = legacy.merge(vector, on=group_cols).dropna(subset=['DiversityIndex', 'Shannon'])
+    max_diff = float((merged['DiversityIndex'] - merged['Shannon']).abs().max())
+
+    return {
+        'case': 'diversity',
+        'dataset': name,
+        'rows': len(df),
+        'groups': len(vector),
+        'legacy_s': legacy_s,
+        'vectorized_s': vector_s,
+        'speedup': legacy_s / vector_s if vector_s > 0 else None,
+        'compared_groups': len(merged),
+        'max_abs_diff': max_diff,
+    }
+
+def case_correlations(data_dict: Dict[str, pd.DataFrame], repeat: int) -> Dict:
+    """Correlacions de tots els anys × blocs (la versió nova fa tots els parells i Spearman)"""
+    panel = load_indicator_panel()
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        legacy_s, legacy = time_call(lambda: legacy_correlation_table(data_dict), repeat)
+    vector_s, vector = time_call(lambda: calculate_correlation_table(panel), repeat)
+
+    # Es comparen els grups amb les mateixes observacions a les dues versions; les
+    # diferències residuals venen de l'emmagatzematge float32 del panell
+    pair = vector[(vector['Indicator1'] == 'SelfSufficiency')
+                  & (vector['Indicator2'] == 'FoodFootprintCO2')]
+    merged = legacy.merge(pair, on=['Year', 'BlocRegional', 'N'], suffixes=('_legacy', ''))
+    merged = merged.dropna(subset=['Pearson_legacy', 'Pearson'])
+    max_diff = float((merged['Pearson_legacy'] - merged['Pearson']).abs().max())
+
+    return {
+        'case': 'correlations',
+        'dataset': 'ssr+footprint',
+        'rows': len(data_dict['ssr']) + len(data_dict['footprint']),
+        'groups': len(vector),
+        'legacy_s': legacy_s,
+        'vectorized_s': vector_s,
+        'speedup': legacy_s / vector_s if vector_s > 0 else None,
+        'compared_groups': len(merged),
+        'max_abs_diff': max_diff,
+    }
+
+CASES: Dict[str, Callable[[Dict[str, pd.DataFrame], int], Dict]] = {
+    'growth': case_growth,
+    'diversity': case_diversity,
+    'correlations': case_correlations,
+}
+
+def time_call(func: Callable[[], object], repeat: int) -> tuple:
+    """Mediana del temps de `repeat` execucions i l'últim resultat"""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), result
+
+def main():
+    """Funció principal del script."""
+    parser = argparse.ArgumentParser(description="Benchmark dels càlculs d'indicadors")
+    parser.add_argument('--cases', nargs='+', choices=list(CASES), default=list(CASES),
+                        help="Casos a executar")
+    parser.add_argument('--repeat', type=int, default=3, help="Execucions per implementació")
+    parser.add_argument('--json', type=Path, help="Desa els resultats en JSON")
+    args = parser.parse_args()
+
+    os.chdir(ROOT_DIR)
+
+    print("🧮 === BENCHMARK D'INDICADORS ===")
+    data_dict = load_all_data()
+
+    results = []
+    for case in args.cases:
+        print(f"\n▶️  {case}")
+        result = CASES[case](data_dict, args.repeat)
+        results.append(result)
+        for key, value in result.items():
+            if key == 'case':
+                continue
+            formatted = f"{value:.4f}" if isinstance(value, float) else value
+            print(f"   {key}: {formatted}")
+
+    if args.json:
+        args.json.parent.mkdir(parents=True, exist_ok=True)
+        args.json.write_text(json.dumps(results, indent=2, ensure_ascii=False), encoding='utf-8')
+        print(f"\n💾 Resultats desats a {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Construcció de les matrius bilaterals de comerç a partir del fitxer TM de FAOSTAT
+
+Llegeix per blocs el CSV normalitzat de la matriu de comerç detallada
+(Trade_DetailedTradeMatrix_E_All_Data_(Normalized).csv, desat com a
+data/raw/fao_TM.csv per scripts/data_download.py), en conserva només les
+quantitats importades i exportades entre països i desa totes les matrius
+declarant × soci per (any, producte) en un únic .npz comprimit que el
+dashboard llegeix amb load_trade_matrix_store().
+
+Ús:
+    python scripts/build_trade_matrix.py
+    python scripts/build_trade_matrix.py --input data/raw/fao_TM.zip --chunk-size 2000000
+    python scripts/build_trade_matrix.py --output /tmp/trade_matrix.npz
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from utils.trade_matrix import TradeMatrixStore, DEFAULT_TM_CHUNK_SIZE
+
+TRADE_MATRIX_FILE = 'trade_matrix.npz'
+
+def main():
+    """Funció principal del script."""
+    parser = argparse.ArgumentParser(description="Construcció de les matrius bilaterals de comerç")
+    parser.add_argument('--input', type=Path, default=ROOT_DIR / 'data' / 'raw' / 'fao_TM.csv',
+                        help="CSV normalitzat de la matriu de comerç de FAOSTAT (o .zip/.gz)")
+    parser.add_argument('--output', type=Path, default=ROOT_DIR / 'data' / TRADE_MATRIX_FILE,
+                        help="Fitxer .npz de sortida")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_TM_CHUNK_SIZE,
+                        help="Files per bloc de lectura")
+    parser.add_argument('--encoding', default='latin-1', help="Codificació del CSV")
+    args = parser.parse_args()
+
+    if not args.input.exists():
+        print(f"❌ No s'ha trobat {args.input}. Descarrega'l amb scripts/data_download.py")
+        sys.exit(1)
+
+    print("🔄 === MATRIUS BILATERALS DE COMERÇ ===")
+    print(f"📥 Llegint {args.input} (blocs de {args.chunk_size:,} files)...")
+    start = time.perf_counter()
+    store = TradeMatrixStore.from_csv(str(args.input), args.chunk_size, args.encoding)
+    elapsed = time.perf_counter() - start
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    store.save(str(args.output))
+
+    summary = store.summary()
+    print(f"✅ {store.nnz:,} fluxos bilaterals, {store.n_areas} països, "
+          f"{len(store.block_ptr) - 1:,} matrius (any × producte × element) en {elapsed:.1f} s")
+    if not summary.empty:
+        print(f"   Anys: {summary['Year'].min()}-{summary['Year'].max()}")
+    print(f"💾 Desat a {args.output} ({os.path.getsize(args.output) / 1024 / 1024:.1f} MB)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Exportació en streaming de les dades filtrades del panell
+
+Llegeix el fitxer preprocessat per blocs de files, hi aplica el filtre d'any
+i de blocs regionals i escriu cada bloc directament a la sortida en CSV o
+Parquet. Ni el dataset sencer ni el resultat filtrat es carreguen mai en
+memòria, de manera que es pot exportar tot l'històric d'`exports` en un
+contenidor petit.
+
+Ús:
+    python scripts/export_data.py exports --year 2010 --regions EU27 -o exports_eu27_2010.csv
+    python scripts/export_data.py exports --format parquet -o exports.parquet
+    python scripts/export_data.py ssr --regions "Àfrica Subsahariana" > ssr_africa.csv
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from utils.loaders import REGIONAL_BLOCS, data_path
+from utils.export import (DEFAULT_CHUNK_SIZE, filter_chunks, iter_csv_file_chunks,
+                          write_export)
+
+# Nom del dataset (com a load_all_data) -> fitxer preprocessat
+DATASET_FILES = {
+    'ssr': 'ssr_women.csv.gz',
+    'footprint': 'food_footprint.csv.gz',
+    'production': 'production.csv.gz',
+    'imports': 'imports.csv.gz',
+    'exports': 'exports.csv.gz',
+}
+
+def main():
+    """Funció principal del script."""
+    parser = argparse.ArgumentParser(description="Exportació en streaming de les dades filtrades")
+    parser.add_argument('dataset', choices=list(DATASET_FILES), help="Dataset a exportar")
+    parser.add_argument('--year', type=int, help="Any a exportar (per defecte, tots)")
+    parser.add_argument('--regions', nargs='+', choices=list(REGIONAL_BLOCS) + ['Altres'],
+                        help="Blocs regionals a incloure (per defecte, tots)")
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv')
+    parser.add_argument('--gzip', action='store_true', help="Comprimeix la sortida CSV amb gzip")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="Files per bloc de lectura i escriptura")
+    parser.add_argument('-o', '--output', type=Path,
+                        help="Fitxer de sortida (per defecte, stdout en CSV)")
+    args = parser.parse_args()
+
+    source = Path(data_path(DATASET_FILES[args.dataset]))
+    if not source.is_absolute():
+        source = ROOT_DIR / source
+    if not source.exists():
+        print(f"❌ No s'ha trobat {source}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.output is None and args.format == 'parquet':
+        print("❌ L'exportació Parquet necessita un fitxer de sortida (-o)", file=sys.stderr)
+        sys.exit(1)
+
+    chunks = filter_chunks(iter_csv_file_chunks(str(source), args.chunk_size),
+                           year=args.year, regions=args.regions)
+
+    start = time.perf_counter()
+    if args.output is None:
+        n_rows = write_export(chunks, sys.stdout.buffer, fmt='csv', compress=args.gzip)
+        sys.stdout.buffer.flush()
+    else:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, 'wb') as f:
+            n_rows = write_export(chunks, f, fmt=args.format, compress=args.gzip)
+
+    elapsed = time.perf_counter() - start
+    destination = args.output or 'stdout'
+    print(f"✅ {n_rows:,} files exportades a {destination} en {elapsed:.1f} s", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Prova de càrrega amb sessions concurrents del panell
+
+Simula N sessions simultànies dins del mateix procés, cadascuna executant
+app.py amb l'AppTest de Streamlit i seguint un guió d'interaccions realista
+(canviar l'any, activar blocs regionals, saltar entre seccions). Informa del
+throughput, dels percentils de latència per interacció i de l'evolució de la
+memòria resident (RSS) del procés.
+
+Ús:
+    python scripts/load_test.py --sessions 4 --interactions 10
+    python scripts/load_test.py --sessions 1 2 4 8 --duration 60 --output load.json
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+APP_PATH = ROOT_DIR / 'app.py'
+
+NAV_BUTTONS = ["📊 Resum", "🗺️ Mapa", "🌍 Global", "📈 Evolució",
+               "🥗 Productes", "🔗 Correlacions", "👩‍🌾 Gènere"]
+
+# Pes relatiu de cada tipus d'interacció en el guió aleatori
+INTERACTION_WEIGHTS = {
+    'change_year': 0.45,
+    'toggle_bloc': 0.35,
+    'jump_section': 0.20,
+}
+
+# ==========================================
+# MEMÒRIA DEL PROCÉS
+# ==========================================
+
+def get_rss_mb() -> float:
+    """Retorna la memòria resident del procés en MB"""
+    try:
+        import psutil
+        return psutil.Process(os.getpid()).memory_info().rss / (1024 * 1024)
+    except ImportError:
+        # Fallback sense psutil (Linux)
+        try:
+            with open('/proc/self/statm') as f:
+                pages = int(f.read().split()[1])
+            return pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+        except (OSError, ValueError):
+            import resource
+            # ru_maxrss és el pic (KB a Linux), no el valor actual
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+class RssSampler(threading.Thread):
+    """Mostreja periòdicament la RSS del procés en un fil separat"""
+
+    def __init__(self, interval: float = 0.5):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.samples: List[Tuple[float, float]] = []
+        self._stop_event = threading.Event()
+        self._start_time = time.perf_counter()
+
+    def run(self):
+        """Bucle de mostreig fins que s'atura el fil"""
+        while not self._stop_event.is_set():
+            self.samples.append((time.perf_counter() - self._start_time, get_rss_mb()))
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        """Atura el mostreig i afegeix una última mostra"""
+        self._stop_event.set()
+        self.join()
+        self.samples.append((time.perf_counter() - self._start_time, get_rss_mb()))
+
+# ==========================================
+# SESSIONS SIMULADES
+# ==========================================
+
+class SimulatedSession:
+    """Una sessió d'usuari que interactua amb el panell via AppTest"""
+
+    def __init__(self, session_id: int, seed: int, timeout: float):
+        from streamlit.testing.v1 import AppTest
+
+        self.session_id = session_id
+        self.rng = random.Random(seed)
+        self.at = AppTest.from_file(str(APP_PATH), default_timeout=timeout)
+        self.years: List = []
+        self.blocs: List[str] = []
+        self.latencies: List[Dict] = []
+
+    def _timed(self, action: str, func: Callable[[], None]) -> None:
+        """Executa una interacció i en registra la latència"""
+        start = time.perf_counter()
+        error = None
+        try:
+            func()
+            if self.at.exception:
+                error = str(self.at.exception[0].value)
+        except Exception as e:
+            error = str(e)
+        self.latencies.append({
+            'session': self.session_id,
+            'action': action,
+            'started_at': start,
+            'latency_ms': (time.perf_counter() - start) * 1000,
+            'error': error
+        })
+
+    def open(self) -> None:
+        """Primera càrrega del panell"""
+        def first_run():
+            self.at.run()
+            self.years = list(self.at.sidebar.selectbox[0].options)
+            self.blocs = [bloc for bloc in self.at.sidebar.multiselect[0].options if bloc != 'Tots']
+        self._timed('open', first_run)
+
+    def _ensure_controls(self) -> None:
+        """
+        Torna a executar el panell complet si l'arbre d'AppTest no conté els controls.
+
+        Després d'una reexecució de fragments AppTest només conserva els elements
+        dels fragments; un navegador real manté la resta de la pàgina, així que
+        aquesta resincronització no es compta com a interacció.
+        """
+        if len(self.at.sidebar.selectbox) == 0 or len(self.at.button) == 0:
+            self.at.run()
+
+    def change_year(self) -> None:
+        """Selecciona un altre any al sidebar (reexecució de fragments)"""
+        self._ensure_controls()
+        year = self.rng.choice(self.years)
+        widget = self.at.sidebar.selectbox[0]
+        self._timed('change_year', lambda: widget.set_value(year).run())
+
+    def toggle_bloc(self) -> None:
+        """Afegeix o treu un bloc regional de la selecció"""
+        self._ensure_controls()
+        current = [bloc for bloc in (self.at.session_state['selected_regions'] or []) if bloc != 'Tots']
+        bloc = self.rng.choice(self.blocs)
+        selection = [b for b in current if b != bloc] if bloc in current else current + [bloc]
+        widget = self.at.sidebar.multiselect[0]
+        self._timed('toggle_bloc', lambda: widget.set_value(selection or ['Tots']).run())
+
+    def jump_section(self) -> None:
+        """Prem un botó de navegació ràpida (reexecució completa)"""
+        self._ensure_controls()
+        label = self.rng.choice(NAV_BUTTONS)
+        button = next(button for button in self.at.button if button.label == label)
+        self._timed('jump_section', lambda: button.click().run())
+
+    def next_interaction(self) -> None:
+        """Executa una interacció escollida segons els pesos del guió"""
+        actions = list(INTERACTION_WEIGHTS)
+        action = self.rng.choices(actions, weights=[INTERACTION_WEIGHTS[a] for a in actions])[0]
+        getattr(self, action)()
+
+def run_session(session: SimulatedSession, interactions: int,
+                deadline: Optional[float], barrier: threading.Barrier) -> None:
+    """Cos del fil d'una sessió: obre el panell i executa el guió"""
+    barrier.wait()
+    session.open()
+    done = 0
+    while True:
+        if deadline is not None:
+            if time.perf_counter() >= deadline:
+                break
+        elif done >= interactions:
+            break
+        session.next_interaction()
+        done += 1
+
+# ==========================================
+# INFORME
+# ==========================================
+
+def summarize_latencies(latencies: List[Dict]) -> Dict:
+    """Calcula percentils de latència globals i per tipus d'interacció"""
+    df = pd.DataFrame(latencies)
+    ok = df[df['error'].isna()]
+
+    def percentiles(values: pd.Series) -> Dict:
+        arr = values.to_numpy()
+        if len(arr) == 0:
+            return {'count': 0}
+        return {
+            'count': int(len(arr)),
+            'mean_ms': round(float(arr.mean()), 1),
+            'p50_ms': round(float(np.percentile(arr, 50)), 1),
+            'p90_ms': round(float(np.percentile(arr, 90)), 1),
+            'p99_ms': round(float(np.percentile(arr, 99)), 1),
+            'max_ms': round(float(arr.max()), 1)
+        }
+
+    return {
+        'all': percentiles(ok['latency_ms']),
+        'by_action': {action: percentiles(group['latency_ms'])
+                      for action, group in ok.groupby('action')},
+        'errors': int(df['error'].notna().sum())
+    }
+
+def run_load_level(n_sessions: int, interactions: int, duration: Optional[float],
+                   timeout: float, seed: int, rss_interval: float) -> Dict:
+    """Executa una prova amb n_sessions concurrents i en retorna les mètriques"""
+    sessions = [SimulatedSession(i, seed + i, timeout) for i in range(n_sessions)]
+    barrier = threading.Barrier(n_sessions)
+
+    sampler = RssSampler(rss_interval)
+    rss_start = get_rss_mb()
+    sampler.start()
+
+    start = time.perf_counter()
+    deadline = start + duration if duration else None
+    threads = [
+        threading.Thread(target=run_session, args=(session, interactions, deadline, barrier))
+        for session in sessions
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    sampler.stop()
+    latencies = [record for session in sessions for record in session.latencies]
+    rss_values = [rss for _, rss in sampler.samples]
+
+    return {
+        'sessions': n_sessions,
+        'elapsed_s': round(elapsed, 2),
+        'interactions': len(latencies),
+        'throughput_rps': round(len(latencies) / elapsed, 3) if elapsed > 0 else None,
+        'latency': summarize_latencies(latencies),
+        'rss_mb': {
+            'start': round(rss_start, 1),
+            'end': round(rss_values[-1], 1),
+            'peak': round(max(rss_values), 1),
+            'growth': round(rss_values[-1] - rss_start, 1),
+            'samples': [(round(t, 2), round(rss, 1)) for t, rss in sampler.samples]
+        }
+    }
+
+def print_level(result: Dict) -> None:
+    """Imprimeix un resum llegible d'un nivell de càrrega"""
+    latency = result['latency']['all']
+    rss = result['rss_mb']
+    print(f"\n👥 {result['sessions']} sessions · {result['interactions']} interaccions en "
+          f"{result['elapsed_s']:.1f} s · {result['throughput_rps']} reexec./s")
+    if latency.get('count'):
+        print(f"   Latència: p50={latency['p50_ms']:.0f} ms  p90={latency['p90_ms']:.0f} ms  "
+              f"p99={latency['p99_ms']:.0f} ms  max={latency['max_ms']:.0f} ms")
+    for action, stats in result['latency']['by_action'].items():
+        print(f"     {action:<14} n={stats['count']:<4} p50={stats['p50_ms']:.0f} ms  p99={stats['p99_ms']:.0f} ms")
+    print(f"   RSS: {rss['start']:.0f} → {rss['end']:.0f} MB (pic {rss['peak']:.0f} MB, "
+          f"creixement {rss['growth']:+.0f} MB)")
+    if result['latency']['errors']:
+        print(f"   ⚠️  {result['latency']['errors']} interaccions amb error")
+
+def main():
+    """Funció principal del script."""
+    parser = argparse.ArgumentParser(description="Prova de càrrega amb sessions concurrents del panell")
+    parser.add_argument('--sessions', type=int, nargs='+', default=[1, 2, 4],
+                        help="Nombre de sessions concurrents (un nivell per valor)")
+    parser.add_argument('--interactions', type=int, default=10,
+                        help="Interaccions per sessió (si no s'indica --duration)")
+    parser.add_argument('--duration', type=float, help="Durada de cada nivell en segons")
+    parser.add_argument('--timeout', type=float, default=300, help="Temps màxim per reexecució (s)")
+    parser.add_argument('--seed', type=int, default=42, help="Llavor dels guions aleatoris")
+    parser.add_argument('--rss-interval', type=float, default=0.5, help="Període de mostreig de la RSS (s)")
+    parser.add_argument('--output', type=Path, help="Fitxer JSON on desar els resultats")
+    args = parser.parse_args()
+
+    os.chdir(ROOT_DIR)
+
+    print("🚀 === PROVA DE CÀRREGA DEL PANELL ===")
+    results = []
+    for n_sessions in args.sessions:
+        result = run_load_level(n_sessions, args.interactions, args.duration,
+                                args.timeout, args.seed, args.rss_interval)
+        results.append(result)
+        print_level(result)
+
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps({'levels': results}, indent=2), encoding='utf-8')
+        print(f"\n💾 Resultats desats a {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Informe de memòria de les dades i caches del panell
+
+Mostra l'ús de memòria profund de cada DataFrame de load_all_data() per
+columna i dtype, la mida de cada cache de Streamlit i, opcionalment, les
+principals assignacions de tracemalloc durant una execució completa d'app.py.
+La mateixa informació està disponible a la pàgina oculta `?debug=memoria`.
+
+Ús:
+    python scripts/memory_report.py
+    python scripts/memory_report.py --trace --top 20
+    python scripts/memory_report.py --json informe_memoria.json
+"""
+
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from utils.loaders import load_all_data
+from utils.diagnostics import (frame_memory_report, dataset_memory_summary,
+                               cache_memory_report, trace_top_allocations, format_bytes)
+
+APP_PATH = ROOT_DIR / 'app.py'
+
+def run_app_once(timeout: float) -> None:
+    """Executa app.py una vegada amb AppTest (omple també les caches)"""
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(str(APP_PATH), default_timeout=timeout)
+    at.run()
+    if at.exception:
+        raise RuntimeError(f"Error executant app.py: {at.exception[0].value}")
+
+def print_table(title: str, df: pd.DataFrame, bytes_cols=('Bytes',)) -> None:
+    """Imprimeix una taula amb les columnes de mida formatades"""
+    print(f"\n📋 {title}")
+    if df.empty:
+        print("   (buit)")
+        return
+    display = df.copy()
+    for col in bytes_cols:
+        if col in display.columns:
+            display[col] = display[col].map(lambda v: format_bytes(v) if pd.notna(v) else '-')
+    print(display.to_string(index=False))
+
+def main():
+    """Funció principal del script."""
+    parser = argparse.ArgumentParser(description="Informe de memòria de les dades i caches del panell")
+    parser.add_argument('--trace', action='store_true',
+                        help="Traça amb tracemalloc una execució completa d'app.py")
+    parser.add_argument('--top', type=int, default=15, help="Nombre d'assignacions a mostrar")
+    parser.add_argument('--group-by', choices=['lineno', 'filename'], default='lineno',
+                        help="Agrupació de les assignacions de tracemalloc")
+    parser.add_argument('--timeout', type=float, default=300, help="Temps màxim de l'execució (s)")
+    parser.add_argument('--json', type=Path, help="Desa l'informe complet en JSON")
+    args = parser.parse_args()
+
+    os.chdir(ROOT_DIR)
+
+    print("🧠 === INFORME DE MEMÒRIA DEL PANELL ===")
+    data_dict = load_all_data()
+
+    report = frame_memory_report(data_dict)
+    summary = dataset_memory_summary(report)
+    print(f"\n📦 Total dades: {format_bytes(report['Bytes'].sum())}")
+    print_table("Memòria per dataset i dtype", summary,
+                bytes_cols=[col for col in summary.columns if col != 'Dataset'])
+    print_table("Memòria per columna", report, bytes_cols=('Bytes', 'Bytes si category'))
+
+    result = {
+        'frames': report.to_dict(orient='records'),
+        'datasets': summary.to_dict(orient='records'),
+    }
+
+    if args.trace:
+        print("\n🔬 Traçant una execució completa d'app.py...")
+        top_allocations, peak_bytes = trace_top_allocations(
+            lambda: run_app_once(args.timeout), limit=args.top, group_by=args.group_by
+        )
+        print(f"   Pic de memòria traçada: {format_bytes(peak_bytes)}")
+        print_table("Principals assignacions", top_allocations)
+        result['tracemalloc'] = {
+            'peak_bytes': peak_bytes,
+            'top': top_allocations.to_dict(orient='records')
+        }
+
+    caches = cache_memory_report()
+    print(f"\n🗄️  Total caches: {format_bytes(caches['Bytes'].sum() if not caches.empty else 0)}")
+    print_table("Caches de Streamlit", caches)
+    result['caches'] = caches.to_dict(orient='records')
+
+    if args.json:
+        args.json.parent.mkdir(parents=True, exist_ok=True)
+        args.json.write_text(json.dumps(result, indent=2, ensure_ascii=False, default=str),
+                             encoding='utf-8')
+        print(f"\n💾 Informe desat a {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -9,9 +9,15 @@ i altres fonts de dades per al dashboard d'autosuficiència alimentària.
 L'objectiu és reduir els arxius del dataset original a arxius operatius pel projecte (<25MB).
 """
 
+import sys
+from pathlib import Path
+
 import pandas as pd
 import numpy as np
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from utils.items import calculate_item_ssr_table, calculate_item_rollups
+
 # Assegura't que app_ordenada.py existeix al mateix directori
 # i conté les definicions de les funcions importades.
 from app_ordenada import (
@@ -115,6 +121,19 @@ print("\nExtraient dades d'Exportacions...")
 exports_df = extract_element_data(datasets.get('df_fbs', pd.DataFrame()), 'Export Quantity', 'ExportQuantity', area_map, item_map)
 print(f"Dades d'Exportacions (exports_df) extretes amb {len(exports_df)} files.")
 
+# 8b. Autosuficiència per país, producte i any
+# La producció es pren de la FBS perquè els codis de producte i les unitats coincideixin amb el comerç
+print("\nCalculant l'autosuficiència per producte...")
+fbs_prod_df = extract_element_data(datasets.get('df_fbs', pd.DataFrame()), 'Production', 'Production', area_map, item_map)
+item_ssr_df = calculate_item_ssr_table(fbs_prod_df, imports_df, exports_df) if not fbs_prod_df.empty else pd.DataFrame()
+print(f"Autosuficiència per producte (item_ssr_df) calculada amb {len(item_ssr_df)} files.")
+
+# 8c. Totals per grup de productes (jerarquia grup → producte dels balanços alimentaris)
+# Com a 8b, la producció és la de la FBS: els codis de la QCL no pertanyen a cap grup
+print("\nCalculant els totals per grup de productes...")
+item_group_totals_df, item_totals_df = calculate_item_rollups({'production': fbs_prod_df, 'imports': imports_df, 'exports': exports_df})
+print(f"Totals per grup ({len(item_group_totals_df)} files) i per producte ({len(item_totals_df)} files) calculats.")
+
 # 9. Desa tots els DataFrames processats en format Parquet
 print(f"\nDesant els DataFrames processats a la carpeta '{output_dir}'...")
 
@@ -124,6 +143,9 @@ dataframes_to_save = {
     "production": prod_df,
     "imports": imports_df,
     "exports": exports_df,
+    "item_ssr": item_ssr_df,
+    "item_group_totals": item_group_totals_df,
+    "item_totals": item_totals_df,
     "area_map": area_map,
     "item_map": item_map,
     "women_agri_share": women_share_df[['AreaCode', 'AreaName', 'Year', 'WomenAgriShare']] if not women_share_df.empty else pd.DataFrame()
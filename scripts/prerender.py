@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Generació estàtica de totes les vistes (secció, any) del panell
+
+Renderitza cada secció d'app.py per a cada any disponible (amb el conjunt de
+blocs per defecte) fora de Streamlit, recull les figures Plotly que passen per
+show_chart() i les desa com a paquets HTML i JSON, repartint les vistes en un
+pool de processos. Les seccions que no depenen de l'any es generen una sola
+vegada. La construcció és incremental: el manifest guarda l'empremta de les
+entrades de cada vista (codi, dades de la secció, any i blocs) i només es
+regeneren les vistes que han canviat.
+
+Ús:
+    python scripts/prerender.py
+    python scripts/prerender.py --output site --workers 8
+    python scripts/prerender.py --sections resum mapa --years 2010 2013
+    python scripts/prerender.py --force
+"""
+
+import argparse
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Optional
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from streamlit.config import set_option
+from streamlit.logger import set_log_level
+
+# El mode "bare" de Streamlit avisa a cada crida fora del servidor
+set_option('logger.level', 'error')
+set_log_level('error')
+
+from utils.loaders import load_all_data
+from utils.prerender import (capture_figures, hash_files, hash_frame, view_id, view_hash,
+                             load_manifest, save_manifest, is_view_current,
+                             write_view_bundle, write_index)
+
+DEFAULT_OUTPUT = ROOT_DIR / 'site'
+DEFAULT_REGIONS = ["Tots"]
+# Datasets de mapatge que qualsevol secció pot consultar
+SHARED_DATASETS = ['area_map', 'item_map']
+
+# Estat de cada procés del pool (amb fork s'hereta del procés principal)
+_app = None
+_data_dict = None
+
+# ==========================================
+# PROCÉS DE TREBALL
+# ==========================================
+
+def init_worker() -> None:
+    """Importa app.py i carrega les dades una sola vegada per procés"""
+    global _app, _data_dict
+    os.chdir(ROOT_DIR)
+    if _app is None:
+        import app
+        _app = app
+    if _data_dict is None:
+        _data_dict = load_all_data()
+
+def render_view(section: str, year: Optional[int], render_year: int, regions: List[str],
+                output_dir: str, expected_hash: str) -> Dict:
+    """Renderitza una vista, n'escriu el paquet i retorna la seva entrada del manifest"""
+    start = time.perf_counter()
+    try:
+        with capture_figures() as figures:
+            _app.render_section(section, _data_dict, render_year, regions)
+        files = write_view_bundle(Path(output_dir), section, _app.SECTION_TITLES[section],
+                                  year, regions, figures)
+    except Exception:
+        return {'section': section, 'year': year, 'error': traceback.format_exc()}
+
+    return {
+        'section': section,
+        'year': year,
+        'regions': regions,
+        'hash': expected_hash,
+        'files': files,
+        'figures': len(figures),
+        'seconds': round(time.perf_counter() - start, 2),
+    }
+
+# ==========================================
+# PLANIFICACIÓ
+# ==========================================
+
+def code_fingerprint() -> str:
+    """Empremta del codi que intervé en el renderitzat"""
+    return hash_files([ROOT_DIR / 'app.py'] + list((ROOT_DIR / 'utils').glob('*.py')))
+
+def plan_views(sections: List[str], years: List[int], default_year: int) -> List[Dict]:
+    """Llista les vistes a generar segons les dependències de cada secció"""
+    views = []
+    for section in sections:
+        if 'selected_year' in _app.SECTION_DEPENDENCIES[section]:
+            views.extend({'section': section, 'year': year, 'render_year': year}
+                         for year in years)
+        else:
+            views.append({'section': section, 'year': None, 'render_year': default_year})
+    return views
+
+def remove_stale_views(output_dir: Path, manifest: Dict[str, Dict], planned: set) -> int:
+    """Esborra els fitxers de les vistes del manifest que ja no es generen"""
+    removed = 0
+    for vid, entry in list(manifest.items()):
+        if vid in planned:
+            continue
+        for name in entry.get('files', []):
+            (output_dir / name).unlink(missing_ok=True)
+        del manifest[vid]
+        removed += 1
+    return removed
+
+def main():
+    """Funció principal del script."""
+    parser = argparse.ArgumentParser(description="Generació estàtica de les vistes del panell")
+    parser.add_argument('--output', type=Path, default=DEFAULT_OUTPUT, help="Directori de sortida")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="Processos del pool")
+    parser.add_argument('--sections', nargs='+', help="Seccions a generar (per defecte, totes)")
+    parser.add_argument('--years', nargs='+', type=int, help="Anys a generar (per defecte, tots)")
+    parser.add_argument('--force', action='store_true', help="Regenera totes les vistes")
+    args = parser.parse_args()
+
+    print("🏗️  === GENERACIÓ ESTÀTICA DEL PANELL ===")
+    start = time.perf_counter()
+    init_worker()
+
+    sections = args.sections or list(_app.SECTION_DEPENDENCIES)
+    unknown = [section for section in sections if section not in _app.SECTION_DEPENDENCIES]
+    if unknown:
+        print(f"❌ Seccions desconegudes: {', '.join(unknown)}")
+        sys.exit(1)
+
+    years_available = [int(year) for year in sorted(_data_dict['ssr']['Year'].dropna().unique())]
+    years = [year for year in years_available if not args.years or year in args.years]
+    default_year = years_available[-5] if len(years_available) > 5 else years_available[-1]
+
+    # Empremtes: codi comú i, per secció, les dades que hi ha darrere dels gràfics
+    code_hash = code_fingerprint()
+    frame_hashes = {name: hash_frame(df) for name, df in _data_dict.items()}
+    section_data_hashes = {
+        section: {name: frame_hashes[name]
+                  for name in _app.SECTION_EXPORTS[section] + SHARED_DATASETS
+                  if name in frame_hashes}
+        for section in sections
+    }
+
+    output_dir = args.output.resolve()
+    output_dir.mkdir(parents=True, exist_ok=True)
+    manifest = load_manifest(output_dir)
+
+    planned = plan_views(sections, years, default_year)
+    pending = []
+    for view in planned:
+        view['hash'] = view_hash(code_hash, section_data_hashes[view['section']],
+                                 view['section'], view['year'], DEFAULT_REGIONS)
+        vid = view_id(view['section'], view['year'])
+        if args.force or not is_view_current(output_dir, manifest.get(vid), view['hash']):
+            pending.append(view)
+
+    if not args.sections and not args.years:
+        removed = remove_stale_views(output_dir, manifest,
+                                     {view_id(v['section'], v['year']) for v in planned})
+        if removed:
+            print(f"🧹 {removed} vistes obsoletes eliminades")
+
+    print(f"📋 {len(planned)} vistes, {len(pending)} a regenerar "
+          f"({len(planned) - len(pending)} al dia) amb {args.workers} processos")
+
+    errors = []
+    if pending:
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker) as pool:
+            futures = [
+                pool.submit(render_view, view['section'], view['year'], view['render_year'],
+                            DEFAULT_REGIONS, str(output_dir), view['hash'])
+                for view in pending
+            ]
+            for done, future in enumerate(as_completed(futures), start=1):
+                entry = future.result()
+                vid = view_id(entry['section'], entry['year'])
+                if 'error' in entry:
+                    errors.append((vid, entry['error']))
+                    print(f"   ❌ [{done}/{len(pending)}] {vid}")
+                    continue
+                manifest[vid] = entry
+                print(f"   ✅ [{done}/{len(pending)}] {vid}: {entry['figures']} gràfics "
+                      f"en {entry['seconds']:.1f} s")
+                # Es desa sovint perquè una interrupció no obligui a refer-ho tot
+                if done % 20 == 0:
+                    save_manifest(output_dir, manifest)
+
+    save_manifest(output_dir, manifest)
+    write_index(output_dir, manifest, _app.SECTION_TITLES)
+
+    elapsed = time.perf_counter() - start
+    print(f"\n📦 Lloc estàtic a {output_dir} ({elapsed:.1f} s)")
+    if errors:
+        for vid, error in errors:
+            print(f"\n❌ Error a {vid}:\n{error}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Proves dels indicadors del panell i de les taules país × producte × any
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.indicators import (calculate_food_security_table, calculate_sustainability_panel,
+                              get_top_products)
+from utils.panel import IndicatorPanel
+
+DATA_DIR = Path(__file__).resolve().parents[1] / 'data'
+
+
+def test_food_security_totals_count_countries_and_items_only():
+    """Els agregats regionals i les files de grup no se sumen a la producció"""
+    production = pd.DataFrame({
+        'AreaCode': [2, 2, 2, 3, 3, 5000, 5100, 351],
+        'AreaName': ['Afghanistan', 'Afghanistan', 'Afghanistan', 'Albania', 'Albania',
+                     'World', 'Africa', 'China'],
+        'ItemCode': [2511, 2513, 2905, 2511, 2905, 2511, 2511, 2511],
+        'Year': 2010,
+        'Production': [10.0, 5.0, 15.0, 20.0, 20.0, 35.0, 8.0, 3.0],
+    })
+    table = calculate_food_security_table(pd.DataFrame(), production)
+
+    assert table.at[2010, 'total_production'] == pytest.approx(35.0)
+    assert table.at[2010, 'mean_production_per_country'] == pytest.approx(17.5)
+
+
+def test_food_security_totals_on_shipped_exports():
+    """Total de 2010 de les exportacions del repositori (10,5 milions si se sumessin agregats i grups)"""
+    exports = pd.read_csv(DATA_DIR / 'exports.csv.gz', compression='gzip')
+    table = calculate_food_security_table(pd.DataFrame(), exports, 'ExportQuantity')
+
+    assert table.at[2010, 'total_production'] == pytest.approx(1_184_222.71)
+
+
+def test_sustainability_reweights_constant_components():
+    """Un component constant en un any (SSR de farciment) no anul·la l'índex: es repondera la resta"""
+    ssr = np.array([[0.8, 1.0], [1.2, 1.0], [1.0, 1.0]], dtype=np.float32)
+    footprint = np.array([[3.0, 3.0], [1.0, 1.0], [2.0, 2.0]], dtype=np.float32)
+    panel = IndicatorPanel({'SelfSufficiency': ssr, 'FoodFootprintCO2': footprint},
+                           [1, 2, 3], [2013, 2014], ['A', 'B', 'C'], ['Altres'] * 3)
+    index = calculate_sustainability_panel(panel, {'SelfSufficiency': 0.6, 'FoodFootprintCO2': 0.4})
+
+    assert index[2013].to_numpy() == pytest.approx([0.0, 100.0, 50.0])
+    # 2014: només la petjada (menys és millor)
+    assert index[2014].to_numpy() == pytest.approx([0.0, 100.0, 50.0])
+
+
+def test_top_products_count_countries_and_items_only():
+    """El top de l'API suma els mateixos països i productes que el panell (sense World ni grups)"""
+    exports = pd.read_csv(DATA_DIR / 'exports.csv.gz', compression='gzip')
+    top = get_top_products(exports, 'ExportQuantity', n_top=3, year=2010)
+
+    assert top['ItemName'].iloc[0] == 'Wheat and products'
+    assert top['ExportQuantity'].iloc[0] == pytest.approx(176_973.0)
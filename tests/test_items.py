@@ -0,0 +1,23 @@
+"""
+Proves dels totals per grup i per producte
+"""
+
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from utils.items import calculate_item_rollups
+
+DATA_DIR = Path(__file__).resolve().parents[1] / 'data'
+
+
+def test_group_rollups_match_fao_world_rows():
+    """El total de països d'un grup coincideix amb la fila World del grup a FAOSTAT"""
+    exports = pd.read_csv(DATA_DIR / 'exports.csv.gz', compression='gzip')
+    group_totals, _ = calculate_item_rollups({'exports': exports})
+
+    world = exports[(exports['AreaCode'] == 5000) & (exports['ItemCode'] == 2905)
+                    & (exports['Year'] == 2010)]['ExportQuantity'].sum()
+    cereals = group_totals[(group_totals['Year'] == 2010) & (group_totals['GroupCode'] == 2905)]
+    assert cereals['ExportQuantity'].iloc[0] == pytest.approx(world, rel=1e-3)
@@ -0,0 +1,26 @@
+"""
+Proves del suavitzat de les sèries del panell
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.panel import IndicatorPanel
+from utils.smoothing import smooth_panel
+
+
+def test_smoothing_ignores_filler_years():
+    """El darrer any real no s'acosta a 1.0 pel farciment posterior i el farciment no canvia"""
+    ssr = pd.DataFrame({
+        'AreaCode': 1,
+        'AreaName': 'A',
+        'Year': np.arange(2009, 2017),
+        'SelfSufficiency': [0.9, 0.8, 0.7, 0.6, 0.5, 1.0, 1.0, 1.0],
+    })
+    panel = IndicatorPanel.from_frames([(ssr, ['SelfSufficiency'])])
+    smoothed = smooth_panel(panel, 'mean', 5).series('SelfSufficiency', 'A')
+
+    # Finestra centrada de 2013: només 2011-2013 són dades reals
+    assert smoothed.loc[2013] == pytest.approx(0.6)
+    assert smoothed.loc[2014:].tolist() == [1.0, 1.0, 1.0]
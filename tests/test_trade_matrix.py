@@ -0,0 +1,23 @@
+"""
+Proves de la ingesta de la matriu bilateral de comerç
+"""
+
+import numpy as np
+import pandas as pd
+
+from utils.trade_matrix import TradeMatrixStore
+
+
+def test_encode_chunk_drops_aggregate_reporters_and_partners():
+    """Ni els agregats regionals ni 'China' (351) entren al magatzem com a declarants o socis"""
+    chunk = pd.DataFrame({
+        'Reporter Country Code': [41, 351, 5000, 41, 2],
+        'Partner Country Code': [2, 2, 2, 351, 5707],
+        'Item Code': 2511,
+        'Element': 'Export Quantity',
+        'Year': 2010,
+        'Value': [1.0, 2.0, 3.0, 4.0, 5.0],
+    })
+    store = TradeMatrixStore.from_chunks([chunk])
+
+    assert np.asarray(store.area_codes).tolist() == [2, 41]
@@ -0,0 +1,144 @@
+"""
+Aggregates - Estadístiques suficients per (any, bloc regional) combinables
+Mitjanes, desviacions i mitjanes ponderades de qualsevol combinació de blocs sense tornar a llegir les files
+"""
+
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+class BlocStatistics:
+    """
+    Sumes per (any, bloc) d'un conjunt d'indicadors.
+
+    Per a cada indicador es guarden, en matrius anys × blocs, el recompte de
+    valors vàlids, la suma i la suma de quadrats (desplaçades per la mitjana
+    global de l'indicador, per estabilitat numèrica) i, si té pes, la suma de
+    pesos i la suma ponderada. Les estadístiques de qualsevol combinació de
+    blocs s'obtenen sumant columnes: O(#blocs) per any.
+    """
+
+    def __init__(self, sums: Dict[str, Dict[str, np.ndarray]], shifts: Dict[str, float],
+                 years: Sequence[int], blocs: Sequence[str]):
+        self.sums = sums
+        self.shifts = shifts
+        self.years = pd.Index(years, name='Year')
+        self.blocs = pd.Index(blocs, name='BlocRegional')
+
+    # ==========================================
+    # CONSTRUCCIÓ
+    # ==========================================
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, value_cols: List[str],
+                   weights: Optional[Dict[str, str]] = None,
+                   year_col: Optional[str] = 'Year', bloc_col: str = 'BlocRegional') -> 'BlocStatistics':
+        """
+        Calcula les sumes de tots els (any, bloc) en una sola passada.
+
+        `weights` associa cada indicador a la columna de pes (p. ex. la
+        producció); les files amb pes NaN o negatiu no compten a la mitjana
+        ponderada. Amb `year_col=None` totes les files són d'un sol "any" 0.
+        """
+        weights = weights or {}
+        years_col = df[year_col] if year_col else pd.Series(0, index=df.index)
+        year_codes, years = pd.factorize(years_col, sort=True)
+        bloc_codes, blocs = pd.factorize(df[bloc_col], sort=True)
+        has_key = (year_codes >= 0) & (bloc_codes >= 0)
+        flat = year_codes * len(blocs) + bloc_codes
+        shape = (len(years), len(blocs))
+
+        def group_sum(values: np.ndarray, mask: np.ndarray) -> np.ndarray:
+            return np.bincount(flat[mask], weights=values[mask],
+                               minlength=shape[0] * shape[1]).reshape(shape)
+
+        sums, shifts = {}, {}
+        for col in value_cols:
+            values = df[col].to_numpy(dtype=np.float64)
+            valid = has_key & ~np.isnan(values)
+            shift = float(values[valid].mean()) if valid.any() else 0.0
+            centered = values - shift
+            stats = {
+                'count': group_sum(np.ones(len(df)), valid),
+                'sum': group_sum(centered, valid),
+                'sumsq': group_sum(centered ** 2, valid),
+            }
+            if col in weights:
+                weight = df[weights[col]].to_numpy(dtype=np.float64)
+                weighted = valid & ~np.isnan(weight) & (weight >= 0)
+                stats['weight'] = group_sum(weight, weighted)
+                stats['weighted_sum'] = group_sum(weight * values, weighted)
+            sums[col], shifts[col] = stats, shift
+
+        return cls(sums, shifts, years, blocs)
+
+    # ==========================================
+    # COMBINACIÓ
+    # ==========================================
+
+    @property
+    def indicators(self) -> List[str]:
+        """Indicadors amb estadístiques"""
+        return list(self.sums)
+
+    def _bloc_mask(self, regions: Optional[List[str]] = None) -> np.ndarray:
+        """Columnes dels blocs indicats (tots si és None o ["Tots"])"""
+        if not regions or regions == ["Tots"]:
+            return np.ones(len(self.blocs), dtype=bool)
+        return self.blocs.isin(regions)
+
+    @staticmethod
+    def _derive(stats: Dict[str, np.ndarray], shift: float) -> Dict[str, np.ndarray]:
+        """Mitjana, desviació estàndard (ddof=1), recompte i mitjana ponderada a partir de les sumes"""
+        count = stats['count']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = stats['sum'] / count
+            variance = (stats['sumsq'] - stats['sum'] * mean) / (count - 1)
+            derived = {
+                'mean': mean + shift,
+                'std': np.where(count > 1, np.sqrt(np.clip(variance, 0, None)), np.nan),
+                'count': count.astype(np.int64),
+            }
+            if 'weight' in stats:
+                derived['weighted_mean'] = np.where(stats['weight'] > 0,
+                                                    stats['weighted_sum'] / stats['weight'], np.nan)
+        return derived
+
+    def combine(self, regions: Optional[List[str]] = None,
+                value_cols: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Estadístiques per any de la unió dels blocs indicats.
+
+        Retorna una taula indexada per any amb les columnes {indicador}_mean,
+        _std, _count i, si té pes, _weighted_mean.
+        """
+        mask = self._bloc_mask(regions)
+        columns = {}
+        for col in value_cols or self.indicators:
+            stats = {name: values[:, mask].sum(axis=1) for name, values in self.sums[col].items()}
+            for stat, values in self._derive(stats, self.shifts[col]).items():
+                columns[f'{col}_{stat}'] = values
+        return pd.DataFrame(columns, index=self.years)
+
+    def per_bloc(self, value_col: str, regions: Optional[List[str]] = None,
+                 pool_years: bool = False) -> pd.DataFrame:
+        """
+        Estadístiques de cada bloc en format llarg (Year, BlocRegional, mean, std, count...).
+
+        Amb `pool_years` s'acumulen tots els anys i el resultat té una fila per bloc.
+        """
+        mask = self._bloc_mask(regions)
+        stats = {name: values[:, mask] for name, values in self.sums[value_col].items()}
+        if pool_years:
+            stats = {name: values.sum(axis=0, keepdims=True) for name, values in stats.items()}
+        derived = self._derive(stats, self.shifts[value_col])
+
+        n_years, n_blocs = derived['count'].shape
+        frame = pd.DataFrame({
+            'BlocRegional': np.tile(self.blocs[mask].to_numpy(), n_years),
+            **{stat: values.ravel() for stat, values in derived.items()},
+        })
+        if not pool_years:
+            frame.insert(0, 'Year', np.repeat(self.years.to_numpy(), n_blocs))
+        return frame[frame['count'] > 0].reset_index(drop=True)
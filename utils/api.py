@@ -0,0 +1,140 @@
+"""
+API - Agregats del panell precalculats com a respostes JSON
+Reutilitza els loaders i els indicadors per servir els mateixos números que el panell
+"""
+
+import gzip
+import hashlib
+import json
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlencode
+
+import numpy as np
+import pandas as pd
+
+from utils.indicators import calculate_trade_balance, get_top_products
+
+TOP_ITEMS_N = 20
+# Mètrica de l'endpoint de top productes -> (dataset, columna de valor)
+TOP_ITEM_METRICS = {
+    'production': ('production', 'Production'),
+    'imports': ('imports', 'ImportQuantity'),
+    'exports': ('exports', 'ExportQuantity'),
+}
+
+# ==========================================
+# CLAUS DE RESPOSTA
+# ==========================================
+
+def canonical_key(path: str, params: Optional[Dict[str, str]] = None) -> str:
+    """Clau única d'una resposta: ruta i paràmetres ordenats"""
+    params = {k: v for k, v in (params or {}).items() if v is not None}
+    if not params:
+        return path
+    return f"{path}?{urlencode(sorted((k, str(v)) for k, v in params.items()))}"
+
+def frame_to_records(df: pd.DataFrame) -> List[Dict]:
+    """Converteix un DataFrame a registres JSON (NaN i infinits com a null)"""
+    clean = df.replace([np.inf, -np.inf], np.nan).astype(object)
+    clean = clean.where(pd.notna(clean), None)
+    return clean.to_dict(orient='records')
+
+# ==========================================
+# AGREGATS
+# ==========================================
+
+def ssr_by_year_bloc(ssr_data: pd.DataFrame) -> pd.DataFrame:
+    """SSR mitjana, mediana i nombre de països per any i bloc regional"""
+    if ssr_data.empty:
+        return pd.DataFrame(columns=['Year', 'BlocRegional', 'SSRMean', 'SSRMedian', 'Countries'])
+    return (ssr_data.dropna(subset=['SelfSufficiency'])
+                    .groupby(['Year', 'BlocRegional'])['SelfSufficiency']
+                    .agg(SSRMean='mean', SSRMedian='median', Countries='count')
+                    .reset_index())
+
+def footprint_by_country(footprint_data: pd.DataFrame) -> pd.DataFrame:
+    """Petjada de carboni per país i any"""
+    columns = ['Year', 'AreaCode', 'AreaName', 'BlocRegional', 'FoodFootprintCO2']
+    if footprint_data.empty:
+        return pd.DataFrame(columns=columns)
+    return footprint_data[[col for col in columns if col in footprint_data.columns]]
+
+def _trade_frame(data: pd.DataFrame, value_col: str) -> pd.DataFrame:
+    """Retorna el DataFrame o un DataFrame buit tipat amb les columnes de comerç"""
+    if not data.empty:
+        return data
+    return pd.DataFrame({'Year': pd.Series(dtype='int64'),
+                         'AreaName': pd.Series(dtype='object'),
+                         value_col: pd.Series(dtype='float64')})
+
+def _available_years(data_dict: Dict[str, pd.DataFrame], names: Iterable[str]) -> List[int]:
+    """Anys presents en algun dels datasets indicats"""
+    years = set()
+    for name in names:
+        df = data_dict.get(name, pd.DataFrame())
+        if not df.empty and 'Year' in df.columns:
+            years.update(int(year) for year in df['Year'].dropna().unique())
+    return sorted(years)
+
+# ==========================================
+# PRECÀLCUL DE RESPOSTES
+# ==========================================
+
+def build_api_payloads(data_dict: Dict[str, pd.DataFrame]) -> Dict[str, object]:
+    """
+    Precalcula totes les respostes de l'API a partir de load_all_data().
+
+    Retorna un diccionari clau canònica -> objecte JSON. Les rutes són:
+    /api/years, /api/blocs, /api/ssr[?year=&bloc=], /api/footprint[?year=],
+    /api/top-items?metric=&year= i /api/trade-balance?year=.
+    """
+    payloads: Dict[str, object] = {}
+
+    # SSR per any i bloc, amb totes les combinacions de filtres
+    ssr_table = ssr_by_year_bloc(data_dict.get('ssr', pd.DataFrame()))
+    payloads[canonical_key('/api/ssr')] = frame_to_records(ssr_table)
+    for year, group in ssr_table.groupby('Year'):
+        payloads[canonical_key('/api/ssr', {'year': int(year)})] = frame_to_records(group)
+    for bloc, group in ssr_table.groupby('BlocRegional'):
+        payloads[canonical_key('/api/ssr', {'bloc': bloc})] = frame_to_records(group)
+    for (year, bloc), group in ssr_table.groupby(['Year', 'BlocRegional']):
+        payloads[canonical_key('/api/ssr', {'year': int(year), 'bloc': bloc})] = frame_to_records(group)
+
+    # Petjada per país
+    footprint = footprint_by_country(data_dict.get('footprint', pd.DataFrame()))
+    payloads[canonical_key('/api/footprint')] = frame_to_records(footprint)
+    for year, group in footprint.groupby('Year'):
+        payloads[canonical_key('/api/footprint', {'year': int(year)})] = frame_to_records(group)
+
+    # Top productes per mètrica i any
+    for metric, (dataset, value_col) in TOP_ITEM_METRICS.items():
+        data = data_dict.get(dataset, pd.DataFrame())
+        if data.empty:
+            continue
+        for year in _available_years(data_dict, [dataset]):
+            top = get_top_products(data, value_col, n_top=TOP_ITEMS_N, year=year)
+            payloads[canonical_key('/api/top-items', {'metric': metric, 'year': year})] = frame_to_records(top)
+
+    # Balanç comercial per país i any
+    imports = _trade_frame(data_dict.get('imports', pd.DataFrame()), 'ImportQuantity')
+    exports = _trade_frame(data_dict.get('exports', pd.DataFrame()), 'ExportQuantity')
+    for year in _available_years(data_dict, ['imports', 'exports']):
+        balance = calculate_trade_balance(imports, exports, year=year)
+        payloads[canonical_key('/api/trade-balance', {'year': year})] = frame_to_records(balance)
+
+    # Índexs
+    payloads['/api/years'] = {
+        'ssr': _available_years(data_dict, ['ssr']),
+        'footprint': _available_years(data_dict, ['footprint']),
+        'trade': _available_years(data_dict, ['imports', 'exports']),
+    }
+    payloads['/api/blocs'] = sorted(ssr_table['BlocRegional'].dropna().unique().tolist())
+    payloads['/api/routes'] = sorted(payloads)
+
+    return payloads
+
+def encode_payload(payload: object) -> Tuple[bytes, bytes, str]:
+    """Serialitza una resposta: cos JSON, cos comprimit amb gzip i ETag"""
+    body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+    return body, gzip.compress(body, compresslevel=6), etag
@@ -0,0 +1,152 @@
+"""
+Diagnostics - Comptabilitat de memòria de les dades carregades i de les caches
+"""
+
+import linecache
+import tracemalloc
+from typing import Callable, Dict, Tuple
+
+import pandas as pd
+
+# ==========================================
+# MEMÒRIA DELS DATAFRAMES
+# ==========================================
+
+def frame_memory_report(data_dict: Dict[str, pd.DataFrame],
+                        estimate_category: bool = True) -> pd.DataFrame:
+    """
+    Retorna l'ús de memòria profund de cada columna de cada DataFrame.
+
+    Per a les columnes de text s'estima també la mida que tindrien com a
+    `category`, per valorar si val la pena convertir-les.
+    """
+    rows = []
+    for name, df in data_dict.items():
+        if not isinstance(df, pd.DataFrame):
+            continue
+
+        usage = df.memory_usage(deep=True, index=True)
+        rows.append({
+            'Dataset': name,
+            'Columna': '(índex)',
+            'Dtype': str(df.index.dtype),
+            'Files': len(df),
+            'Únics': None,
+            'Bytes': int(usage['Index']),
+            'Bytes si category': None
+        })
+
+        for column in df.columns:
+            series = df[column]
+            is_text = series.dtype == object or pd.api.types.is_string_dtype(series.dtype)
+            category_bytes = None
+            if estimate_category and is_text:
+                category_bytes = int(series.astype('category').memory_usage(deep=True, index=False))
+
+            rows.append({
+                'Dataset': name,
+                'Columna': column,
+                'Dtype': str(series.dtype),
+                'Files': len(df),
+                'Únics': int(series.nunique()) if is_text else None,
+                'Bytes': int(usage[column]),
+                'Bytes si category': category_bytes
+            })
+
+    report = pd.DataFrame(rows)
+    if not report.empty:
+        report = report.sort_values('Bytes', ascending=False).reset_index(drop=True)
+    return report
+
+def dataset_memory_summary(report: pd.DataFrame) -> pd.DataFrame:
+    """Agrega l'informe per columna a totals per dataset i per dtype"""
+    if report.empty:
+        return pd.DataFrame()
+
+    summary = report.pivot_table(index='Dataset', columns='Dtype', values='Bytes',
+                                 aggfunc='sum', fill_value=0)
+    summary['Total'] = summary.sum(axis=1)
+    return summary.sort_values('Total', ascending=False).reset_index()
+
+# ==========================================
+# MEMÒRIA DE LES CACHES DE STREAMLIT
+# ==========================================
+
+def cache_memory_report() -> pd.DataFrame:
+    """
+    Retorna la mida total de cada cache de Streamlit (st.cache_data i st.cache_resource).
+
+    Per a `st.cache_data` la mida és la dels valors serialitzats que es guarden;
+    cada execució en rep una còpia deserialitzada nova.
+    """
+    from streamlit.runtime.caching.cache_data_api import get_data_cache_stats_provider
+    from streamlit.runtime.caching.cache_resource_api import get_resource_cache_stats_provider
+
+    rows = []
+    for provider in (get_data_cache_stats_provider(), get_resource_cache_stats_provider()):
+        for family_stats in provider.get_stats().values():
+            for stat in family_stats:
+                rows.append({
+                    'Tipus': stat.category_name,
+                    'Cache': stat.cache_name,
+                    'Bytes': int(stat.byte_length)
+                })
+
+    report = pd.DataFrame(rows, columns=['Tipus', 'Cache', 'Bytes'])
+    if report.empty:
+        return report
+
+    report = (report.groupby(['Tipus', 'Cache'], as_index=False)
+                    .agg(Entrades=('Bytes', 'size'), Bytes=('Bytes', 'sum')))
+    return report.sort_values('Bytes', ascending=False).reset_index(drop=True)
+
+# ==========================================
+# TRACEMALLOC
+# ==========================================
+
+def trace_top_allocations(func: Callable[[], object], limit: int = 15,
+                          group_by: str = 'lineno') -> Tuple[pd.DataFrame, int]:
+    """
+    Executa `func` sota tracemalloc i retorna els principals punts d'assignació.
+
+    Retorna una taula amb les línies (o fitxers) que mantenen més memòria en
+    acabar l'execució, i el pic de memòria traçada durant l'execució (bytes).
+    """
+    already_tracing = tracemalloc.is_tracing()
+    if not already_tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    before = tracemalloc.take_snapshot()
+
+    try:
+        func()
+        after = tracemalloc.take_snapshot()
+        _, peak_bytes = tracemalloc.get_traced_memory()
+    finally:
+        if not already_tracing:
+            tracemalloc.stop()
+
+    filters = [
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap*>'),
+    ]
+    stats = after.filter_traces(filters).compare_to(before.filter_traces(filters), group_by)
+
+    rows = []
+    for stat in stats[:limit]:
+        frame = stat.traceback[0]
+        rows.append({
+            'Ubicació': f'{frame.filename}:{frame.lineno}' if group_by == 'lineno' else frame.filename,
+            'Codi': linecache.getline(frame.filename, frame.lineno).strip() if group_by == 'lineno' else '',
+            'Bytes': int(stat.size_diff),
+            'Blocs': int(stat.count_diff)
+        })
+
+    return pd.DataFrame(rows, columns=['Ubicació', 'Codi', 'Bytes', 'Blocs']), int(peak_bytes)
+
+def format_bytes(n_bytes: float) -> str:
+    """Formata una mida en bytes amb la unitat adequada"""
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if abs(n_bytes) < 1024 or unit == 'GB':
+            return f"{n_bytes:.1f} {unit}" if unit != 'B' else f"{int(n_bytes)} B"
+        n_bytes /= 1024
@@ -0,0 +1,144 @@
+"""
+Export - Exportació en streaming de les dades filtrades (CSV/Parquet)
+Filtra i serialitza per blocs de files, sense materialitzar el resultat sencer
+"""
+
+import gzip
+import io
+import tempfile
+from typing import BinaryIO, Iterable, Iterator, List, Optional
+
+import pandas as pd
+
+from utils.loaders import prepare_regional_mappings
+
+DEFAULT_CHUNK_SIZE = 100_000
+# Els fitxers de descàrrega passen a disc a partir d'aquesta mida
+SPOOL_MAX_BYTES = 16 * 1024 * 1024
+
+EXPORT_FORMATS = {
+    'csv': {'extension': 'csv.gz', 'mime': 'application/gzip'},
+    'parquet': {'extension': 'parquet', 'mime': 'application/vnd.apache.parquet'},
+}
+
+# ==========================================
+# FILTRAT PER BLOCS DE FILES
+# ==========================================
+
+def _chunk_mask(chunk: pd.DataFrame, year: Optional[int],
+                regions: Optional[List[str]]) -> Optional[pd.Series]:
+    """Construeix la màscara d'any i blocs regionals d'un bloc de files"""
+    mask = None
+    if year is not None and 'Year' in chunk.columns:
+        mask = chunk['Year'] == year
+
+    if regions and regions != ["Tots"]:
+        if 'BlocRegional' in chunk.columns:
+            blocs = chunk['BlocRegional']
+        elif 'AreaName' in chunk.columns:
+            _, country_to_bloc_map = prepare_regional_mappings()
+            blocs = (chunk['AreaName'].astype(str).str.lower().str.strip()
+                     .map(country_to_bloc_map).fillna('Altres'))
+        else:
+            blocs = None
+
+        if blocs is not None:
+            region_mask = blocs.isin(regions)
+            mask = region_mask if mask is None else mask & region_mask
+
+    return mask
+
+def filter_chunks(chunks: Iterable[pd.DataFrame], year: Optional[int] = None,
+                  regions: Optional[List[str]] = None) -> Iterator[pd.DataFrame]:
+    """Aplica el filtre d'any i blocs a cada bloc i descarta els blocs buits"""
+    for chunk in chunks:
+        mask = _chunk_mask(chunk, year, regions)
+        filtered = chunk if mask is None else chunk[mask]
+        if not filtered.empty:
+            yield filtered
+
+def iter_frame_chunks(df: pd.DataFrame, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    """Recorre un DataFrame en memòria per blocs de files"""
+    for start in range(0, len(df), chunk_size):
+        yield df.iloc[start:start + chunk_size]
+
+def iter_csv_file_chunks(path: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    """Llegeix un fitxer CSV (o CSV.gz) per blocs de files sense carregar-lo sencer"""
+    with pd.read_csv(path, chunksize=chunk_size) as reader:
+        for chunk in reader:
+            yield chunk
+
+# ==========================================
+# SERIALITZACIÓ EN STREAMING
+# ==========================================
+
+def write_csv_stream(chunks: Iterable[pd.DataFrame], fileobj: BinaryIO) -> int:
+    """Escriu els blocs com a CSV (capçalera només al primer bloc) i retorna les files"""
+    n_rows = 0
+    for chunk in chunks:
+        fileobj.write(chunk.to_csv(index=False, header=(n_rows == 0)).encode('utf-8'))
+        n_rows += len(chunk)
+    return n_rows
+
+def write_parquet_stream(chunks: Iterable[pd.DataFrame], fileobj: BinaryIO) -> int:
+    """Escriu cada bloc com un row group Parquet i retorna les files"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    schema = None
+    n_rows = 0
+    try:
+        for chunk in chunks:
+            if writer is None:
+                schema = pa.Schema.from_pandas(chunk, preserve_index=False)
+                writer = pq.ParquetWriter(fileobj, schema, compression='snappy')
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            n_rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return n_rows
+
+def write_export(chunks: Iterable[pd.DataFrame], fileobj: BinaryIO,
+                 fmt: str = 'csv', compress: bool = False) -> int:
+    """Escriu els blocs filtrats en el format indicat i retorna les files exportades"""
+    if fmt == 'parquet':
+        return write_parquet_stream(chunks, fileobj)
+    if fmt != 'csv':
+        raise ValueError(f"Format d'exportació no suportat: {fmt}")
+
+    if not compress:
+        return write_csv_stream(chunks, fileobj)
+    with gzip.GzipFile(fileobj=fileobj, mode='wb') as gz:
+        return write_csv_stream(chunks, gz)
+
+# ==========================================
+# DESCÀRREGUES DES DEL PANELL
+# ==========================================
+
+def build_download_file(df: pd.DataFrame, fmt: str = 'csv', year: Optional[int] = None,
+                        regions: Optional[List[str]] = None,
+                        chunk_size: int = DEFAULT_CHUNK_SIZE) -> io.IOBase:
+    """
+    Genera el fitxer de descàrrega d'un DataFrame filtrat.
+
+    El filtrat i la serialització es fan per blocs i el resultat (CSV
+    comprimit o Parquet) es desa en un fitxer temporal que passa a disc
+    quan supera SPOOL_MAX_BYTES.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    chunks = filter_chunks(iter_frame_chunks(df, chunk_size), year, regions)
+    write_export(chunks, spool, fmt=fmt, compress=(fmt == 'csv'))
+    spool.seek(0)
+    return spool
+
+def export_file_name(dataset: str, fmt: str, year: Optional[int] = None,
+                     regions: Optional[List[str]] = None) -> str:
+    """Construeix un nom de fitxer descriptiu per a una exportació"""
+    parts = [dataset]
+    if year is not None:
+        parts.append(str(year))
+    if regions and regions != ["Tots"]:
+        parts.append('-'.join(region.replace(' ', '_') for region in regions))
+    return '_'.join(parts) + '.' + EXPORT_FORMATS[fmt]['extension']
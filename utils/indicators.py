@@ -2,14 +2,30 @@
 Indicators - Funcions per calcular indicadors i mètriques
 """
 
+import warnings
+
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple, Union
+
+from utils.aggregates import BlocStatistics
+from utils.panel import IndicatorPanel
+from utils.items import country_item_rows
+
+PanelOrFrame = Union[pd.DataFrame, IndicatorPanel]
 
-def calculate_correlations(df1: pd.DataFrame, df2: pd.DataFrame, 
+def as_frame(data: PanelOrFrame, columns: List[str], year: Optional[int] = None) -> pd.DataFrame:
+    """Passa un IndicatorPanel a format llarg (els DataFrames es retornen tal qual)"""
+    if isinstance(data, IndicatorPanel):
+        return data.to_frame([col for col in columns if col in data.indicators], year=year)
+    return data
+
+def calculate_correlations(df1: PanelOrFrame, df2: PanelOrFrame, 
                          col1: str, col2: str, merge_on: str = 'AreaName') -> Dict:
     """Calcula correlacions entre dues variables de diferents DataFrames"""
     
+    df1 = as_frame(df1, [col1])
+    df2 = as_frame(df2, [col2])
     merged = pd.merge(df1, df2, on=merge_on, how='inner')
     merged_clean = merged.dropna(subset=[col1, col2])
     
@@ -17,18 +33,9 @@ def calculate_correlations(df1: pd.DataFrame, df2: pd.DataFrame,
         return {'correlation': np.nan, 'p_value': np.nan, 'n_samples': 0}
     
     correlation = merged_clean[col1].corr(merged_clean[col2])
-      # Càlcul simplificat del p-value (aproximació)
+    # P-value exacte amb la distribució t de Student
     n = len(merged_clean)
-    if abs(correlation) >= 0.999:  # Evitar divisió per zero
-        p_value = 0.0
-    else:
-        try:
-            from scipy import stats
-            t_stat = correlation * np.sqrt((n - 2) / (1 - correlation**2))
-            p_value = 2 * (1 - stats.norm.cdf(abs(t_stat)))
-        except ImportError:
-            # Fallback si scipy no està disponible
-            p_value = np.nan
+    p_value = float(correlation_p_values(correlation, n))
     
     return {
         'correlation': correlation,
@@ -37,6 +44,289 @@ def calculate_correlations(df1: pd.DataFrame, df2: pd.DataFrame,
         'strength': interpret_correlation_strength(correlation)
     }
 
+# ==========================================
+# MOTOR DE CORRELACIONS PER LOTS
+# ==========================================
+
+CORRELATION_INDICATORS = ['SelfSufficiency', 'FoodFootprintCO2', 'WomenAgriShare']
+GLOBAL_GROUP = 'Tots'
+# Variància relativa (n·Σx² - (Σx)²) / (n·Σx²) per sota de la qual la mostra es considera constant
+RELATIVE_VARIANCE_EPS = 1e-10
+
+def correlation_p_values(r: np.ndarray, n: np.ndarray) -> np.ndarray:
+    """P-valor bilateral exacte (t de Student amb n-2 graus de llibertat) de coeficients r"""
+    r = np.asarray(r, dtype=np.float64)
+    n = np.asarray(n, dtype=np.float64)
+    try:
+        from scipy import stats
+    except ImportError:
+        # Fallback si scipy no està disponible
+        return np.full(r.shape, np.nan)
+    
+    dof = n - 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t_stat = r * np.sqrt(dof / (1 - r ** 2))
+        p_value = 2 * stats.t.sf(np.abs(t_stat), dof)
+    # |r| = 1 dona t infinit: p-valor 0
+    p_value = np.where(np.abs(r) >= 1, 0.0, p_value)
+    return np.where(dof > 0, p_value, np.nan)
+
+def _group_membership(panel: IndicatorPanel) -> Tuple[np.ndarray, np.ndarray]:
+    """Noms dels grups (global i cada bloc) i matriu de pertinença grups × països"""
+    blocs = np.unique(panel.blocs)
+    names = np.concatenate([[GLOBAL_GROUP], blocs])
+    membership = np.vstack([np.ones(len(panel.blocs), dtype=bool),
+                            panel.blocs[None, :] == blocs[:, None]])
+    return names, membership.astype(np.float64)
+
+def _pearson_sums(x: np.ndarray, y: np.ndarray, membership: np.ndarray) -> Dict[str, np.ndarray]:
+    """Sumes suficients (n, Σx, Σy, Σx², Σy², Σxy) per grup i any dels parells vàlids"""
+    valid = ~np.isnan(x) & ~np.isnan(y)
+    # Centrar millora l'estabilitat numèrica de les sumes de quadrats
+    x = np.where(valid, x - np.nanmean(x[valid]) if valid.any() else x, 0.0)
+    y = np.where(valid, y - np.nanmean(y[valid]) if valid.any() else y, 0.0)
+    return {
+        'n': membership @ valid,
+        'sx': membership @ x,
+        'sy': membership @ y,
+        'sxx': membership @ (x * x),
+        'syy': membership @ (y * y),
+        'sxy': membership @ (x * y),
+    }
+
+def _pearson_from_sums(sums: Dict[str, np.ndarray], min_samples: int) -> np.ndarray:
+    """Coeficient de Pearson a partir de les sumes suficients"""
+    n = sums['n']
+    cov = n * sums['sxy'] - sums['sx'] * sums['sy']
+    var_x = n * sums['sxx'] - sums['sx'] ** 2
+    var_y = n * sums['syy'] - sums['sy'] ** 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r = cov / np.sqrt(var_x * var_y)
+    r = np.clip(r, -1, 1)
+    # Les sumes es centren amb la mitjana de tots els anys: una mostra constant
+    # (p. ex. l'SSR de farciment posterior a 2013) deixa una variància de soroll
+    # d'arrodoniment, que es compara amb la magnitud de n·Σx² en lloc de amb 0
+    varies_x = var_x > RELATIVE_VARIANCE_EPS * n * sums['sxx']
+    varies_y = var_y > RELATIVE_VARIANCE_EPS * n * sums['syy']
+    return np.where((n >= min_samples) & varies_x & varies_y, r, np.nan)
+
+def _masked_ranks(values: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    """Rangs per columna (any) dels valors dins la màscara, amb empats promitjats"""
+    masked = np.where(mask, values, np.nan)
+    return pd.DataFrame(masked).rank(axis=0).to_numpy()
+
+def calculate_correlation_table(panel: IndicatorPanel, indicators: Optional[List[str]] = None,
+                                min_samples: int = 5) -> pd.DataFrame:
+    """
+    Calcula les correlacions de Pearson i Spearman de tots els anys, blocs i parells d'indicadors.
+
+    Les correlacions de cada (any, bloc, parell) es calculen alhora sobre les
+    matrius del panell a partir de sumes suficients; el grup 'Tots' inclou tots
+    els països. Els p-valors són exactes (t de Student amb n-2 graus de
+    llibertat). Els grups amb menys de `min_samples` països donen NaN.
+    """
+    indicators = [ind for ind in (indicators or CORRELATION_INDICATORS) if ind in panel.indicators]
+    names, membership = _group_membership(panel)
+    n_groups, n_years = len(names), len(panel.years)
+    
+    frames = []
+    for i, first in enumerate(indicators):
+        for second in indicators[i + 1:]:
+            x = panel.matrix(first).astype(np.float64)
+            y = panel.matrix(second).astype(np.float64)
+            sums = _pearson_sums(x, y, membership)
+            pearson = _pearson_from_sums(sums, min_samples)
+            
+            # Spearman: Pearson sobre els rangs dins de cada grup (i parell vàlid)
+            valid = ~np.isnan(x) & ~np.isnan(y)
+            spearman = np.full((n_groups, n_years), np.nan)
+            for g, member in enumerate(membership.astype(bool)):
+                mask = valid & member[:, None]
+                rank_sums = _pearson_sums(_masked_ranks(x, mask), _masked_ranks(y, mask),
+                                          membership[g:g + 1])
+                spearman[g] = _pearson_from_sums(rank_sums, min_samples)[0]
+            
+            n = sums['n']
+            frames.append(pd.DataFrame({
+                'Year': np.tile(panel.years.to_numpy(), n_groups),
+                'BlocRegional': np.repeat(names, n_years),
+                'Indicator1': first,
+                'Indicator2': second,
+                'N': n.ravel().astype(int),
+                'Pearson': pearson.ravel(),
+                'PearsonPValue': correlation_p_values(pearson, n).ravel(),
+                'Spearman': spearman.ravel(),
+                'SpearmanPValue': correlation_p_values(spearman, n).ravel(),
+            }))
+    
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
+
+def calculate_rolling_correlations(panel: IndicatorPanel, window: int = 5,
+                                   indicators: Optional[List[str]] = None,
+                                   min_samples: int = 5) -> pd.DataFrame:
+    """
+    Calcula la correlació de Pearson en finestres mòbils de `window` anys.
+
+    Per a cada any final, bloc i parell d'indicadors s'agrupen totes les
+    observacions país-any de la finestra. Les sumes suficients per any es
+    converteixen en sumes de finestra amb sumes acumulades.
+    """
+    indicators = [ind for ind in (indicators or CORRELATION_INDICATORS) if ind in panel.indicators]
+    names, membership = _group_membership(panel)
+    if len(panel.years) < window:
+        return pd.DataFrame()
+    end_years = panel.years.to_numpy()[window - 1:]
+    
+    frames = []
+    for i, first in enumerate(indicators):
+        for second in indicators[i + 1:]:
+            sums = _pearson_sums(panel.matrix(first).astype(np.float64),
+                                 panel.matrix(second).astype(np.float64), membership)
+            window_sums = {}
+            for key, value in sums.items():
+                cumulative = np.concatenate([np.zeros((value.shape[0], 1)),
+                                             np.cumsum(value, axis=1)], axis=1)
+                window_sums[key] = cumulative[:, window:] - cumulative[:, :-window]
+            pearson = _pearson_from_sums(window_sums, min_samples)
+            
+            frames.append(pd.DataFrame({
+                'Year': np.tile(end_years, len(names)),
+                'BlocRegional': np.repeat(names, len(end_years)),
+                'Indicator1': first,
+                'Indicator2': second,
+                'N': window_sums['n'].ravel().astype(int),
+                'Pearson': pearson.ravel(),
+                'PearsonPValue': correlation_p_values(pearson, window_sums['n']).ravel(),
+            }))
+    
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
+
+# ==========================================
+# INCERTESA DE LES CORRELACIONS (BOOTSTRAP I PERMUTACIONS)
+# ==========================================
+
+RESAMPLE_CHUNK = 500
+
+def _rowwise_correlation(x: np.ndarray, y: np.ndarray, method: str = 'pearson') -> np.ndarray:
+    """Correlació de cada fila de dues matrius (remostres × observacions)"""
+    if method == 'spearman':
+        x = pd.DataFrame(x).rank(axis=1).to_numpy()
+        y = pd.DataFrame(y).rank(axis=1).to_numpy()
+    x = x - x.mean(axis=1, keepdims=True)
+    y = y - y.mean(axis=1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (x * y).sum(axis=1) / np.sqrt((x * x).sum(axis=1) * (y * y).sum(axis=1))
+
+def _resample_chunk(x: np.ndarray, y: np.ndarray, n_resamples: int, seed: np.random.SeedSequence,
+                    method: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Correlacions de `n_resamples` remostres bootstrap i permutacions d'un bloc"""
+    rng = np.random.default_rng(seed)
+    n = len(x)
+    # Totes les remostres alhora: una matriu d'índexs (remostres × observacions)
+    idx = rng.integers(0, n, size=(n_resamples, n))
+    boot = _rowwise_correlation(x[idx], y[idx], method)
+    shuffled = rng.permuted(np.broadcast_to(y, (n_resamples, n)), axis=1)
+    perm = _rowwise_correlation(np.broadcast_to(x, (n_resamples, n)), shuffled, method)
+    return boot, perm
+
+def correlation_uncertainty(x: np.ndarray, y: np.ndarray, method: str = 'pearson',
+                            n_resamples: int = 2000, confidence: float = 0.95,
+                            seed: int = 42, workers: int = 1) -> Dict:
+    """
+    Interval de confiança bootstrap (percentils) i p-valor per permutacions d'una correlació.
+
+    Les remostres es generen per blocs de RESAMPLE_CHUNK amb llavors derivades de
+    `seed`, de manera que el resultat és el mateix amb qualsevol nombre de
+    `workers`; amb més d'un, els blocs es reparteixen en un pool de processos
+    (només compensa amb moltes remostres o mostres grans).
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    valid = ~np.isnan(x) & ~np.isnan(y)
+    x, y = x[valid], y[valid]
+    n = len(x)
+    result = {'correlation': np.nan, 'ci_low': np.nan, 'ci_high': np.nan,
+              'perm_p_value': np.nan, 'n_samples': n, 'n_resamples': n_resamples}
+    if n < 3:
+        return result
+    result['correlation'] = float(_rowwise_correlation(x[None, :], y[None, :], method)[0])
+    
+    sizes = [min(RESAMPLE_CHUNK, n_resamples - start) for start in range(0, n_resamples, RESAMPLE_CHUNK)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    if workers > 1 and len(sizes) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunks = list(pool.map(_resample_chunk, [x] * len(sizes), [y] * len(sizes),
+                                   sizes, seeds, [method] * len(sizes)))
+    else:
+        chunks = [_resample_chunk(x, y, size, chunk_seed, method)
+                  for size, chunk_seed in zip(sizes, seeds)]
+    boot = np.concatenate([chunk[0] for chunk in chunks])
+    perm = np.concatenate([chunk[1] for chunk in chunks])
+    
+    # Les remostres amb variància nul·la (tots els índexs iguals) s'ignoren
+    boot = boot[~np.isnan(boot)]
+    perm = perm[~np.isnan(perm)]
+    alpha = (1 - confidence) / 2
+    if len(boot):
+        result['ci_low'], result['ci_high'] = np.quantile(boot, [alpha, 1 - alpha]).tolist()
+    if len(perm):
+        # P-valor bilateral com a scipy.stats.permutation_test (el doble de la cua
+        # menor, perquè la distribució nul·la pot ser asimètrica) amb la correcció +1
+        r, tol = result['correlation'], 1e-12
+        greater = (np.sum(perm >= r - tol) + 1) / (len(perm) + 1)
+        less = (np.sum(perm <= r + tol) + 1) / (len(perm) + 1)
+        result['perm_p_value'] = float(min(1.0, 2 * min(greater, less)))
+    return result
+
+def calculate_correlation_uncertainty(panel: IndicatorPanel, year: int,
+                                      indicators: Optional[List[str]] = None,
+                                      regions: Optional[List[str]] = None,
+                                      n_resamples: int = 2000, confidence: float = 0.95,
+                                      seed: int = 42, workers: int = 1) -> pd.DataFrame:
+    """Interval bootstrap i p-valor per permutacions de Pearson per a cada parell d'indicadors d'un any"""
+    indicators = [ind for ind in (indicators or CORRELATION_INDICATORS) if ind in panel.indicators]
+    if year not in panel.years:
+        return pd.DataFrame()
+    mask = panel.bloc_mask(regions)
+    
+    rows = []
+    for i, first in enumerate(indicators):
+        for second in indicators[i + 1:]:
+            result = correlation_uncertainty(panel.cross_section(first, year)[mask],
+                                             panel.cross_section(second, year)[mask],
+                                             n_resamples=n_resamples, confidence=confidence,
+                                             seed=seed, workers=workers)
+            rows.append({
+                'Year': year,
+                'BlocRegional': GLOBAL_GROUP if not regions or regions == [GLOBAL_GROUP]
+                                else ', '.join(regions),
+                'Indicator1': first,
+                'Indicator2': second,
+                'N': result['n_samples'],
+                'Pearson': result['correlation'],
+                'CILow': result['ci_low'],
+                'CIHigh': result['ci_high'],
+                'PermPValue': result['perm_p_value'],
+            })
+    return pd.DataFrame(rows)
+
+def lookup_correlation(table: pd.DataFrame, year: int, first: str, second: str,
+                       bloc: str = GLOBAL_GROUP) -> Optional[pd.Series]:
+    """Fila d'una taula de correlacions per any, bloc i parell (en qualsevol ordre)"""
+    if table.empty:
+        return None
+    pair = (((table['Indicator1'] == first) & (table['Indicator2'] == second))
+            | ((table['Indicator1'] == second) & (table['Indicator2'] == first)))
+    rows = table[pair & (table['Year'] == year) & (table['BlocRegional'] == bloc)]
+    if rows.empty or pd.isna(rows['Pearson'].iloc[0]):
+        return None
+    return rows.iloc[0]
+
 def interpret_correlation_strength(correlation: float) -> str:
     """Interpreta la força d'una correlació"""
     abs_corr = abs(correlation)
@@ -50,38 +340,145 @@ def interpret_correlation_strength(correlation: float) -> str:
     else:
         return 'Molt feble'
 
-def calculate_yearly_growth(df: pd.DataFrame, value_col: str, 
+def combine_group_keys(df: pd.DataFrame, group_cols: List[str]) -> Tuple[np.ndarray, np.ndarray, List]:
+    """
+    Codifica les columnes de grup en una sola clau entera per fila.
+
+    Es factoritza cada columna per separat (molt més ràpid que factoritzar
+    tuples) i es combinen els codis, de manera que l'ordre de les claus és el
+    d'un groupby. Retorna les claus, la màscara de files sense NaN a les
+    columnes de grup (que un groupby descartaria) i els nivells per descodificar.
+    """
+    combined = np.zeros(len(df), dtype=np.int64)
+    has_key = np.ones(len(df), dtype=bool)
+    levels = []
+    for col in group_cols:
+        col_codes, uniques = pd.factorize(df[col], sort=True)
+        combined = combined * len(uniques) + col_codes
+        has_key &= col_codes >= 0
+        levels.append((col, uniques))
+    return combined, has_key, levels
+
+def decode_group_keys(group_keys: np.ndarray, levels: List) -> pd.DataFrame:
+    """Descodifica claus de combine_group_keys() a les columnes de grup"""
+    columns = {}
+    remaining = group_keys
+    for col, uniques in reversed(levels):
+        remaining, col_codes = np.divmod(remaining, len(uniques))
+        columns[col] = uniques[col_codes]
+    return pd.DataFrame({col: columns[col] for col, _ in levels})
+
+def calculate_growth_table(df: PanelOrFrame, value_col: str,
+                           group_cols: List[str] = ['AreaName'],
+                           start_year: Optional[int] = None,
+                           end_year: Optional[int] = None,
+                           year_col: str = 'Year') -> pd.DataFrame:
+    """
+    Calcula la CAGR de tots els grups en una sola passada vectoritzada.
+
+    Per a cada grup es fan servir el primer i l'últim any amb valor vàlid dins
+    la finestra [start_year, end_year], i l'exponent és el nombre d'anys entre
+    tots dos (no el nombre de files), de manera que els buits de la sèrie no
+    esbiaixen la taxa. La CAGR és NaN si hi ha menys de dos punts vàlids o si
+    el valor inicial no és positiu.
+    """
+    df = as_frame(df, [value_col])
+    columns = group_cols + ['growth_rate', 'first_year', 'last_year',
+                            'first_value', 'last_value', 'n_points', 'gap_years']
+    if df.empty:
+        return pd.DataFrame(columns=columns)
+    
+    years = df[year_col].to_numpy()
+    in_window = np.ones(len(df), dtype=bool)
+    if start_year is not None:
+        in_window &= years >= start_year
+    if end_year is not None:
+        in_window &= years <= end_year
+    df = df[in_window]
+    
+    # Clau entera per grup (inclou els grups sense cap valor vàlid)
+    combined, has_key, levels = combine_group_keys(df, group_cols)
+    combined = combined[has_key]
+    values = df[value_col].to_numpy(dtype=np.float64)[has_key]
+    years = df[year_col].to_numpy()[has_key]
+    
+    # Una sola ordenació per (grup, any): el primer i l'últim punt vàlid de
+    # cada tram són els extrems de la sèrie
+    order = np.lexsort((years, combined))
+    sorted_keys = combined[order]
+    starts = np.ones(len(sorted_keys), dtype=bool)
+    starts[1:] = sorted_keys[1:] != sorted_keys[:-1]
+    group_keys = sorted_keys[starts]
+    codes = np.cumsum(starts) - 1
+    n_groups = len(group_keys)
+    
+    values, years = values[order], years[order]
+    valid = ~np.isnan(values)
+    codes_v, years_v, values_v = codes[valid], years[valid], values[valid]
+    n_points = np.bincount(codes_v, minlength=n_groups)
+    last_pos = np.cumsum(n_points) - 1
+    first_pos = last_pos - n_points + 1
+    has_points = n_points > 0
+    
+    first_year = np.full(n_groups, np.nan)
+    last_year = np.full(n_groups, np.nan)
+    first_value = np.full(n_groups, np.nan)
+    last_value = np.full(n_groups, np.nan)
+    first_year[has_points] = years_v[first_pos[has_points]]
+    last_year[has_points] = years_v[last_pos[has_points]]
+    first_value[has_points] = values_v[first_pos[has_points]]
+    last_value[has_points] = values_v[last_pos[has_points]]
+    
+    span = last_year - first_year
+    computable = (n_points >= 2) & (span > 0) & (first_value > 0) & (last_value >= 0)
+    growth_rate = np.full(n_groups, np.nan)
+    growth_rate[computable] = ((last_value[computable] / first_value[computable])
+                               ** (1 / span[computable]) - 1) * 100
+    
+    result = decode_group_keys(group_keys, levels)
+    result['growth_rate'] = growth_rate
+    result['first_year'] = first_year
+    result['last_year'] = last_year
+    result['first_value'] = first_value
+    result['last_value'] = last_value
+    result['n_points'] = n_points
+    # Anys absents entre el primer i l'últim punt vàlid
+    result['gap_years'] = np.where(has_points, span + 1 - n_points, np.nan)
+    
+    return result[columns]
+
+def calculate_yearly_growth(df: PanelOrFrame, value_col: str, 
                           group_cols: List[str] = ['AreaName']) -> pd.DataFrame:
     """Calcula el creixement anual per grups"""
     
-    def growth_rate(series):
-        if len(series) < 2:
-            return np.nan
-        return ((series.iloc[-1] / series.iloc[0]) ** (1 / (len(series) - 1)) - 1) * 100
-    
-    growth_data = df.groupby(group_cols)[value_col].apply(growth_rate).reset_index()
-    growth_data.columns = group_cols + ['growth_rate']
-    
-    return growth_data
+    growth_data = calculate_growth_table(df, value_col, group_cols)
+    return growth_data[group_cols + ['growth_rate']]
 
-def calculate_regional_averages(df: pd.DataFrame, value_cols: List[str], 
+def calculate_regional_averages(df: PanelOrFrame, value_cols: List[str], 
                               regional_col: str = 'BlocRegional') -> pd.DataFrame:
     """Calcula mitjanes per blocs regionals"""
     
+    df = as_frame(df, value_cols)
+    
     if regional_col not in df.columns:
         return pd.DataFrame()
     
-    regional_stats = df.groupby(regional_col)[value_cols].agg(['mean', 'std', 'count']).round(3)
-    
-    # Aplanar les columnes multinivell
-    regional_stats.columns = [f'{col}_{stat}' for col, stat in regional_stats.columns]
-    regional_stats = regional_stats.reset_index()
+    # Sumes per bloc (tots els anys junts) en una sola passada
+    stats = BlocStatistics.from_frame(df, value_cols, year_col=None, bloc_col=regional_col)
+    regional_stats = pd.DataFrame({regional_col: stats.blocs.to_numpy()})
+    for col in value_cols:
+        derived = stats.per_bloc(col, pool_years=True).set_index('BlocRegional').reindex(stats.blocs)
+        regional_stats[f'{col}_mean'] = derived['mean'].to_numpy()
+        regional_stats[f'{col}_std'] = derived['std'].to_numpy()
+        regional_stats[f'{col}_count'] = derived['count'].fillna(0).astype(int).to_numpy()
     
-    return regional_stats
+    return regional_stats.round(3)
 
-def identify_outliers(df: pd.DataFrame, value_col: str, method: str = 'iqr') -> pd.DataFrame:
+def identify_outliers(df: PanelOrFrame, value_col: str, method: str = 'iqr') -> pd.DataFrame:
     """Identifica valors atípics en un DataFrame"""
     
+    df = as_frame(df, [value_col])
+    
     df_clean = df.dropna(subset=[value_col])
     
     if method == 'iqr':
@@ -100,11 +497,79 @@ def identify_outliers(df: pd.DataFrame, value_col: str, method: str = 'iqr') ->
     
     return outliers
 
-def calculate_sustainability_index(ssr_data: pd.DataFrame, 
-                                 footprint_data: pd.DataFrame,
+def _sorted_group_quantile(values: np.ndarray, starts: np.ndarray, counts: np.ndarray,
+                           q: float) -> np.ndarray:
+    """Quantil (interpolació lineal) de cada grup d'un vector ordenat per (grup, valor)"""
+    position = starts + q * (counts - 1)
+    lower = np.floor(position).astype(np.int64)
+    upper = np.ceil(position).astype(np.int64)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+def calculate_grouped_outliers(df: PanelOrFrame, value_col: str,
+                               group_cols: List[str] = ['Year', 'BlocRegional'],
+                               iqr_factor: float = 1.5, mad_threshold: float = 3.5,
+                               min_group_size: int = 5) -> pd.DataFrame:
+    """
+    Marca els valors atípics de cada grup (per defecte, any × bloc) en una sola passada.
+
+    Els quartils, la mediana i la MAD de tots els grups surten d'un únic
+    ordenament per (grup, valor). Cada fila rep els límits IQR del seu grup
+    (Q1 - iqr_factor·IQR, Q3 + iqr_factor·IQR) i el z-score robust
+    0.6745·(x - mediana)/MAD; és atípica per MAD si |z| > mad_threshold. Els
+    grups amb menys de `min_group_size` valors no es marquen.
+    """
+    df = as_frame(df, [value_col])
+    group_keys, has_key, _ = combine_group_keys(df, group_cols)
+    values = df[value_col].to_numpy(dtype=np.float64)
+    valid = has_key & ~np.isnan(values)
+    result = df[valid].reset_index(drop=True)
+    keys, values = group_keys[valid], values[valid]
+    
+    order = np.lexsort((values, keys))
+    sorted_keys, sorted_values = keys[order], values[order]
+    _, starts, inverse, counts = np.unique(sorted_keys, return_index=True,
+                                           return_inverse=True, return_counts=True)
+    q1 = _sorted_group_quantile(sorted_values, starts, counts, 0.25)
+    median = _sorted_group_quantile(sorted_values, starts, counts, 0.5)
+    q3 = _sorted_group_quantile(sorted_values, starts, counts, 0.75)
+    
+    # MAD: mediana de les desviacions absolutes, reordenant dins de cada grup
+    deviations = np.abs(sorted_values - median[inverse])
+    deviation_order = np.lexsort((deviations, sorted_keys))
+    mad = _sorted_group_quantile(deviations[deviation_order], starts, counts, 0.5)
+    
+    # Estadístiques de grup tornades a l'ordre de les files
+    row_group = np.empty(len(values), dtype=np.int64)
+    row_group[order] = inverse
+    enough = counts[row_group] >= min_group_size
+    iqr = q3 - q1
+    lower = np.where(enough, (q1 - iqr_factor * iqr)[row_group], np.nan)
+    upper = np.where(enough, (q3 + iqr_factor * iqr)[row_group], np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        robust_z = 0.6745 * (values - median[row_group]) / mad[row_group]
+    # Amb MAD nul·la (més de la meitat dels valors iguals) el z-score no és informatiu
+    robust_z = np.where(enough & (mad[row_group] > 0), robust_z, np.nan)
+    
+    result['GroupSize'] = counts[row_group]
+    result['GroupMedian'] = median[row_group]
+    result['IQRLower'] = lower
+    result['IQRUpper'] = upper
+    result['RobustZ'] = robust_z
+    result['IQROutlier'] = (values < lower) | (values > upper)
+    result['MADOutlier'] = np.abs(np.nan_to_num(robust_z)) > mad_threshold
+    return result
+
+def calculate_sustainability_index(ssr_data: PanelOrFrame, 
+                                 footprint_data: Optional[PanelOrFrame] = None,
                                  year: int = 2020) -> pd.DataFrame:
     """Calcula un índex de sostenibilitat combinant SSR i petjada de carboni"""
     
+    # Amb un panell, les dues variables surten de la mateixa matriu
+    if footprint_data is None:
+        footprint_data = ssr_data
+    ssr_data = as_frame(ssr_data, ['SelfSufficiency'], year)
+    footprint_data = as_frame(footprint_data, ['FoodFootprintCO2'], year)
+    
     # Filtrar per any
     ssr_year = ssr_data[ssr_data['Year'] == year]
     footprint_year = footprint_data[footprint_data['Year'] == year]
@@ -134,13 +599,108 @@ def calculate_sustainability_index(ssr_data: pd.DataFrame,
     
     return merged[['AreaName', 'SustainabilityIndex']].sort_values('SustainabilityIndex', ascending=False)
 
+# Components de l'índex de sostenibilitat: pes per defecte i sentit (-1 si menys és millor)
+SUSTAINABILITY_COMPONENTS = {
+    'SelfSufficiency': {'weight': 0.6, 'direction': 1},
+    'FoodFootprintCO2': {'weight': 0.4, 'direction': -1},
+    'WomenAgriShare': {'weight': 0.0, 'direction': 1},
+}
+NORMALIZATION_MODES = ['minmax', 'rank', 'zscore']
+
+def normalize_columns(matrix: np.ndarray, mode: str = 'minmax') -> np.ndarray:
+    """
+    Normalitza cada columna (any) d'una matriu països × anys ignorant els NaN.
+
+    'minmax' escala a [0, 1], 'rank' dona el percentil del rang (0 el més baix,
+    1 el més alt, empats promitjats) i 'zscore' resta la mitjana i divideix per
+    la desviació estàndard de l'any.
+    """
+    matrix = matrix.astype(np.float64)
+    with warnings.catch_warnings(), np.errstate(divide='ignore', invalid='ignore'):
+        # Els anys sense cap dada donen NaN (i un avís "All-NaN slice")
+        warnings.simplefilter('ignore', RuntimeWarning)
+        if mode == 'minmax':
+            low = np.nanmin(matrix, axis=0)
+            return (matrix - low) / (np.nanmax(matrix, axis=0) - low)
+        if mode == 'rank':
+            ranks = pd.DataFrame(matrix).rank(axis=0).to_numpy()
+            counts = np.sum(~np.isnan(matrix), axis=0)
+            return (ranks - 1) / (counts - 1)
+        if mode == 'zscore':
+            return (matrix - np.nanmean(matrix, axis=0)) / np.nanstd(matrix, axis=0, ddof=1)
+    raise ValueError(f"Normalització desconeguda: {mode}")
+
+def _sustainability_inputs(panel: IndicatorPanel, weights: Optional[Dict[str, float]]) -> tuple:
+    """Components amb pes positiu, les seves matrius i la màscara de països amb tots els components"""
+    weights = weights or {name: spec['weight'] for name, spec in SUSTAINABILITY_COMPONENTS.items()}
+    active = {name: weight for name, weight in weights.items()
+              if weight > 0 and name in panel.indicators}
+    matrices = {name: panel.matrix(name) for name in active}
+    joint = (np.logical_and.reduce([~np.isnan(matrix) for matrix in matrices.values()])
+             if matrices else np.zeros((len(panel.area_codes), len(panel.years)), dtype=bool))
+    return active, matrices, joint
+
+def find_constant_components(panel: IndicatorPanel,
+                             weights: Optional[Dict[str, float]] = None) -> pd.DataFrame:
+    """
+    Components de l'índex sense variància entre països per any (anys × components).
+
+    Un component constant (p. ex. l'SSR de farciment a partir de 2014) no es
+    pot normalitzar i calculate_sustainability_panel() el deixa fora de l'any.
+    """
+    active, matrices, joint = _sustainability_inputs(panel, weights)
+    constant = {}
+    with warnings.catch_warnings():
+        # Els anys sense cap dada donen NaN (i un avís "All-NaN slice"): no compten com a constants
+        warnings.simplefilter('ignore', RuntimeWarning)
+        for name, matrix in matrices.items():
+            values = np.where(joint, matrix, np.nan)
+            constant[name] = np.nanmin(values, axis=0) == np.nanmax(values, axis=0)
+    return pd.DataFrame(constant, index=panel.years, columns=list(active), dtype=bool)
+
+def calculate_sustainability_panel(panel: IndicatorPanel, weights: Optional[Dict[str, float]] = None,
+                                   normalization: str = 'minmax') -> pd.DataFrame:
+    """
+    Calcula l'índex de sostenibilitat de tots els països i anys en una sola passada.
+
+    Cada component amb pes positiu es normalitza per any sobre els països que
+    tenen tots els components (com el merge de calculate_sustainability_index),
+    s'inverteix si valors baixos són millors i es fa la mitjana ponderada. Els
+    components constants d'un any (find_constant_components) queden fora i la
+    resta es repondera. Amb 'minmax' i 'rank' l'índex va de 0 a 100; amb
+    'zscore' és la mitjana ponderada de z-scores. Retorna una taula països
+    (AreaName) × anys.
+    """
+    active, matrices, joint = _sustainability_inputs(panel, weights)
+    index = pd.Index(panel.area_names, name='AreaName')
+    if not active:
+        return pd.DataFrame(np.nan, index=index, columns=panel.years)
+    
+    constant = find_constant_components(panel, weights)
+    total = np.zeros(joint.shape)
+    total_weight = np.zeros(len(panel.years))
+    for name, weight in active.items():
+        year_weight = np.where(constant[name].to_numpy(), 0.0, weight)
+        component = normalize_columns(np.where(joint, matrices[name], np.nan), normalization)
+        if SUSTAINABILITY_COMPONENTS.get(name, {}).get('direction', 1) < 0:
+            component = -component if normalization == 'zscore' else 1 - component
+        total += year_weight * np.where(year_weight > 0, component, 0.0)
+        total_weight += year_weight
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result = total / total_weight
+    if normalization != 'zscore':
+        result *= 100
+    return pd.DataFrame(np.where(joint & (total_weight > 0), result, np.nan),
+                        index=index, columns=panel.years)
+
 def calculate_trade_balance(imports_data: pd.DataFrame, 
                           exports_data: pd.DataFrame, 
                           year: int = 2020) -> pd.DataFrame:
-    """Calcula el balanç comercial per país"""
+    """Calcula el balanç comercial per país (només països i productes individuals)"""
     
-    imports_year = imports_data[imports_data['Year'] == year]
-    exports_year = exports_data[exports_data['Year'] == year]
+    imports_year = country_item_rows(imports_data[imports_data['Year'] == year])
+    exports_year = country_item_rows(exports_data[exports_data['Year'] == year])
     
     imports_agg = imports_year.groupby('AreaName')['ImportQuantity'].sum()
     exports_agg = exports_year.groupby('AreaName')['ExportQuantity'].sum()
@@ -160,10 +720,11 @@ def calculate_trade_balance(imports_data: pd.DataFrame,
 
 def get_top_products(data: pd.DataFrame, value_col: str, 
                     n_top: int = 10, year: Optional[int] = None) -> pd.DataFrame:
-    """Obté els top N productes per un valor determinat"""
+    """Obté els top N productes per un valor determinat (sumant només països i productes individuals)"""
     
     if year is not None and 'Year' in data.columns:
         data = data[data['Year'] == year]
+    data = country_item_rows(data)
     
     if 'ItemName' not in data.columns:
         return pd.DataFrame()
@@ -175,46 +736,123 @@ def get_top_products(data: pd.DataFrame, value_col: str,
         value_col: top_products.values
     })
 
+def calculate_diversity_table(data: pd.DataFrame, value_col: str = 'Production',
+                              group_cols: List[str] = ['AreaName', 'Year'],
+                              item_col: str = 'ItemName') -> pd.DataFrame:
+    """
+    Calcula la diversitat de productes de tots els grups en una sola passada.
+
+    Per a cada grup (per defecte país i any) retorna l'índex de Shannon, el de
+    Simpson (1 - Σp²), l'índex d'Herfindahl-Hirschman (Σp² × 10.000), el
+    nombre efectiu de productes (exp(Shannon)), els productes amb valor i el
+    total. Es fan servir només els valors positius dels països i productes
+    individuals (country_item_rows) i se suposa una fila per producte dins de
+    cada grup.
+    """
+    columns = group_cols + ['Shannon', 'Simpson', 'HHI', 'EffectiveItems', 'NItems', 'Total']
+    if data.empty or value_col not in data.columns:
+        return pd.DataFrame(columns=columns)
+    
+    data = country_item_rows(data)
+    combined, has_key, levels = combine_group_keys(data, group_cols)
+    values = data[value_col].to_numpy(dtype=np.float64)
+    keep = has_key & (values > 0)
+    group_keys, codes = np.unique(combined[keep], return_inverse=True)
+    values = values[keep]
+    n_groups = len(group_keys)
+    
+    # Quotes de cada producte dins el seu grup i sumes per grup amb bincount
+    totals = np.bincount(codes, weights=values, minlength=n_groups)
+    shares = values / totals[codes]
+    shannon = -np.bincount(codes, weights=shares * np.log(shares), minlength=n_groups)
+    concentration = np.bincount(codes, weights=shares ** 2, minlength=n_groups)
+    
+    result = decode_group_keys(group_keys, levels)
+    result['Shannon'] = shannon
+    result['Simpson'] = 1 - concentration
+    result['HHI'] = concentration * 10000
+    result['EffectiveItems'] = np.exp(shannon)
+    result['NItems'] = np.bincount(codes, minlength=n_groups)
+    result['Total'] = totals
+    
+    return result[columns]
+
 def calculate_diversity_index(data: pd.DataFrame, 
                             group_col: str = 'AreaName',
                             value_col: str = 'Production') -> pd.DataFrame:
     """Calcula un índex de diversitat de producció (similar a Shannon)"""
     
-    def shannon_diversity(series):
-        proportions = series / series.sum()
-        return -np.sum(proportions * np.log(proportions + 1e-10))  # Evitar log(0)
-    
-    diversity = data.groupby(group_col)[value_col].apply(shannon_diversity).reset_index()
+    diversity = calculate_diversity_table(data, value_col, [group_col])
+    diversity = diversity[[group_col, 'Shannon']]
     diversity.columns = [group_col, 'DiversityIndex']
     
     return diversity
 
-def calculate_food_security_metrics(ssr_data: pd.DataFrame,
+def calculate_food_security_table(ssr_data: PanelOrFrame,
+                                  production_data: pd.DataFrame,
+                                  value_col: str = 'Production') -> pd.DataFrame:
+    """
+    Calcula les mètriques globals de seguretat alimentària de tots els anys alhora.
+
+    Retorna una taula any × mètrica amb les mateixes mètriques que
+    calculate_food_security_metrics(): un groupby per any sobre l'SSR i un
+    altre per (any, país) sobre la producció (`value_col`), només de països i
+    productes individuals (country_item_rows).
+    """
+    ssr_data = as_frame(ssr_data, ['SelfSufficiency'])
+    
+    tables = []
+    if not ssr_data.empty:
+        ssr = ssr_data['SelfSufficiency']
+        grouped = ssr.groupby(ssr_data['Year'])
+        tables.append(pd.DataFrame({
+            'global_ssr_mean': grouped.mean(),
+            'global_ssr_std': grouped.std(),
+            'countries_above_1': (ssr >= 1.0).groupby(ssr_data['Year']).sum(),
+            'countries_below_0_5': (ssr < 0.5).groupby(ssr_data['Year']).sum(),
+            'total_countries': grouped.size(),
+        }))
+    
+    production_data = country_item_rows(production_data)
+    if not production_data.empty:
+        per_country = production_data.groupby(['Year', 'AreaName'])[value_col].sum()
+        grouped = per_country.groupby(level='Year')
+        tables.append(pd.DataFrame({
+            'total_production': grouped.sum(),
+            'mean_production_per_country': grouped.mean(),
+        }))
+    
+    if not tables:
+        return pd.DataFrame()
+    table = pd.concat(tables, axis=1).sort_index()
+    table.index.name = 'Year'
+    # Els recomptes queden enters encara que l'any no tingui dades d'SSR
+    count_cols = [col for col in ('countries_above_1', 'countries_below_0_5', 'total_countries')
+                  if col in table.columns]
+    table[count_cols] = table[count_cols].astype('Int64')
+    return table
+
+def calculate_food_security_metrics(ssr_data: PanelOrFrame,
                                   production_data: pd.DataFrame,
                                   year: int = 2020) -> Dict[str, float]:
     """Calcula mètriques globals de seguretat alimentària"""
     
+    ssr_data = as_frame(ssr_data, ['SelfSufficiency'], year)
     ssr_year = ssr_data[ssr_data['Year'] == year]
     prod_year = production_data[production_data['Year'] == year]
     
-    metrics = {}
-    
-    if not ssr_year.empty:
-        metrics['global_ssr_mean'] = ssr_year['SelfSufficiency'].mean()
-        metrics['global_ssr_std'] = ssr_year['SelfSufficiency'].std()
-        metrics['countries_above_1'] = (ssr_year['SelfSufficiency'] >= 1.0).sum()
-        metrics['countries_below_0_5'] = (ssr_year['SelfSufficiency'] < 0.5).sum()
-        metrics['total_countries'] = len(ssr_year)
-    
-    if not prod_year.empty:
-        metrics['total_production'] = prod_year['Production'].sum()
-        metrics['mean_production_per_country'] = prod_year.groupby('AreaName')['Production'].sum().mean()
+    table = calculate_food_security_table(ssr_year, prod_year)
+    if year not in table.index:
+        return {}
     
-    return metrics
+    # Cel·la a cel·la per conservar els recomptes com a enters
+    return {metric: table.at[year, metric] for metric in table.columns
+            if not pd.isna(table.at[year, metric])}
 
-def analyze_gender_impact(ssr_data: pd.DataFrame, year: int = 2020) -> Dict[str, float]:
+def analyze_gender_impact(ssr_data: PanelOrFrame, year: int = 2020) -> Dict[str, float]:
     """Analitza l'impacte del gènere en l'agricultura"""
     
+    ssr_data = as_frame(ssr_data, ['WomenAgriShare', 'SelfSufficiency'], year)
     if 'WomenAgriShare' not in ssr_data.columns:
         return {'error': 'No hi ha dades de gènere disponibles'}
     
@@ -239,3 +877,58 @@ def analyze_gender_impact(ssr_data: pd.DataFrame, year: int = 2020) -> Dict[str,
     analysis['gender_impact'] = analysis['ssr_high_women_participation'] - analysis['ssr_low_women_participation']
     
     return analysis
+
+def calculate_gender_impact_table(panel: IndicatorPanel, min_samples: int = 5) -> pd.DataFrame:
+    """
+    Calcula l'impacte del gènere de tots els anys i blocs (i del conjunt 'Tots') alhora.
+
+    Per a cada (any, grup) divideix els països per la mediana de participació
+    femenina del grup, com analyze_gender_impact(), amb medianes per columna i
+    màscares en lloc de filtrar cada grup. GenderImpact és l'SSR mitjà del
+    grup amb participació alta menys el del grup amb participació baixa.
+    """
+    if not {'WomenAgriShare', 'SelfSufficiency'} <= set(panel.indicators):
+        return pd.DataFrame()
+    women = panel.matrix('WomenAgriShare').astype(np.float64)
+    ssr = panel.matrix('SelfSufficiency').astype(np.float64)
+    names, membership = _group_membership(panel)
+    valid = ~np.isnan(women) & ~np.isnan(ssr)
+    
+    # Medianes de participació femenina per grup i any (NaN fora del grup)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        medians = np.vstack([np.nanmedian(np.where(valid & member[:, None], women, np.nan), axis=0)
+                             for member in membership.astype(bool)])
+    
+    # Màscares (grups × països × anys) dels països per sobre i per sota de la mediana
+    in_group = valid[None, :, :] & membership.astype(bool)[:, :, None]
+    high = in_group & (women[None, :, :] >= medians[:, None, :])
+    low = in_group & (women[None, :, :] < medians[:, None, :])
+    ssr_filled = np.where(valid, ssr, 0.0)[None, :, :]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ssr_high = (high * ssr_filled).sum(axis=1) / high.sum(axis=1)
+        ssr_low = (low * ssr_filled).sum(axis=1) / low.sum(axis=1)
+    
+    sums = _pearson_sums(women, ssr, membership)
+    n = sums['n']
+    women_filled = np.where(valid, women, 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        women_mean = (membership @ women_filled) / n
+        women_var = ((membership @ (women_filled ** 2)) - n * women_mean ** 2) / (n - 1)
+    
+    enough = n >= min_samples
+    table = pd.DataFrame({
+        'Year': np.tile(panel.years.to_numpy(), len(names)),
+        'BlocRegional': np.repeat(names, len(panel.years)),
+        'N': n.ravel().astype(int),
+        'NHighWomen': high.sum(axis=1).ravel(),
+        'NLowWomen': low.sum(axis=1).ravel(),
+        'WomenMedian': medians.ravel(),
+        'WomenMean': women_mean.ravel(),
+        'WomenStd': np.sqrt(np.clip(women_var, 0, None)).ravel(),
+        'SSRHighWomen': ssr_high.ravel(),
+        'SSRLowWomen': ssr_low.ravel(),
+        'GenderImpact': (ssr_high - ssr_low).ravel(),
+        'Correlation': _pearson_from_sums(sums, min_samples).ravel(),
+    })
+    return table[enough.ravel()].reset_index(drop=True)
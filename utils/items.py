@@ -0,0 +1,278 @@
+"""
+Items - Indicadors per país, producte i any
+Autosuficiència per producte a partir de les taules de producció, importacions i exportacions
+"""
+
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+ITEM_KEY_COLUMNS = ['AreaCode', 'ItemCode', 'Year']
+ITEM_ELEMENTS = {
+    'production': 'Production',
+    'imports': 'ImportQuantity',
+    'exports': 'ExportQuantity',
+}
+# Bits de cada camp de la clau entera: àrea (16) | producte (16) | any (16)
+_KEY_BITS = 16
+
+# Grups de productes dels balanços alimentaris de FAOSTAT (codi de grup → nom i productes)
+ITEM_GROUPS = {
+    2905: ('Cereals - Excluding Beer', [2511, 2513, 2514, 2515, 2516, 2517, 2518, 2520, 2805]),
+    2907: ('Starchy Roots', [2531, 2532, 2533, 2534, 2535]),
+    2908: ('Sugar Crops', [2536, 2537]),
+    2909: ('Sugar & Sweeteners', [2541, 2542, 2543, 2745]),
+    2911: ('Pulses', [2546, 2547, 2549]),
+    2912: ('Treenuts', [2551]),
+    2913: ('Oilcrops', [2555, 2556, 2557, 2558, 2559, 2560, 2561, 2562, 2563, 2570]),
+    2914: ('Vegetable Oils', [2571, 2572, 2573, 2574, 2575, 2576, 2577, 2578, 2579, 2580,
+                              2581, 2582, 2586]),
+    2918: ('Vegetables', [2601, 2602, 2605]),
+    2919: ('Fruits - Excluding Wine', [2611, 2612, 2613, 2614, 2615, 2616, 2617, 2618, 2619,
+                                       2620, 2625]),
+    2922: ('Stimulants', [2630, 2633, 2635]),
+    2923: ('Spices', [2640, 2641, 2642, 2645]),
+    2924: ('Alcoholic Beverages', [2655, 2656, 2657, 2658, 2659]),
+    2928: ('Miscellaneous', [2680, 2899]),
+    2943: ('Meat', [2731, 2732, 2733, 2734, 2735]),
+    2945: ('Offals', [2736]),
+    2946: ('Animal fats', [2737, 2740, 2743, 2781, 2782]),
+    2948: ('Milk - Excluding Butter', [2848]),
+    2949: ('Eggs', [2744]),
+    2960: ('Fish, Seafood', [2761, 2762, 2763, 2764, 2765, 2766, 2767, 2769]),
+    2961: ('Aquatic Products, Other', [2768, 2775]),
+}
+# Productes que no pertanyen a cap grup (p. ex. els codis de producció primària d'item_map)
+OTHER_GROUP = (0, 'Altres')
+# Codis d'àrea dels agregats regionals de FAOSTAT (World 5000, continents, EU27, LDC, LIFDC...)
+AGGREGATE_AREA_CODES = (5000, 6000)
+# "China" (351) suma China continental, Taiwan, Hong Kong i Macau, que també hi són
+AGGREGATE_COUNTRY_CODES = [351]
+
+# ==========================================
+# CLAUS ENTERES
+# ==========================================
+
+def encode_item_keys(area_codes: np.ndarray, item_codes: np.ndarray,
+                     years: np.ndarray) -> np.ndarray:
+    """Empaqueta (AreaCode, ItemCode, Year) en un int64 que ordena igual que la tupla"""
+    limit = 1 << _KEY_BITS
+    for name, values in (('AreaCode', area_codes), ('ItemCode', item_codes), ('Year', years)):
+        if len(values) and (values.min() < 0 or values.max() >= limit):
+            raise ValueError(f"{name} fora del rang de la clau ({limit - 1})")
+    return ((area_codes.astype(np.int64) << (2 * _KEY_BITS))
+            | (item_codes.astype(np.int64) << _KEY_BITS)
+            | years.astype(np.int64))
+
+def decode_item_keys(keys: np.ndarray) -> Dict[str, np.ndarray]:
+    """Inversa d'encode_item_keys"""
+    mask = (1 << _KEY_BITS) - 1
+    return {
+        'AreaCode': (keys >> (2 * _KEY_BITS)).astype(np.int32),
+        'ItemCode': ((keys >> _KEY_BITS) & mask).astype(np.int32),
+        'Year': (keys & mask).astype(np.int16),
+    }
+
+def _sorted_element(df: pd.DataFrame, value_col: str) -> tuple:
+    """Claus úniques ordenades i suma dels valors de cada clau (files sense valor descartades)"""
+    if df.empty or value_col not in df.columns:
+        return np.empty(0, dtype=np.int64), np.empty(0)
+    values = df[value_col].to_numpy(dtype=np.float64)
+    valid = ~np.isnan(values)
+    keys = encode_item_keys(*(df[col].to_numpy()[valid] for col in ITEM_KEY_COLUMNS))
+    values = values[valid]
+    # Les taules preprocessades ja venen ordenades per país, producte i any
+    if len(keys) and (keys[1:] < keys[:-1]).any():
+        order = np.argsort(keys, kind='stable')
+        keys, values = keys[order], values[order]
+    # Les claus repetides (p. ex. fonts duplicades) se sumen
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    return keys[starts], np.add.reduceat(values, starts) if len(values) else values
+
+# ==========================================
+# AUTOSUFICIÈNCIA PER PRODUCTE
+# ==========================================
+
+def calculate_item_ssr_table(production: pd.DataFrame, imports: pd.DataFrame,
+                             exports: pd.DataFrame) -> pd.DataFrame:
+    """
+    Autosuficiència de cada (país, producte, any): SSR = P / (P + I - E).
+
+    Les tres taules s'ordenen per una clau entera i es fusionen amb cerques
+    binàries sobre la unió de claus, sense joins de pandas. Un comerç sense
+    registre compta com a 0; sense producció o amb subministrament domèstic
+    (P + I - E) no positiu l'SSR és NaN. Les columnes són compactes (int32,
+    int16 i float32) i les files queden ordenades per país, producte i any.
+    """
+    elements = {value_col: _sorted_element(df, value_col)
+                for df, value_col in zip((production, imports, exports), ITEM_ELEMENTS.values())}
+    # Unió de claus ordenades: l'ordenació estable fusiona els trams ja ordenats en temps quasi lineal
+    keys = np.sort(np.concatenate([element_keys for element_keys, _ in elements.values()]),
+                   kind='stable')
+    keys = keys[np.r_[True, keys[1:] != keys[:-1]]] if len(keys) else keys
+
+    table = decode_item_keys(keys)
+    for value_col, (element_keys, element_values) in elements.items():
+        column = np.full(len(keys), np.nan)
+        column[np.searchsorted(keys, element_keys)] = element_values
+        table[value_col] = column
+
+    production_values = table['Production']
+    supply = (production_values + np.nan_to_num(table['ImportQuantity'])
+              - np.nan_to_num(table['ExportQuantity']))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ssr = np.where(supply > 0, production_values / supply, np.nan)
+
+    frame = pd.DataFrame(table)
+    for value_col in elements:
+        frame[value_col] = frame[value_col].astype(np.float32)
+    frame['DomesticSupply'] = supply.astype(np.float32)
+    frame['SelfSufficiency'] = ssr.astype(np.float32)
+    return frame
+
+def item_dependency(item_ssr: pd.DataFrame, area_code: int, year: int,
+                    item_names: Optional[pd.Series] = None, top: int = 15) -> pd.DataFrame:
+    """
+    Productes que expliquen la dependència d'un país en un any.
+
+    Ordena els productes per importació neta (I - E), que és el volum que el
+    país no cobreix amb producció pròpia; `item_names` (ItemCode → ItemName)
+    afegeix el nom del producte.
+    """
+    # La taula està ordenada per clau: les files del país són un tram contigu
+    area_codes = item_ssr['AreaCode'].to_numpy()
+    start = np.searchsorted(area_codes, area_code, side='left')
+    end = np.searchsorted(area_codes, area_code, side='right')
+    rows = item_ssr.iloc[start:end]
+    rows = rows[rows['Year'] == year].copy()
+    rows['NetImports'] = rows['ImportQuantity'].fillna(0) - rows['ExportQuantity'].fillna(0)
+    if item_names is not None:
+        rows['ItemName'] = rows['ItemCode'].map(item_names)
+    return rows.nlargest(top, 'NetImports').reset_index(drop=True)
+
+# ==========================================
+# JERARQUIA DE PRODUCTES
+# ==========================================
+
+def is_group_code(item_codes: np.ndarray) -> np.ndarray:
+    """Files que són agregats de grup (p. ex. 2905 Cereals) i no productes individuals"""
+    return np.isin(item_codes, list(ITEM_GROUPS))
+
+def is_aggregate_area(area_codes: np.ndarray) -> np.ndarray:
+    """Files d'agregats regionals de FAOSTAT i no de països"""
+    low, high = AGGREGATE_AREA_CODES
+    return (area_codes >= low) & (area_codes < high) | np.isin(area_codes, AGGREGATE_COUNTRY_CODES)
+
+def country_item_rows(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Files de països i productes individuals d'una taula país × producte × any.
+
+    Es descarten els agregats regionals i les files de grup, que ja sumen les
+    dels països i dels productes i es comptarien dues vegades.
+    """
+    keep = np.ones(len(df), dtype=bool)
+    if 'AreaCode' in df.columns:
+        keep &= ~is_aggregate_area(df['AreaCode'].to_numpy())
+    if 'ItemCode' in df.columns:
+        keep &= ~is_group_code(df['ItemCode'].to_numpy())
+    return df if keep.all() else df[keep]
+
+def build_item_hierarchy(item_codes: np.ndarray) -> pd.DataFrame:
+    """
+    Jerarquia grup → producte dels codis indicats (ItemCode, GroupCode, GroupName).
+
+    Els codis de grup no hi són (només s'hi agreguen productes); els productes
+    fora de ITEM_GROUPS van al grup OTHER_GROUP.
+    """
+    item_to_group = {item: group for group, (_, items) in ITEM_GROUPS.items() for item in items}
+    codes = np.unique(np.asarray(item_codes))
+    codes = codes[~is_group_code(codes)]
+    groups = np.array([item_to_group.get(code, OTHER_GROUP[0]) for code in codes])
+    group_names = {group: name for group, (name, _) in ITEM_GROUPS.items()}
+    group_names[OTHER_GROUP[0]] = OTHER_GROUP[1]
+    return pd.DataFrame({'ItemCode': codes.astype(np.int32), 'GroupCode': groups.astype(np.int32),
+                         'GroupName': [group_names[group] for group in groups]})
+
+def calculate_item_rollups(tables: Dict[str, pd.DataFrame]) -> tuple:
+    """
+    Totals per (any, producte) i per (any, grup) de producció, importacions i exportacions.
+
+    `tables` són les taules país × producte × any de load_all_data() (les que
+    falten o estan buides donen NaN). Només se sumen països i productes
+    individuals (country_item_rows): els agregats regionals i les files de grup
+    de les dades es comptarien dues vegades. Els totals per producte queden ordenats per
+    any, grup i producte, de manera que desplegar un grup és un tram contigu
+    (expand_item_group) i no cal tornar a recórrer les files dels països.
+    """
+    frames = {value_col: tables.get(name, pd.DataFrame()) for name, value_col in ITEM_ELEMENTS.items()}
+    frames = {value_col: country_item_rows(df) for value_col, df in frames.items()
+              if not df.empty and value_col in df.columns}
+    frames = {value_col: df for value_col, df in frames.items() if not df.empty}
+    item_columns = ['Year', 'GroupCode', 'GroupName', 'ItemCode', 'ItemName']
+    if not frames:
+        return (pd.DataFrame(columns=['Year', 'GroupCode', 'GroupName', 'NItems']),
+                pd.DataFrame(columns=item_columns))
+
+    hierarchy = build_item_hierarchy(np.concatenate([df['ItemCode'].to_numpy()
+                                                     for df in frames.values()]))
+    years = np.unique(np.concatenate([df['Year'].to_numpy() for df in frames.values()]))
+    codes = hierarchy['ItemCode'].to_numpy()
+    shape = (len(years), len(codes))
+
+    totals = {}
+    names = {}
+    for value_col, df in frames.items():
+        item_codes = df['ItemCode'].to_numpy()
+        positions = np.searchsorted(codes, item_codes)
+        values = df[value_col].to_numpy(dtype=np.float64)
+        valid = ~np.isnan(values)
+        flat = np.searchsorted(years, df['Year'].to_numpy()[valid]) * len(codes) + positions[valid]
+        sums = np.bincount(flat, weights=values[valid], minlength=shape[0] * shape[1])
+        counts = np.bincount(flat, minlength=shape[0] * shape[1])
+        totals[value_col] = np.where(counts > 0, sums, np.nan).reshape(shape)
+        if 'ItemName' in df.columns:
+            item_names = df.loc[valid, ['ItemCode', 'ItemName']].drop_duplicates('ItemCode')
+            names.update(zip(item_names['ItemCode'], item_names['ItemName']))
+
+    item_totals = pd.DataFrame({
+        'Year': np.repeat(years, len(codes)),
+        'GroupCode': np.tile(hierarchy['GroupCode'].to_numpy(), len(years)),
+        'GroupName': np.tile(hierarchy['GroupName'].to_numpy(), len(years)),
+        'ItemCode': np.tile(codes, len(years)),
+        **{value_col: values.ravel() for value_col, values in totals.items()},
+    })
+    item_totals['ItemName'] = item_totals['ItemCode'].map(names).fillna(
+        item_totals['ItemCode'].astype(str))
+    item_totals = item_totals.dropna(subset=list(totals), how='all')
+    item_totals = item_totals.sort_values(['Year', 'GroupCode', 'ItemCode']).reset_index(drop=True)
+
+    # Totals de grup: producte matricial amb la pertinença producte → grup (una columna per grup)
+    group_codes, group_index = np.unique(hierarchy['GroupCode'].to_numpy(), return_inverse=True)
+    membership = np.zeros((len(codes), len(group_codes)))
+    membership[np.arange(len(codes)), group_index] = 1.0
+    present = np.zeros(shape, dtype=bool)
+    group_columns = {}
+    for value_col, values in totals.items():
+        valid = ~np.isnan(values)
+        present |= valid
+        group_sums = np.nan_to_num(values) @ membership
+        group_columns[value_col] = np.where(valid @ membership > 0, group_sums, np.nan).ravel()
+    group_names = hierarchy.drop_duplicates('GroupCode').set_index('GroupCode')['GroupName']
+
+    group_totals = pd.DataFrame({
+        'Year': np.repeat(years, len(group_codes)),
+        'GroupCode': np.tile(group_codes, len(years)),
+        'GroupName': np.tile(group_names.loc[group_codes].to_numpy(), len(years)),
+        **group_columns,
+        'NItems': (present @ membership).astype(np.int64).ravel(),
+    })
+    group_totals = group_totals[group_totals['NItems'] > 0].reset_index(drop=True)
+    return group_totals, item_totals[item_columns + list(totals)]
+
+def expand_item_group(item_totals: pd.DataFrame, year: int, group_code: int) -> pd.DataFrame:
+    """Productes d'un grup en un any: tram de la taula ordenada trobat per cerca binària"""
+    keys = item_totals['Year'].to_numpy().astype(np.int64) * 100000 + item_totals['GroupCode'].to_numpy()
+    key = int(year) * 100000 + int(group_code)
+    start, end = np.searchsorted(keys, key, side='left'), np.searchsorted(keys, key, side='right')
+    return item_totals.iloc[start:end]
@@ -8,6 +8,18 @@ import streamlit as st
 import os
 from typing import Dict, Optional
 
+from utils.panel import IndicatorPanel, build_core_panel
+from utils.aggregates import BlocStatistics
+from utils.smoothing import smooth_panel
+from utils.nowcast import build_nowcast_inputs, nowcast_panel, backtest_nowcast
+from utils.items import calculate_item_ssr_table, calculate_item_rollups
+from utils.trade_matrix import (TradeMatrixStore, calculate_supplier_concentration,
+                                summarize_supplier_concentration)
+from utils.indicators import (calculate_diversity_table, calculate_correlation_table,
+                              calculate_rolling_correlations, calculate_correlation_uncertainty,
+                              calculate_grouped_outliers, calculate_food_security_table,
+                              calculate_gender_impact_table)
+
 # ==========================================
 # BLOCS REGIONALS
 # ==========================================
@@ -107,11 +119,18 @@ def add_regional_bloc(df):
 # LOADERS PER DADES PREPROCESSADES
 # ==========================================
 
+# Permet apuntar el panell a un altre directori de dades (benchmarks, proves)
+DATA_DIR_ENV = 'DASHBOARD_DATA_DIR'
+
+def data_path(filename: str) -> str:
+    """Retorna la ruta d'un fitxer dins el directori de dades actiu"""
+    return os.path.join(os.environ.get(DATA_DIR_ENV, 'data'), filename)
+
 @st.cache_data
 def load_ssr_data() -> pd.DataFrame:
     """Carrega dades d'autosuficiència amb informació de gènere"""
-    compressed_path = 'data/ssr_women.csv.gz'
-    original_path = 'data/fao_QCL.csv'
+    compressed_path = data_path('ssr_women.csv.gz')
+    original_path = data_path('fao_QCL.csv')
     
     if os.path.exists(compressed_path):
         df = pd.read_csv(compressed_path, compression='gzip')
@@ -130,8 +149,8 @@ def load_ssr_data() -> pd.DataFrame:
 @st.cache_data
 def load_footprint_data() -> pd.DataFrame:
     """Carrega dades de petjada alimentària"""
-    compressed_path = 'data/food_footprint.csv.gz'
-    original_path = 'data/fao_ET.csv'
+    compressed_path = data_path('food_footprint.csv.gz')
+    original_path = data_path('fao_ET.csv')
     
     if os.path.exists(compressed_path):
         df = pd.read_csv(compressed_path, compression='gzip')
@@ -148,7 +167,7 @@ def load_footprint_data() -> pd.DataFrame:
 @st.cache_data
 def load_production_data() -> pd.DataFrame:
     """Carrega dades de producció"""
-    compressed_path = 'data/production.csv.gz'
+    compressed_path = data_path('production.csv.gz')
     
     if os.path.exists(compressed_path):
         return pd.read_csv(compressed_path, compression='gzip')
@@ -159,7 +178,7 @@ def load_production_data() -> pd.DataFrame:
 @st.cache_data
 def load_imports_data() -> pd.DataFrame:
     """Carrega dades d'importacions"""
-    compressed_path = 'data/imports.csv.gz'
+    compressed_path = data_path('imports.csv.gz')
     
     if os.path.exists(compressed_path):
         return pd.read_csv(compressed_path, compression='gzip')
@@ -170,7 +189,7 @@ def load_imports_data() -> pd.DataFrame:
 @st.cache_data
 def load_exports_data() -> pd.DataFrame:
     """Carrega dades d'exportacions"""
-    compressed_path = 'data/exports.csv.gz'
+    compressed_path = data_path('exports.csv.gz')
     
     if os.path.exists(compressed_path):
         return pd.read_csv(compressed_path, compression='gzip')
@@ -181,8 +200,8 @@ def load_exports_data() -> pd.DataFrame:
 @st.cache_data
 def load_lookup_tables() -> tuple:
     """Carrega taules de lookup"""
-    area_path = 'data/area_map.csv.gz'
-    item_path = 'data/item_map.csv.gz'
+    area_path = data_path('area_map.csv.gz')
+    item_path = data_path('item_map.csv.gz')
     
     area_map = pd.DataFrame()
     item_map = pd.DataFrame()
@@ -217,6 +236,173 @@ def load_all_data() -> Dict[str, pd.DataFrame]:
     
     return data_dict
 
+@st.cache_data
+def load_indicator_panel() -> IndicatorPanel:
+    """Carrega el panell dens país × any d'SSR, participació femenina i petjada"""
+    return build_core_panel({'ssr': load_ssr_data(), 'footprint': load_footprint_data()})
+
+def trade_source() -> tuple:
+    """Dataset país × producte × any disponible: producció o, si no n'hi ha, exportacions"""
+    for source, loader, value_col in (('production', load_production_data, 'Production'),
+                                      ('exports', load_exports_data, 'ExportQuantity')):
+        data = loader()
+        if not data.empty:
+            return source, data, value_col
+    return None, pd.DataFrame(), None
+
+@st.cache_data
+def load_smoothed_panel(_panel: IndicatorPanel, data_version: str, method: str,
+                        window: int) -> IndicatorPanel:
+    """Panell amb les sèries de cada país suavitzades (un càlcul per versió de dades, mètode i finestra)"""
+    return smooth_panel(_panel, method, window)
+
+@st.cache_data
+def load_ssr_nowcast(model: str = 'regression') -> tuple:
+    """
+    Carrega la previsió de l'SSR posterior a 2013 de tots els països.
+
+    Retorna el panell amb l'SSR observat i previst (matriu IsForecast) i la
+    validació dels models amagant els darrers anys observats.
+    """
+    inputs = build_nowcast_inputs({'ssr': load_ssr_data(), 'footprint': load_footprint_data()})
+    return nowcast_panel(inputs, model), backtest_nowcast(inputs)
+
+@st.cache_data
+def load_item_ssr_table() -> pd.DataFrame:
+    """
+    Carrega l'autosuficiència per país, producte i any.
+
+    Es llegeix la taula precalculada pel preprocessament (item_ssr.csv.gz) o,
+    si no hi és, es calcula a partir de les taules de producció, importacions i
+    exportacions. Sense producció per producte no hi ha SSR i es retorna buida.
+    """
+    compressed_path = data_path('item_ssr.csv.gz')
+    if os.path.exists(compressed_path):
+        return pd.read_csv(compressed_path, compression='gzip',
+                           dtype={'AreaCode': 'int32', 'ItemCode': 'int32', 'Year': 'int16',
+                                  'Production': 'float32', 'ImportQuantity': 'float32',
+                                  'ExportQuantity': 'float32', 'DomesticSupply': 'float32',
+                                  'SelfSufficiency': 'float32'})
+    production = load_production_data()
+    if production.empty:
+        return pd.DataFrame()
+    return calculate_item_ssr_table(production, load_imports_data(), load_exports_data())
+
+@st.cache_data
+def load_item_rollups() -> tuple:
+    """
+    Carrega els totals de producció, importacions i exportacions per (any, grup) i (any, producte).
+
+    Es llegeixen les taules precalculades pel preprocessament (item_group_totals
+    i item_totals) o, si no hi són, es calculen a partir de les importacions i
+    exportacions carregades. La producció carregada és la de la QCL, amb codis
+    de producte que no pertanyen a cap grup dels balanços alimentaris, i en
+    aquest cas no hi entra.
+    """
+    group_path, item_path = data_path('item_group_totals.csv.gz'), data_path('item_totals.csv.gz')
+    if os.path.exists(group_path) and os.path.exists(item_path):
+        return (pd.read_csv(group_path, compression='gzip'),
+                pd.read_csv(item_path, compression='gzip'))
+    return calculate_item_rollups({'imports': load_imports_data(),
+                                   'exports': load_exports_data()})
+
+@st.cache_resource
+def load_trade_matrix_store() -> Optional[TradeMatrixStore]:
+    """
+    Carrega les matrius bilaterals de comerç generades per scripts/build_trade_matrix.py.
+
+    És un objecte gran de només lectura: es comparteix entre sessions en lloc
+    de copiar-lo a cada crida. Retorna None si el fitxer no existeix.
+    """
+    path = data_path('trade_matrix.npz')
+    if not os.path.exists(path):
+        return None
+    return TradeMatrixStore.load(path)
+
+@st.cache_data
+def load_supplier_concentration() -> tuple:
+    """
+    Carrega la concentració de proveïdors de tots els importadors, productes i anys.
+
+    Retorna la taula per (any, producte, importador) i el resum per (any,
+    importador) ponderat per la quantitat importada; totes dues buides si no
+    hi ha matrius de comerç.
+    """
+    store = load_trade_matrix_store()
+    if store is None:
+        return pd.DataFrame(), pd.DataFrame()
+    concentration = calculate_supplier_concentration(store)
+    return concentration, summarize_supplier_concentration(concentration)
+
+@st.cache_data
+def load_diversity_table() -> tuple:
+    """
+    Carrega la diversitat de productes (Shannon, Simpson, HHI) per país i any.
+
+    Es calcula sobre la producció; si no n'hi ha, sobre les exportacions.
+    Retorna la taula (amb el bloc regional) i el nom del dataset d'origen.
+    """
+    source, data, value_col = trade_source()
+    if source is None:
+        return pd.DataFrame(), None
+    return add_regional_bloc(calculate_diversity_table(data, value_col)), source
+
+@st.cache_data
+def load_food_security_table() -> tuple:
+    """
+    Carrega les mètriques de seguretat alimentària de tots els anys.
+
+    Les mètriques de producció surten de trade_source(). Retorna la taula
+    any × mètrica i el nom del dataset d'origen.
+    """
+    source, data, value_col = trade_source()
+    return calculate_food_security_table(load_ssr_data(), data, value_col or 'Production'), source
+
+@st.cache_data
+def load_bloc_statistics() -> Dict[str, BlocStatistics]:
+    """
+    Carrega les estadístiques suficients per any i bloc de l'SSR i de la petjada.
+
+    L'SSR es pondera per la producció del país i la petjada per la producció
+    total; qualsevol combinació de blocs es calcula sense tornar a llegir les files.
+    """
+    return {
+        'ssr': BlocStatistics.from_frame(load_ssr_data(), ['SelfSufficiency', 'WomenAgriShare'],
+                                         weights={'SelfSufficiency': 'Production'}),
+        'footprint': BlocStatistics.from_frame(load_footprint_data(), ['FoodFootprintCO2'],
+                                               weights={'FoodFootprintCO2': 'TotalProduction'}),
+    }
+
+@st.cache_data
+def load_outlier_tables() -> Dict[str, pd.DataFrame]:
+    """Valors atípics (IQR i MAD) per any i bloc regional de l'SSR i de la petjada"""
+    return {
+        'SelfSufficiency': calculate_grouped_outliers(load_ssr_data(), 'SelfSufficiency'),
+        'FoodFootprintCO2': calculate_grouped_outliers(load_footprint_data(), 'FoodFootprintCO2'),
+    }
+
+@st.cache_data
+def load_correlation_tables(_panel: IndicatorPanel, data_version: str, window: int = 5) -> tuple:
+    """
+    Calcula les correlacions per any i bloc i les de finestra mòbil de `window` anys.
+
+    `data_version` (IndicatorPanel.version) és la clau de la memòria cau: les
+    taules només es recalculen quan canvia el contingut del panell.
+    """
+    return (calculate_correlation_table(_panel),
+            calculate_rolling_correlations(_panel, window))
+
+@st.cache_data
+def load_correlation_uncertainty(_panel: IndicatorPanel, data_version: str, year: int,
+                                 n_resamples: int = 2000, seed: int = 42) -> pd.DataFrame:
+    """Intervals bootstrap i p-valors per permutacions de l'any (un càlcul per versió de dades i any)"""
+    return calculate_correlation_uncertainty(_panel, year, n_resamples=n_resamples, seed=seed)
+
+@st.cache_data
+def load_gender_impact_table(_panel: IndicatorPanel, data_version: str) -> pd.DataFrame:
+    """Impacte del gènere per any i bloc (un càlcul per versió de dades del panell)"""
+    return calculate_gender_impact_table(_panel)
+
 # ==========================================
 # FALLBACK FUNCTIONS (per compatibilitat)
 # ==========================================
@@ -238,13 +424,13 @@ def load_original_footprint_data() -> pd.DataFrame:
 def check_data_availability() -> Dict[str, bool]:
     """Verifica quines dades estan disponibles"""
     availability = {
-        'ssr_compressed': os.path.exists('data/ssr_women.csv.gz'),
-        'footprint_compressed': os.path.exists('data/food_footprint.csv.gz'),
-        'production_compressed': os.path.exists('data/production.csv.gz'),
-        'imports_compressed': os.path.exists('data/imports.csv.gz'),
-        'exports_compressed': os.path.exists('data/exports.csv.gz'),
-        'ssr_original': os.path.exists('data/fao_QCL.csv'),
-        'footprint_original': os.path.exists('data/fao_ET.csv'),
+        'ssr_compressed': os.path.exists(data_path('ssr_women.csv.gz')),
+        'footprint_compressed': os.path.exists(data_path('food_footprint.csv.gz')),
+        'production_compressed': os.path.exists(data_path('production.csv.gz')),
+        'imports_compressed': os.path.exists(data_path('imports.csv.gz')),
+        'exports_compressed': os.path.exists(data_path('exports.csv.gz')),
+        'ssr_original': os.path.exists(data_path('fao_QCL.csv')),
+        'footprint_original': os.path.exists(data_path('fao_ET.csv')),
     }
     
     return availability
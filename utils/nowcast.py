@@ -0,0 +1,191 @@
+"""
+Nowcast - Previsió de l'SSR posterior a l'últim any amb dades (2013)
+Models per país (tendència lineal, tendència esmorteïda, regressió amb covariables) ajustats alhora per mínims quadrats
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils.panel import IndicatorPanel
+
+SSR_CUTOFF_YEAR = 2013
+NOWCAST_MODELS = ['trend', 'damped', 'regression']
+# Covariables de la regressió (les dues continuen després de 2013)
+NOWCAST_COVARIATES = ['FoodFootprintCO2', 'Production']
+
+# ==========================================
+# AJUST PER LOTS
+# ==========================================
+
+def _fit_mask(panel: IndicatorPanel, cutoff: int, fit_years: int) -> np.ndarray:
+    """Valors d'SSR utilitzables per ajustar: finestra d'anys fins al tall, sense els 1.0 de farciment"""
+    ssr = panel.matrix('SelfSufficiency')
+    years = panel.years.to_numpy()
+    in_window = (years <= cutoff) & (years > cutoff - fit_years)
+    # Els valors exactament 1 són de farciment (tots els països a partir de 2014); es miren
+    # a les dades d'origen perquè a float32 alguns SSR reals arrodoneixen a 1
+    return ~np.isnan(ssr) & ~panel.filler_mask('SelfSufficiency') & in_window[None, :]
+
+def fit_linear_trends(values: np.ndarray, years: np.ndarray,
+                      mask: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Ajusta y = a + b·(any - any_ref) a cada fila amb les sumes de la fórmula tancada.
+
+    Retorna, per país, la constant (al darrer any ajustat), el pendent, el
+    nombre de punts i l'error quadràtic mitjà dels residus.
+    """
+    t = np.where(mask, years[None, :] - years[mask.any(axis=0)].max(), 0.0)
+    y = np.where(mask, values, 0.0).astype(np.float64)
+    n = mask.sum(axis=1).astype(np.float64)
+    st_, sy, stt, sty = t.sum(axis=1), y.sum(axis=1), (t * t).sum(axis=1), (t * y).sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = (n * sty - st_ * sy) / (n * stt - st_ ** 2)
+        intercept = (sy - slope * st_) / n
+        residuals = np.where(mask, y - (intercept[:, None] + slope[:, None] * t), 0.0)
+        rmse = np.sqrt((residuals ** 2).sum(axis=1) / n)
+    return {'intercept': intercept, 'slope': slope, 'n_points': n, 'rmse': rmse}
+
+def fit_covariate_regressions(values: np.ndarray, features: np.ndarray, mask: np.ndarray,
+                              ridge: float = 1e-3) -> Dict[str, np.ndarray]:
+    """
+    Ajusta una regressió lineal per país amb totes les equacions normals resoltes en lot.
+
+    `features` té forma (països, anys, k) i la primera columna ha de ser la
+    constant. Les covariables s'estandarditzen per país i una petita penalització
+    ridge evita sistemes singulars (covariables constants).
+    """
+    weight = mask[:, :, None].astype(np.float64)
+    n = np.maximum(mask.sum(axis=1), 1)[:, None]
+    means = (features * weight).sum(axis=1) / n
+    stds = np.sqrt((((features - means[:, None, :]) ** 2) * weight).sum(axis=1) / n)
+    means[:, 0], stds[:, 0] = 0.0, 1.0
+    stds = np.where(stds > 0, stds, 1.0)
+    scaled = np.where(weight > 0, (features - means[:, None, :]) / stds[:, None, :], 0.0)
+
+    xtx = np.einsum('cyk,cyl->ckl', scaled, scaled)
+    penalty = ridge * np.eye(features.shape[2])
+    penalty[0, 0] = 0.0
+    xty = np.einsum('cyk,cy->ck', scaled, np.where(mask, values, 0.0))
+    coefs = np.linalg.solve(xtx + penalty[None, :, :] + 1e-12 * np.eye(features.shape[2]),
+                            xty[:, :, None])[:, :, 0]
+    return {'coefs': coefs, 'means': means, 'stds': stds, 'n_points': mask.sum(axis=1)}
+
+def _covariate_features(panel: IndicatorPanel, cutoff: int) -> np.ndarray:
+    """Matriu de variables (països, anys, k): constant, anys des del tall i covariables"""
+    years = panel.years.to_numpy().astype(np.float64)
+    shape = panel.matrix('SelfSufficiency').shape
+    columns = [np.ones(shape), np.broadcast_to(years - cutoff, shape)]
+    for covariate in NOWCAST_COVARIATES:
+        values = panel.matrix(covariate).astype(np.float64)
+        # La producció es fa servir en logaritme perquè abasta diversos ordres de magnitud
+        columns.append(np.log1p(np.clip(values, 0, None)) if covariate == 'Production' else values)
+    return np.stack(columns, axis=-1)
+
+# ==========================================
+# PREVISIÓ
+# ==========================================
+
+def nowcast_ssr(panel: IndicatorPanel, model: str = 'trend', cutoff: int = SSR_CUTOFF_YEAR,
+                fit_years: int = 15, min_points: int = 8,
+                damping: float = 0.8) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Preveu l'SSR de tots els països per als anys posteriors a `cutoff`.
+
+    'trend' prolonga la recta ajustada als darrers `fit_years` anys, 'damped'
+    esmorteeix el pendent amb un factor `damping` per any i 'regression' fa
+    servir, a més, la petjada i la producció de cada any (si falten, s'usa la
+    tendència). Retorna la matriu països × anys (observada fins al tall,
+    prevista després) i la màscara de valors previstos.
+    """
+    if model not in NOWCAST_MODELS:
+        raise ValueError(f"Model de previsió desconegut: {model}")
+    ssr = panel.matrix('SelfSufficiency').astype(np.float64)
+    years = panel.years.to_numpy()
+    mask = _fit_mask(panel, cutoff, fit_years)
+    future = years > cutoff
+
+    trends = fit_linear_trends(ssr, years, mask)
+    enough = trends['n_points'] >= min_points
+    last_fit_year = years[mask.any(axis=0)].max() if mask.any() else cutoff
+    horizon = (years - last_fit_year).astype(np.float64)
+
+    if model == 'damped':
+        # Suma de damping^1 ... damping^h: el pendent s'apaga amb l'horitzó
+        damped_steps = np.where(horizon > 0,
+                                damping * (1 - damping ** np.clip(horizon, 0, None)) / (1 - damping), 0.0)
+        forecast = trends['intercept'][:, None] + trends['slope'][:, None] * damped_steps[None, :]
+    else:
+        forecast = trends['intercept'][:, None] + trends['slope'][:, None] * horizon[None, :]
+
+    if model == 'regression' and all(cov in panel.indicators for cov in NOWCAST_COVARIATES):
+        features = _covariate_features(panel, cutoff)
+        complete = ~np.isnan(features).any(axis=-1)
+        fit = fit_covariate_regressions(ssr, np.nan_to_num(features), mask & complete)
+        scaled = (features - fit['means'][:, None, :]) / fit['stds'][:, None, :]
+        predicted = np.einsum('cyk,ck->cy', np.nan_to_num(scaled), fit['coefs'])
+        usable = complete & (fit['n_points'] >= max(min_points, features.shape[2] + 3))[:, None]
+        forecast = np.where(usable, predicted, forecast)
+
+    values = ssr.copy()
+    forecast_mask = future[None, :] & enough[:, None]
+    values[:, future] = np.nan
+    values[forecast_mask] = np.clip(forecast[forecast_mask], 0, None)
+    return values, forecast_mask
+
+def nowcast_panel(panel: IndicatorPanel, model: str = 'trend', **kwargs) -> IndicatorPanel:
+    """Panell amb l'SSR observat i previst i la matriu IsForecast (1 = valor previst)"""
+    values, forecast_mask = nowcast_ssr(panel, model, **kwargs)
+    derived = panel.derive({'SelfSufficiency': values.astype(np.float32),
+                            'IsForecast': forecast_mask.astype(np.float32)})
+    # Els valors previstos substitueixen el farciment
+    derived.fillers['SelfSufficiency'] = panel.filler_mask('SelfSufficiency') & ~forecast_mask
+    return derived
+
+def nowcast_frame(panel: IndicatorPanel, model: str = 'trend', **kwargs) -> pd.DataFrame:
+    """Previsió en format llarg (AreaCode, AreaName, BlocRegional, Year, SelfSufficiency, IsForecast)"""
+    frame = nowcast_panel(panel, model, **kwargs).to_frame(['SelfSufficiency', 'IsForecast'])
+    frame = frame.dropna(subset=['SelfSufficiency'])
+    frame['IsForecast'] = frame['IsForecast'] > 0
+    frame['Model'] = model
+    return frame.reset_index(drop=True)
+
+def backtest_nowcast(panel: IndicatorPanel, models: Optional[List[str]] = None,
+                     cutoff: int = SSR_CUTOFF_YEAR, holdout: int = 5, **kwargs) -> pd.DataFrame:
+    """
+    Avalua els models amagant els darrers `holdout` anys observats.
+
+    Compara l'error quadràtic mitjà de cada model amb el del valor de l'últim
+    any (previsió ingènua) sobre els mateixos països i anys.
+    """
+    ssr = panel.matrix('SelfSufficiency').astype(np.float64)
+    years = panel.years.to_numpy()
+    test_cutoff = cutoff - holdout
+    test_years = (years > test_cutoff) & (years <= cutoff)
+    filler = panel.filler_mask('SelfSufficiency')
+    actual = np.where(~filler & test_years[None, :], ssr, np.nan)
+
+    last_position = panel.year_position(test_cutoff)
+    naive = np.broadcast_to(ssr[:, [last_position]], ssr.shape)
+
+    rows = []
+    for model in models or NOWCAST_MODELS:
+        predicted, forecast_mask = nowcast_ssr(panel, model, cutoff=test_cutoff, **kwargs)
+        evaluated = forecast_mask & ~np.isnan(actual) & ~filler[:, [last_position]]
+        errors = (predicted - actual)[evaluated]
+        naive_errors = (naive - actual)[evaluated]
+        rows.append({
+            'Model': model,
+            'RMSE': float(np.sqrt(np.mean(errors ** 2))) if errors.size else np.nan,
+            'NaiveRMSE': float(np.sqrt(np.mean(naive_errors ** 2))) if naive_errors.size else np.nan,
+            'Points': int(evaluated.sum()),
+        })
+    return pd.DataFrame(rows)
+
+def build_nowcast_inputs(data_dict: Dict[str, pd.DataFrame]) -> IndicatorPanel:
+    """Panell d'SSR i covariables (producció del país i petjada) de load_all_data()"""
+    return IndicatorPanel.from_frames([
+        (data_dict['ssr'], ['SelfSufficiency', 'Production']),
+        (data_dict['footprint'], ['FoodFootprintCO2']),
+    ])
@@ -0,0 +1,270 @@
+"""
+Panel - Representació densa país × any dels indicadors principals
+Una matriu float32 per indicador amb índexs de països i d'anys
+"""
+
+import hashlib
+import warnings
+from typing import Dict, Iterable, List, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+# Indicadors del panell principal -> dataset d'origen de load_all_data()
+CORE_INDICATORS = {
+    'SelfSufficiency': 'ssr',
+    'WomenAgriShare': 'ssr',
+    'FoodFootprintCO2': 'footprint',
+}
+# Valors de farciment de les dades d'origen (l'SSR és exactament 1 a partir de 2014)
+FILLER_VALUES = {
+    'SelfSufficiency': 1.0,
+}
+
+class IndicatorPanel:
+    """
+    Indicadors a granularitat (AreaCode, Year) en matrius denses.
+
+    Cada indicador és una matriu float32 de forma (països, anys) amb NaN on no
+    hi ha dada. Els eixos són `area_codes` i `years`; `area_names` i `blocs`
+    estan alineats amb les files. `fillers` marca les cel·les on el valor
+    d'origen (float64) és el de farciment de FILLER_VALUES: arrodonit a float32,
+    un valor molt proper també donaria exactament el valor de farciment.
+    """
+
+    def __init__(self, matrices: Dict[str, np.ndarray], area_codes: Sequence[int],
+                 years: Sequence[int], area_names: Sequence[str], blocs: Sequence[str],
+                 fillers: Optional[Dict[str, np.ndarray]] = None):
+        self.matrices = matrices
+        self.fillers = fillers or {}
+        self.area_codes = pd.Index(area_codes, name='AreaCode')
+        self.years = pd.Index(years, name='Year')
+        self.area_names = np.asarray(area_names, dtype=object)
+        self.blocs = np.asarray(blocs, dtype=object)
+        self._name_index = pd.Index(self.area_names)
+        self._version = None
+
+    # ==========================================
+    # CONSTRUCCIÓ
+    # ==========================================
+
+    @classmethod
+    def from_frames(cls, sources: Iterable[tuple]) -> 'IndicatorPanel':
+        """
+        Construeix el panell a partir de parells (DataFrame llarg, columnes).
+
+        Cada DataFrame ha de tenir AreaCode, Year i AreaName (i opcionalment
+        BlocRegional); els eixos són la unió de països i anys de totes les fonts.
+        """
+        sources = [(df, list(columns)) for df, columns in sources if not df.empty]
+        if not sources:
+            return cls({}, [], [], [], [])
+
+        areas = pd.concat([
+            df[[col for col in ('AreaCode', 'AreaName', 'BlocRegional') if col in df.columns]]
+            for df, _ in sources
+        ]).drop_duplicates('AreaCode').sort_values('AreaCode')
+        if 'BlocRegional' not in areas.columns:
+            areas['BlocRegional'] = 'Altres'
+
+        area_codes = pd.Index(areas['AreaCode'].to_numpy())
+        years = pd.Index(np.unique(np.concatenate([df['Year'].to_numpy() for df, _ in sources])))
+
+        matrices = {}
+        fillers = {}
+        for df, columns in sources:
+            rows = area_codes.get_indexer(df['AreaCode'].to_numpy())
+            cols = years.get_indexer(df['Year'].to_numpy())
+            for column in columns:
+                values = df[column].to_numpy(dtype=np.float64)
+                matrix = np.full((len(area_codes), len(years)), np.nan, dtype=np.float32)
+                matrix[rows, cols] = values
+                matrices[column] = matrix
+                if column in FILLER_VALUES:
+                    # La comparació es fa abans d'arrodonir a float32
+                    filler = np.zeros(matrix.shape, dtype=bool)
+                    filler[rows, cols] = values == FILLER_VALUES[column]
+                    fillers[column] = filler
+
+        return cls(matrices, area_codes, years,
+                   areas['AreaName'].to_numpy(), areas['BlocRegional'].fillna('Altres').to_numpy(),
+                   fillers)
+
+    def derive(self, matrices: Dict[str, np.ndarray]) -> 'IndicatorPanel':
+        """Panell amb els mateixos eixos i altres matrius (p. ex. indicadors transformats)"""
+        return IndicatorPanel(matrices, self.area_codes, self.years, self.area_names, self.blocs,
+                              {indicator: mask for indicator, mask in self.fillers.items()
+                               if indicator in matrices})
+
+    # ==========================================
+    # ACCÉS
+    # ==========================================
+
+    @property
+    def indicators(self) -> List[str]:
+        """Noms dels indicadors disponibles"""
+        return list(self.matrices)
+
+    @property
+    def version(self) -> str:
+        """Empremta del contingut del panell (eixos, blocs i matrius) per invalidar memòries cau"""
+        if self._version is None:
+            digest = hashlib.sha256()
+            digest.update(np.asarray(self.area_codes, dtype=np.int64).tobytes())
+            digest.update(np.asarray(self.years, dtype=np.int64).tobytes())
+            digest.update('|'.join(map(str, self.blocs)).encode('utf-8'))
+            for indicator in sorted(self.matrices):
+                digest.update(indicator.encode('utf-8'))
+                digest.update(np.ascontiguousarray(self.matrices[indicator]).tobytes())
+                if indicator in self.fillers:
+                    digest.update(np.packbits(self.fillers[indicator]).tobytes())
+            self._version = digest.hexdigest()
+        return self._version
+
+    def matrix(self, indicator: str) -> np.ndarray:
+        """Matriu (països, anys) d'un indicador"""
+        return self.matrices[indicator]
+
+    def filler_mask(self, indicator: str, year: Optional[int] = None) -> np.ndarray:
+        """Cel·les (o països de l'any indicat) amb el valor de farciment a les dades d'origen"""
+        mask = self.fillers.get(indicator)
+        if mask is None:
+            mask = np.zeros(self.matrices[indicator].shape, dtype=bool)
+        return mask if year is None else mask[:, self.year_position(year)]
+
+    def year_position(self, year: int) -> int:
+        """Columna d'un any (KeyError si no és al panell)"""
+        return self.years.get_loc(year)
+
+    def area_position(self, area: Union[int, str]) -> int:
+        """Fila d'un país per AreaCode o per AreaName"""
+        if isinstance(area, str):
+            return self._name_index.get_loc(area)
+        return self.area_codes.get_loc(area)
+
+    def bloc_mask(self, regions: Optional[List[str]] = None) -> np.ndarray:
+        """Màscara de files dels blocs indicats (tots si és None o ["Tots"])"""
+        if not regions or regions == ["Tots"]:
+            return np.ones(len(self.area_codes), dtype=bool)
+        return np.isin(self.blocs, regions)
+
+    def cross_section(self, indicator: str, year: int) -> np.ndarray:
+        """Valors de tots els països en un any"""
+        return self.matrices[indicator][:, self.year_position(year)]
+
+    def series(self, indicator: str, area: Union[int, str]) -> pd.Series:
+        """Sèrie temporal d'un país"""
+        return pd.Series(self.matrices[indicator][self.area_position(area)], index=self.years,
+                         name=indicator)
+
+    def deltas(self, indicator: str, start_year: Optional[int] = None,
+               end_year: Optional[int] = None, lag: int = 1) -> np.ndarray:
+        """
+        Variacions d'un indicador.
+
+        Amb `start_year` i `end_year` retorna el vector de canvis per país entre
+        els dos anys; si no, la matriu de diferències amb `lag` anys de retard
+        (NaN a les primeres columnes).
+        """
+        matrix = self.matrices[indicator]
+        if start_year is not None and end_year is not None:
+            return matrix[:, self.year_position(end_year)] - matrix[:, self.year_position(start_year)]
+
+        result = np.full_like(matrix, np.nan)
+        result[:, lag:] = matrix[:, lag:] - matrix[:, :-lag]
+        return result
+
+    def bloc_reduce(self, indicator: str, reducer: str = 'mean',
+                    regions: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Redueix un indicador per bloc regional i any.
+
+        `reducer` pot ser 'mean', 'sum', 'count' o 'median'. Retorna una taula
+        blocs × anys; els NaN s'ignoren com en un groupby.
+        """
+        matrix = self.matrices[indicator]
+        bloc_names = np.unique(self.blocs[self.bloc_mask(regions)])
+        membership = (self.blocs[None, :] == bloc_names[:, None])
+
+        if reducer == 'median':
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', RuntimeWarning)
+                values = np.vstack([np.nanmedian(matrix[member], axis=0) for member in membership])
+        else:
+            valid = ~np.isnan(matrix)
+            counts = membership.astype(np.float64) @ valid
+            sums = membership.astype(np.float64) @ np.where(valid, matrix, 0).astype(np.float64)
+            if reducer == 'count':
+                values = counts
+            elif reducer == 'sum':
+                values = np.where(counts > 0, sums, np.nan)
+            elif reducer == 'mean':
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    values = sums / counts
+            else:
+                raise ValueError(f"Reductor desconegut: {reducer}")
+
+        return pd.DataFrame(values, index=pd.Index(bloc_names, name='BlocRegional'),
+                            columns=self.years)
+
+    def bloc_frame(self, indicator: str, reducer: str = 'mean',
+                   regions: Optional[List[str]] = None) -> pd.DataFrame:
+        """Reducció per bloc i any en format llarg (Year, BlocRegional, indicador)"""
+        wide = self.bloc_reduce(indicator, reducer, regions)
+        return (wide.T.stack().dropna().rename(indicator)
+                    .reset_index()[['Year', 'BlocRegional', indicator]])
+
+    def global_reduce(self, indicator: str, reducer: str = 'mean',
+                      regions: Optional[List[str]] = None) -> pd.Series:
+        """Redueix un indicador sobre tots els països (o els dels blocs indicats) per any"""
+        # Les reduccions s'acumulen en float64 per no perdre precisió
+        matrix = self.matrices[indicator][self.bloc_mask(regions)].astype(np.float64)
+        functions = {'mean': np.nanmean, 'median': np.nanmedian, 'sum': np.nansum,
+                     'count': lambda m, axis: np.sum(~np.isnan(m), axis=axis)}
+        # Els anys sense cap dada donen NaN (i un avís "Mean of empty slice")
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            values = functions[reducer](matrix, axis=0)
+        return pd.Series(values, index=self.years, name=indicator)
+
+    # ==========================================
+    # CONVERSIÓ A FORMAT LLARG
+    # ==========================================
+
+    def to_frame(self, indicators: Optional[List[str]] = None, year: Optional[int] = None,
+                 regions: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Retorna el panell en format llarg (AreaCode, AreaName, BlocRegional, Year, ...).
+
+        Es descarten les files on tots els indicadors demanats són NaN, de manera
+        que el resultat equival al DataFrame d'origen filtrat.
+        """
+        indicators = indicators or self.indicators
+        rows = np.flatnonzero(self.bloc_mask(regions))
+        if year is None:
+            cols = np.arange(len(self.years))
+        else:
+            cols = np.array([self.year_position(year)] if year in self.years else [], dtype=int)
+
+        row_idx = np.repeat(rows, len(cols))
+        col_idx = np.tile(cols, len(rows))
+        frame = pd.DataFrame({
+            'AreaCode': self.area_codes.to_numpy()[row_idx],
+            'AreaName': self.area_names[row_idx],
+            'BlocRegional': self.blocs[row_idx],
+            'Year': self.years.to_numpy()[col_idx],
+        })
+        for indicator in indicators:
+            frame[indicator] = self.matrices[indicator][row_idx, col_idx].astype(np.float64)
+
+        return frame.dropna(subset=indicators, how='all').reset_index(drop=True)
+
+def build_core_panel(data_dict: Dict[str, pd.DataFrame]) -> IndicatorPanel:
+    """Construeix el panell d'SSR, participació femenina i petjada de load_all_data()"""
+    sources = {}
+    for indicator, dataset in CORE_INDICATORS.items():
+        df = data_dict.get(dataset, pd.DataFrame())
+        if not df.empty and indicator in df.columns:
+            sources.setdefault(dataset, []).append(indicator)
+    return IndicatorPanel.from_frames((data_dict[dataset], columns)
+                                      for dataset, columns in sources.items())
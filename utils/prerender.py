@@ -0,0 +1,173 @@
+"""
+Prerender - Captura de figures i paquets estàtics de les seccions del panell
+Genera HTML/JSON per (secció, any) i decideix quines vistes cal regenerar
+"""
+
+import hashlib
+import json
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+
+MANIFEST_FILE = 'manifest.json'
+# Nom de fitxer de les vistes que no depenen de l'any
+ALL_YEARS_LABEL = 'tots'
+PLOTLY_CDN = 'https://cdn.plot.ly/plotly-2.35.2.min.js'
+
+# Figures capturades de la vista en curs (None si no s'està capturant)
+_figure_sink: ContextVar[Optional[List]] = ContextVar('_figure_sink', default=None)
+
+# ==========================================
+# CAPTURA DE FIGURES
+# ==========================================
+
+@contextmanager
+def capture_figures():
+    """Recull en una llista les figures que passen per show_chart()"""
+    figures = []
+    token = _figure_sink.set(figures)
+    try:
+        yield figures
+    finally:
+        _figure_sink.reset(token)
+
+def collect_figure(fig) -> bool:
+    """Desa la figura si hi ha una captura activa i indica si s'ha capturat"""
+    figures = _figure_sink.get()
+    if figures is None:
+        return False
+    figures.append(fig)
+    return True
+
+# ==========================================
+# EMPREMTES DE LES ENTRADES
+# ==========================================
+
+def hash_files(paths: Iterable[Path]) -> str:
+    """Empremta del contingut d'un conjunt de fitxers"""
+    digest = hashlib.sha256()
+    for path in sorted(paths):
+        digest.update(str(path.name).encode('utf-8'))
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+def hash_frame(df: pd.DataFrame) -> str:
+    """Empremta del contingut (i columnes) d'un DataFrame"""
+    digest = hashlib.sha256(','.join(map(str, df.columns)).encode('utf-8'))
+    if not df.empty:
+        digest.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return digest.hexdigest()
+
+def view_id(section: str, year: Optional[int]) -> str:
+    """Identificador (i ruta relativa) d'una vista"""
+    return f"{section}/{ALL_YEARS_LABEL if year is None else year}"
+
+def view_hash(code_hash: str, data_hashes: Dict[str, str], section: str,
+              year: Optional[int], regions: List[str]) -> str:
+    """Empremta de totes les entrades d'una vista"""
+    payload = json.dumps({
+        'code': code_hash,
+        'data': data_hashes,
+        'section': section,
+        'year': year,
+        'regions': regions,
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+# ==========================================
+# MANIFEST
+# ==========================================
+
+def load_manifest(output_dir: Path) -> Dict[str, Dict]:
+    """Llegeix el manifest d'una construcció anterior (buit si no n'hi ha)"""
+    path = output_dir / MANIFEST_FILE
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text(encoding='utf-8')).get('views', {})
+
+def save_manifest(output_dir: Path, views: Dict[str, Dict]) -> None:
+    """Desa el manifest amb l'empremta i els fitxers de cada vista"""
+    path = output_dir / MANIFEST_FILE
+    path.write_text(json.dumps({'views': views}, indent=2, sort_keys=True, ensure_ascii=False),
+                    encoding='utf-8')
+
+def is_view_current(output_dir: Path, entry: Optional[Dict], expected_hash: str) -> bool:
+    """Indica si una vista ja està generada amb les mateixes entrades"""
+    if not entry or entry.get('hash') != expected_hash:
+        return False
+    return all((output_dir / name).exists() for name in entry.get('files', []))
+
+# ==========================================
+# PAQUETS ESTÀTICS
+# ==========================================
+
+def write_view_bundle(output_dir: Path, section: str, title: str, year: Optional[int],
+                      regions: List[str], figures: List) -> List[str]:
+    """Escriu el paquet HTML i JSON d'una vista i retorna els fitxers relatius"""
+    vid = view_id(section, year)
+    html_path = output_dir / f"{vid}.html"
+    json_path = output_dir / f"{vid}.json"
+    html_path.parent.mkdir(parents=True, exist_ok=True)
+
+    figures_json = [fig.to_json() for fig in figures]
+    meta = {'section': section, 'title': title, 'year': year, 'regions': regions}
+    json_path.write_text(
+        json.dumps(meta, ensure_ascii=False)[:-1] + ',"figures":[' + ','.join(figures_json) + ']}',
+        encoding='utf-8'
+    )
+
+    year_label = 'tots els anys' if year is None else str(year)
+    divs = []
+    scripts = []
+    for i, fig_json in enumerate(figures_json):
+        # Evita que una cadena amb "</script>" tanqui el bloc de script
+        safe_json = fig_json.replace('</', '<\\/')
+        divs.append(f'<div id="fig-{i}" class="figure"></div>')
+        scripts.append(f'(function(f){{Plotly.newPlot("fig-{i}", f.data, f.layout, '
+                       f'{{responsive: true}});}})({safe_json});')
+    html_path.write_text(f"""<!DOCTYPE html>
+<html lang="ca">
+<head>
+<meta charset="utf-8">
+<title>{title} - {year_label}</title>
+<script src="{PLOTLY_CDN}"></script>
+<style>body {{ font-family: sans-serif; margin: 2rem; }} .figure {{ margin-bottom: 2rem; }}</style>
+</head>
+<body>
+<p><a href="../index.html">← Índex</a></p>
+<h1>{title}</h1>
+<p>Any: {year_label} · Blocs: {', '.join(regions)} · <a href="{json_path.name}">JSON</a></p>
+{chr(10).join(divs)}
+<script>
+{chr(10).join(scripts)}
+</script>
+</body>
+</html>
+""", encoding='utf-8')
+
+    return [f"{vid}.html", f"{vid}.json"]
+
+def write_index(output_dir: Path, views: Dict[str, Dict], titles: Dict[str, str]) -> None:
+    """Escriu la pàgina d'índex amb l'enllaç a cada vista generada"""
+    rows = []
+    for section, title in titles.items():
+        links = [
+            f'<a href="{vid}.html">{entry["year"] if entry["year"] is not None else "tots"}</a>'
+            for vid, entry in sorted(views.items()) if entry['section'] == section
+        ]
+        if links:
+            rows.append(f"<h2>{title}</h2>\n<p>{' · '.join(links)}</p>")
+
+    (output_dir / 'index.html').write_text(f"""<!DOCTYPE html>
+<html lang="ca">
+<head><meta charset="utf-8"><title>Panell Global - Autosuficiència Alimentària</title>
+<style>body {{ font-family: sans-serif; margin: 2rem; }}</style></head>
+<body>
+<h1>🌍 Panell Global - Autosuficiència Alimentària</h1>
+{chr(10).join(rows)}
+</body>
+</html>
+""", encoding='utf-8')
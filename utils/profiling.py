@@ -0,0 +1,158 @@
+"""
+Profiling - Instrumentació lleugera del temps de reexecució del panell
+Registra temps, files tocades i mida dels gràfics per secció i per gràfic
+"""
+
+import json
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+import streamlit as st
+
+# ==========================================
+# CONFIGURACIÓ
+# ==========================================
+
+# Activa el perfilat sense passar pel panell (benchmarks, producció)
+PROFILE_ENV = 'DASHBOARD_PROFILE'
+# Ruta del log JSONL; si no està definida no s'escriu cap log
+PERF_LOG_ENV = 'DASHBOARD_PERF_LOG'
+
+PANEL_STATE_KEY = 'perf_panel'
+LATEST_STATE_KEY = '_perf_latest'
+HISTORY_STATE_KEY = '_perf_history'
+MAX_HISTORY = 500
+
+# Registre de la secció en curs (cada sessió s'executa en el seu propi context)
+_current_record: ContextVar[Optional[Dict]] = ContextVar('_current_record', default=None)
+
+def is_profiling_enabled() -> bool:
+    """Indica si cal recollir mètriques en aquesta execució"""
+    if os.environ.get(PROFILE_ENV) == '1' or os.environ.get(PERF_LOG_ENV):
+        return True
+    try:
+        return bool(st.session_state.get(PANEL_STATE_KEY, False))
+    except Exception:
+        # Fora d'una sessió de Streamlit (scripts, CLI)
+        return False
+
+# ==========================================
+# REGISTRE DE MÈTRIQUES
+# ==========================================
+
+def _new_record(kind: str, name: str) -> Dict:
+    """Crea un registre buit de mètriques"""
+    return {
+        'timestamp': time.time(),
+        'kind': kind,
+        'name': name,
+        'wall_ms': 0.0,
+        'rows': 0,
+        'fig_bytes': 0,
+        'charts': []
+    }
+
+def _store_record(record: Dict) -> None:
+    """Desa el registre a session_state i, si escau, al log JSONL"""
+    try:
+        latest = st.session_state.setdefault(LATEST_STATE_KEY, {})
+        latest[record['name']] = record
+        history = st.session_state.setdefault(HISTORY_STATE_KEY, [])
+        history.append(record)
+        del history[:-MAX_HISTORY]
+    except Exception:
+        pass
+
+    log_path = os.environ.get(PERF_LOG_ENV)
+    if log_path:
+        append_jsonl(log_path, record)
+
+def append_jsonl(path: str, record: Dict) -> None:
+    """Afegeix un registre al final d'un fitxer JSONL"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record, ensure_ascii=False, default=float) + '\n')
+
+@contextmanager
+def profile_section(name: str, kind: str = 'section'):
+    """Mesura el temps de paret d'una secció i agrega les mètriques dels seus gràfics"""
+    if not is_profiling_enabled():
+        yield None
+        return
+
+    record = _new_record(kind, name)
+    token = _current_record.set(record)
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record['wall_ms'] = (time.perf_counter() - start) * 1000
+        _current_record.reset(token)
+        _store_record(record)
+
+def track_rows(*frames) -> None:
+    """Suma les files dels DataFrames indicats a la secció en curs"""
+    record = _current_record.get()
+    if record is None:
+        return
+    record['rows'] += sum(len(frame) for frame in frames if frame is not None)
+
+def _figure_points(fig) -> int:
+    """Compta els punts de dades de totes les traces d'una figura"""
+    points = 0
+    for trace in fig.data:
+        for attr in ('x', 'y', 'z', 'locations'):
+            values = getattr(trace, attr, None)
+            if values is not None:
+                points += len(values)
+                break
+    return points
+
+@contextmanager
+def profile_chart(fig):
+    """Mesura la serialització i enviament d'un gràfic Plotly dins la secció en curs"""
+    record = _current_record.get()
+    if record is None:
+        yield
+        return
+
+    fig_bytes = len(fig.to_json().encode('utf-8'))
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        chart = {
+            'title': fig.layout.title.text or '',
+            'wall_ms': (time.perf_counter() - start) * 1000,
+            'fig_bytes': fig_bytes,
+            'points': _figure_points(fig)
+        }
+        record['charts'].append(chart)
+        record['fig_bytes'] += fig_bytes
+
+# ==========================================
+# CONSULTA
+# ==========================================
+
+def get_latest_records() -> List[Dict]:
+    """Retorna l'últim registre de cada secció, ordenat per temps d'execució"""
+    latest = st.session_state.get(LATEST_STATE_KEY, {})
+    return sorted(latest.values(), key=lambda r: r['wall_ms'], reverse=True)
+
+def summarize_records(records: List[Dict]) -> List[Dict]:
+    """Resumeix els registres en files planes per mostrar en una taula"""
+    return [
+        {
+            'Secció': record['name'],
+            'Temps (ms)': round(record['wall_ms'], 1),
+            'Files': record['rows'],
+            'Gràfics': len(record['charts']),
+            'Payload (KB)': round(record['fig_bytes'] / 1024, 1)
+        }
+        for record in records
+    ]
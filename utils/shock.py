@@ -0,0 +1,153 @@
+"""
+Shock - Simulador de restriccions a l'exportació
+Propagació de la retallada d'exportacions d'uns països per la xarxa bilateral de comerç, amb reexportacions
+"""
+
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from utils.trade_matrix import TradeMatrixStore, supply_flows, _AREA_BITS, _ITEM_BITS
+
+# ==========================================
+# XARXA D'UN ANY
+# ==========================================
+
+def _year_network(store: TradeMatrixStore, year: int, items: Optional[Iterable[int]] = None) -> dict:
+    """
+    Fluxos importador ← proveïdor dels productes d'un any com un sol sistema per blocs.
+
+    Cada (producte, país) és un node `k * n_areas + posició`, de manera que
+    tots els productes es propaguen alhora amb les mateixes operacions.
+    """
+    keys, values = supply_flows(store, years=[year])
+    area_mask = (1 << _AREA_BITS) - 1
+    flow_items = (keys >> (2 * _AREA_BITS)) & ((1 << _ITEM_BITS) - 1)
+    item_codes = np.unique(flow_items) if items is None else np.intersect1d(np.unique(flow_items),
+                                                                            np.asarray(list(items)))
+    keep = np.isin(flow_items, item_codes)
+    offsets = np.searchsorted(item_codes, flow_items[keep]) * store.n_areas
+    return {
+        'item_codes': item_codes,
+        'importers': offsets + ((keys[keep] >> _AREA_BITS) & area_mask),
+        'suppliers': offsets + (keys[keep] & area_mask),
+        'values': values[keep],
+        'n_nodes': len(item_codes) * store.n_areas,
+    }
+
+def production_vector(production: pd.DataFrame, store: TradeMatrixStore, year: int,
+                      item_codes: np.ndarray, value_col: str = 'Production') -> np.ndarray:
+    """Producció de cada node (producte, país) de l'any; NaN on no n'hi ha dada"""
+    vector = np.full(len(item_codes) * store.n_areas, np.nan)
+    if production.empty:
+        return vector
+    rows = production[(production['Year'] == year) & production['ItemCode'].isin(item_codes)]
+    positions = store.area_positions(rows['AreaCode'].to_numpy())
+    known = positions >= 0
+    nodes = np.searchsorted(item_codes, rows['ItemCode'].to_numpy()[known]) * store.n_areas + positions[known]
+    vector[np.unique(nodes)] = 0.0
+    np.add.at(vector, nodes, rows[value_col].to_numpy(dtype=np.float64)[known])
+    return vector
+
+# ==========================================
+# SIMULACIÓ
+# ==========================================
+
+def simulate_export_ban(store: TradeMatrixStore, year: int, exporters: Iterable[int],
+                        cut: float = 0.5, items: Optional[Iterable[int]] = None,
+                        production: Optional[pd.DataFrame] = None, max_rounds: int = 10,
+                        tol: float = 1e-4) -> tuple:
+    """
+    Simula que els `exporters` (codis FAO) retallen un `cut` (0-1) de les exportacions dels `items`.
+
+    Ronda 0: cada importador perd `cut` del que li venien els països que
+    restringeixen. Rondes següents: un país que perd importacions retalla les
+    seves exportacions en la mateixa proporció en què exporta la seva
+    disponibilitat (P + I), i la pèrdua passa als seus clients:
+    L' = A · L amb A[j, i] = S[j, i] / (P_i + I_i). Les rondes s'aturen quan la
+    pèrdua nova és inferior a `tol` de la inicial. Tots els productes es
+    resolen alhora com una matriu per blocs.
+
+    Sense producció (o sense dada del país) la disponibilitat són només les
+    importacions i la fracció reexportada es limita a 1. Retorna la taula per
+    (producte, país) i el nombre de rondes fetes.
+    """
+    network = _year_network(store, year, items)
+    n_nodes = network['n_nodes']
+    importers, suppliers, values = network['importers'], network['suppliers'], network['values']
+
+    imports = np.bincount(importers, weights=values, minlength=n_nodes)
+    exports = np.bincount(suppliers, weights=values, minlength=n_nodes)
+    output = production_vector(production if production is not None else pd.DataFrame(),
+                               store, year, network['item_codes'])
+    availability = np.nan_to_num(output) + imports
+
+    banned = np.zeros(n_nodes, dtype=bool)
+    exporter_positions = store.area_positions(np.asarray(list(exporters), dtype=np.int64))
+    exporter_positions = exporter_positions[exporter_positions >= 0]
+    banned_nodes = (np.arange(len(network['item_codes']))[:, None] * store.n_areas
+                    + exporter_positions[None, :]).ravel()
+    banned[banned_nodes] = True
+    kept = 1 - cut * banned
+
+    # Ronda 0: retallada directa dels fluxos dels països que restringeixen
+    direct = np.bincount(importers, weights=values * cut * banned[suppliers], minlength=n_nodes)
+
+    # Fracció de la pèrdua d'i que passa a cada client j (exportacions restants / disponibilitat)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pass_through = np.where(availability[suppliers] > 0,
+                                values * kept[suppliers] / availability[suppliers], 0.0)
+    # Ningú no pot reexportar més del que perd
+    outflow = np.bincount(suppliers, weights=pass_through, minlength=n_nodes)
+    scale = np.where(outflow > 1, 1 / np.where(outflow > 0, outflow, 1), 1.0)
+    pass_through = pass_through * scale[suppliers]
+
+    shortfall, loss, rounds = direct.copy(), direct, 0
+    initial = direct.sum()
+    while rounds < max_rounds and initial > 0:
+        loss = np.bincount(importers, weights=pass_through * loss[suppliers], minlength=n_nodes)
+        shortfall += loss
+        rounds += 1
+        if loss.sum() < tol * initial:
+            break
+
+    passed_on = np.bincount(suppliers, weights=pass_through, minlength=n_nodes) * shortfall
+    export_cut = cut * exports * banned + passed_on
+    supply_before = np.nan_to_num(output) + imports - exports
+    supply_after = supply_before - shortfall + export_cut
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ssr_before = np.where(supply_before > 0, output / supply_before, np.nan)
+        ssr_after = np.where(supply_after > 0, output / supply_after, np.nan)
+        shortfall_share = np.where(imports > 0, shortfall / imports * 100, np.nan)
+        supply_change = np.where(supply_before > 0, (supply_after - supply_before) / supply_before * 100,
+                                 np.nan)
+
+    active = (imports > 0) | (exports > 0)
+    nodes = np.flatnonzero(active)
+    result = pd.DataFrame({
+        'ItemCode': network['item_codes'][nodes // store.n_areas],
+        'AreaCode': store.area_codes[nodes % store.n_areas],
+        'Production': output[nodes],
+        'Imports': imports[nodes],
+        'Exports': exports[nodes],
+        'Restricting': banned[nodes],
+        'DirectShortfall': direct[nodes],
+        'ImportShortfall': shortfall[nodes],
+        'ShortfallShare': shortfall_share[nodes],
+        'ExportCut': export_cut[nodes],
+        'SupplyChange': supply_change[nodes],
+        'SSRBefore': ssr_before[nodes],
+        'SSRAfter': ssr_after[nodes],
+    })
+    return result, rounds
+
+def summarize_shock(result: pd.DataFrame) -> pd.DataFrame:
+    """Impacte per país de tots els productes simulats (pèrdua sobre el total importat)"""
+    columns = ['Imports', 'Exports', 'DirectShortfall', 'ImportShortfall', 'ExportCut']
+    summary = result.groupby('AreaCode', as_index=False).agg(
+        **{col: (col, 'sum') for col in columns}, Restricting=('Restricting', 'any'))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        summary['ShortfallShare'] = np.where(summary['Imports'] > 0,
+                                             summary['ImportShortfall'] / summary['Imports'] * 100, np.nan)
+    return summary.sort_values('ImportShortfall', ascending=False).reset_index(drop=True)
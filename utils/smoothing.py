@@ -0,0 +1,118 @@
+"""
+Smoothing - Suavitzat de sèries temporals país × any
+Mitjana mòbil, mediana mòbil i mitjana exponencial de tots els països alhora, amb gestió de buits
+"""
+
+import warnings
+from typing import List, Optional
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from utils.panel import IndicatorPanel
+
+SMOOTHING_METHODS = ['mean', 'median', 'ewm']
+
+def _window_bounds(window: int, center: bool) -> tuple:
+    """Anys abans i després de cada posició que entren a la finestra"""
+    before = window // 2 if center else window - 1
+    return before, window - 1 - before
+
+def rolling_mean(matrix: np.ndarray, window: int, min_periods: int = 1,
+                 center: bool = False) -> np.ndarray:
+    """
+    Mitjana mòbil de cada fila (país) d'una matriu països × anys.
+
+    Les sumes i els recomptes de cada finestra surten de sumes acumulades, de
+    manera que el cost no depèn de la mida de la finestra. Els NaN (anys sense
+    dada) no compten; les finestres amb menys de `min_periods` valors donen NaN.
+    """
+    values = matrix.astype(np.float64)
+    valid = ~np.isnan(values)
+    n_years = values.shape[1]
+    before, after = _window_bounds(window, center)
+
+    zeros = np.zeros((values.shape[0], 1))
+    cum_sum = np.concatenate([zeros, np.cumsum(np.where(valid, values, 0.0), axis=1)], axis=1)
+    cum_count = np.concatenate([zeros, np.cumsum(valid, axis=1)], axis=1)
+    positions = np.arange(n_years)
+    start = np.clip(positions - before, 0, n_years)
+    end = np.clip(positions + after + 1, 0, n_years)
+
+    sums = cum_sum[:, end] - cum_sum[:, start]
+    counts = cum_count[:, end] - cum_count[:, start]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(counts >= min_periods, sums / counts, np.nan)
+
+def rolling_median(matrix: np.ndarray, window: int, min_periods: int = 1,
+                   center: bool = False) -> np.ndarray:
+    """Mediana mòbil de cada fila sobre una vista de finestres (sense copiar la matriu per finestra)"""
+    values = matrix.astype(np.float64)
+    before, after = _window_bounds(window, center)
+    padded = np.pad(values, ((0, 0), (before, after)), constant_values=np.nan)
+    windows = sliding_window_view(padded, window, axis=1)
+
+    counts = np.sum(~np.isnan(windows), axis=-1)
+    # Les finestres sense cap dada donen NaN (i un avís "All-NaN slice")
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        medians = np.nanmedian(windows, axis=-1)
+    return np.where(counts >= min_periods, medians, np.nan)
+
+def ewm_mean(matrix: np.ndarray, span: int, min_periods: int = 1) -> np.ndarray:
+    """
+    Mitjana mòbil exponencial de cada fila (com pandas ewm(span, adjust=True)).
+
+    L'any es recorre una sola vegada i cada pas actualitza tots els països
+    alhora. Els anys sense dada no aporten valor però el pes dels anteriors
+    continua decaient; fins a tenir `min_periods` valors el resultat és NaN.
+    """
+    values = matrix.astype(np.float64)
+    decay = 1 - 2 / (span + 1)
+    numerator = np.zeros(values.shape[0])
+    denominator = np.zeros(values.shape[0])
+    seen = np.zeros(values.shape[0])
+    result = np.full(values.shape, np.nan)
+
+    for year in range(values.shape[1]):
+        column = values[:, year]
+        valid = ~np.isnan(column)
+        numerator = decay * numerator + np.where(valid, column, 0.0)
+        denominator = decay * denominator + valid
+        seen += valid
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result[:, year] = np.where(seen >= min_periods, numerator / denominator, np.nan)
+    return result
+
+def smooth_matrix(matrix: np.ndarray, method: str, window: int, min_periods: int = 1,
+                  center: bool = True) -> np.ndarray:
+    """Aplica un mètode de SMOOTHING_METHODS ('ewm' fa servir `window` com a span i mai es centra)"""
+    if method == 'mean':
+        return rolling_mean(matrix, window, min_periods, center)
+    if method == 'median':
+        return rolling_median(matrix, window, min_periods, center)
+    if method == 'ewm':
+        return ewm_mean(matrix, window, min_periods)
+    raise ValueError(f"Mètode de suavitzat desconegut: {method}")
+
+def smooth_panel(panel: IndicatorPanel, method: str, window: int,
+                 indicators: Optional[List[str]] = None, min_periods: int = 1,
+                 center: bool = True) -> IndicatorPanel:
+    """
+    Retorna un panell amb les sèries de cada país suavitzades.
+
+    Els anys sense dada originals continuen sent NaN: el suavitzat no
+    inventa valors als buits ni fora del període de cada país. Les cel·les de
+    farciment (panel.filler_mask) no entren a cap finestra i es queden amb el
+    valor de farciment, de manera que no arrosseguen els darrers anys reals.
+    """
+    indicators = indicators or panel.indicators
+    matrices = {}
+    for indicator in indicators:
+        original = panel.matrix(indicator)
+        filler = panel.filler_mask(indicator)
+        smoothed = smooth_matrix(np.where(filler, np.nan, original), method, window,
+                                 min_periods, center)
+        smoothed = np.where(filler, original, smoothed)
+        matrices[indicator] = np.where(np.isnan(original), np.nan, smoothed).astype(np.float32)
+    return panel.derive(matrices)
@@ -0,0 +1,422 @@
+"""
+Trade Matrix - Matrius bilaterals de comerç (FAOSTAT TM) en format dispers
+Matrius país declarant × país soci per (any, producte) en CSR, amb els països indexats per enter
+"""
+
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from utils.items import is_aggregate_area
+
+# Columnes del CSV normalitzat de la matriu de comerç de FAOSTAT -> nom intern
+TM_COLUMNS = {
+    'Reporter Country Code': 'Reporter',
+    'Partner Country Code': 'Partner',
+    'Item Code': 'ItemCode',
+    'Element': 'Element',
+    'Year': 'Year',
+    'Value': 'Value',
+}
+# Elements de quantitat: 'import' el declara l'importador, 'export' l'exportador
+TRADE_ELEMENTS = {'Import Quantity': 'import', 'Export Quantity': 'export'}
+ELEMENT_CODES = {'import': 0, 'export': 1}
+DEFAULT_TM_CHUNK_SIZE = 1_000_000
+
+# Clau entera de cada flux: element (1 bit) | any - 1900 (8) | producte (16) | declarant (16) | soci (16)
+_YEAR_BASE = 1900
+_AREA_BITS = 16
+_ITEM_BITS = 16
+_YEAR_BITS = 8
+_BLOCK_SHIFT = 2 * _AREA_BITS
+
+# ==========================================
+# MATRIU CSR
+# ==========================================
+
+class CSRMatrix:
+    """
+    Matriu dispersa en format CSR (files comprimides).
+
+    Les files i les columnes són posicions de país del TradeMatrixStore
+    (`area_codes`); `indptr[i]:indptr[i + 1]` és el tram de valors de la fila i.
+    """
+
+    def __init__(self, indptr: np.ndarray, indices: np.ndarray, data: np.ndarray, shape: tuple):
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.shape = shape
+
+    @classmethod
+    def from_coo(cls, rows: np.ndarray, cols: np.ndarray, values: np.ndarray,
+                 shape: tuple) -> 'CSRMatrix':
+        """Construeix la matriu a partir de triplets (fila, columna, valor); els repetits se sumen"""
+        keys = rows.astype(np.int64) * shape[1] + cols
+        order = np.argsort(keys, kind='stable')
+        keys, values = keys[order], values[order]
+        if len(keys):
+            starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+            keys, values = keys[starts], np.add.reduceat(values, starts)
+        rows, cols = keys // shape[1], keys % shape[1]
+        indptr = np.concatenate([[0], np.cumsum(np.bincount(rows, minlength=shape[0]))])
+        return cls(indptr, cols.astype(np.int32), values, shape)
+
+    @property
+    def nnz(self) -> int:
+        """Nombre de valors no nuls"""
+        return len(self.data)
+
+    def row_ids(self) -> np.ndarray:
+        """Fila de cada valor emmagatzemat"""
+        return np.repeat(np.arange(self.shape[0]), np.diff(self.indptr))
+
+    def row_sums(self) -> np.ndarray:
+        """Suma de cada fila"""
+        return np.bincount(self.row_ids(), weights=self.data, minlength=self.shape[0])
+
+    def col_sums(self) -> np.ndarray:
+        """Suma de cada columna"""
+        return np.bincount(self.indices, weights=self.data, minlength=self.shape[1])
+
+    def matvec(self, x: np.ndarray) -> np.ndarray:
+        """Producte matriu × vector"""
+        return np.bincount(self.row_ids(), weights=self.data * x[self.indices], minlength=self.shape[0])
+
+    def rmatvec(self, x: np.ndarray) -> np.ndarray:
+        """Producte vector × matriu (la transposada per el vector)"""
+        return np.bincount(self.indices, weights=self.data * x[self.row_ids()], minlength=self.shape[1])
+
+    def transpose(self) -> 'CSRMatrix':
+        """Matriu transposada (també en CSR)"""
+        return CSRMatrix.from_coo(self.indices, self.row_ids(), self.data, self.shape[::-1])
+
+    def to_dense(self) -> np.ndarray:
+        """Matriu densa (només per a matrius petites)"""
+        dense = np.zeros(self.shape)
+        dense[self.row_ids(), self.indices] = self.data
+        return dense
+
+    def to_scipy(self):
+        """Equivalent scipy.sparse.csr_matrix (requereix scipy)"""
+        from scipy.sparse import csr_matrix
+        return csr_matrix((self.data, self.indices, self.indptr), shape=self.shape)
+
+# ==========================================
+# MAGATZEM DE MATRIUS
+# ==========================================
+
+def _encode_flow_keys(elements: np.ndarray, years: np.ndarray, items: np.ndarray,
+                      reporters: np.ndarray, partners: np.ndarray) -> np.ndarray:
+    """Empaqueta cada flux en un int64 que ordena per element, any, producte, declarant i soci"""
+    key = elements.astype(np.int64)
+    for values, bits in ((years - _YEAR_BASE, _YEAR_BITS), (items, _ITEM_BITS),
+                         (reporters, _AREA_BITS), (partners, _AREA_BITS)):
+        if len(values) and (values.min() < 0 or values.max() >= 1 << bits):
+            raise ValueError("Codi fora del rang de la clau de la matriu de comerç")
+        key = (key << bits) | values.astype(np.int64)
+    return key
+
+class TradeMatrixStore:
+    """
+    Totes les matrius bilaterals de comerç en uns pocs vectors compactes.
+
+    Els fluxos s'ordenen per (element, any, producte, declarant, soci): cada
+    (any, producte, element) és un tram contigu (`block_ptr`) amb les files i
+    columnes com a posicions de país (int16) i els valors en float32. Una
+    matriu CSR es construeix en O(fluxos del tram) amb cerca binària del tram.
+    """
+
+    def __init__(self, area_codes: np.ndarray, block_elements: np.ndarray, block_years: np.ndarray,
+                 block_items: np.ndarray, block_ptr: np.ndarray, rows: np.ndarray,
+                 cols: np.ndarray, values: np.ndarray):
+        self.area_codes = area_codes
+        self.block_elements = block_elements
+        self.block_years = block_years
+        self.block_items = block_items
+        self.block_ptr = block_ptr
+        self.rows = rows
+        self.cols = cols
+        self.values = values
+        # Clau de tram (element, any, producte) ordenada, per a la cerca binària
+        self._block_keys = ((block_elements.astype(np.int64) << (_YEAR_BITS + _ITEM_BITS))
+                            | ((block_years.astype(np.int64) - _YEAR_BASE) << _ITEM_BITS)
+                            | block_items.astype(np.int64))
+
+    # ==========================================
+    # CONSTRUCCIÓ
+    # ==========================================
+
+    @classmethod
+    def from_keys(cls, keys: np.ndarray, values: np.ndarray) -> 'TradeMatrixStore':
+        """Construeix el magatzem a partir de claus de flux (_encode_flow_keys) i valors"""
+        order = np.argsort(keys, kind='stable')
+        keys, values = keys[order], values[order].astype(np.float64)
+        if len(keys):
+            # Un mateix flux pot aparèixer més d'una vegada: se sumen
+            starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+            keys, values = keys[starts], np.add.reduceat(values, starts)
+
+        area_mask = (1 << _AREA_BITS) - 1
+        reporters = (keys >> _AREA_BITS) & area_mask
+        partners = keys & area_mask
+        area_codes = np.unique(np.concatenate([reporters, partners])).astype(np.int32)
+
+        block_keys = keys >> _BLOCK_SHIFT
+        starts = np.flatnonzero(np.r_[True, block_keys[1:] != block_keys[:-1]]) if len(keys) else np.empty(0, dtype=np.int64)
+        block_keys = block_keys[starts]
+        return cls(
+            area_codes=area_codes,
+            block_elements=(block_keys >> (_YEAR_BITS + _ITEM_BITS)).astype(np.int8),
+            block_years=(((block_keys >> _ITEM_BITS) & ((1 << _YEAR_BITS) - 1)) + _YEAR_BASE).astype(np.int16),
+            block_items=(block_keys & ((1 << _ITEM_BITS) - 1)).astype(np.int32),
+            block_ptr=np.append(starts, len(keys)).astype(np.int64),
+            rows=np.searchsorted(area_codes, reporters).astype(np.int16),
+            cols=np.searchsorted(area_codes, partners).astype(np.int16),
+            values=values.astype(np.float32),
+        )
+
+    @staticmethod
+    def encode_chunk(chunk: pd.DataFrame) -> tuple:
+        """
+        Claus i valors dels fluxos de quantitat d'un bloc del CSV de FAOSTAT.
+
+        Es descarten els altres elements (valors monetaris), els valors buits
+        o no positius, el comerç amb un mateix i els agregats (is_aggregate_area).
+        """
+        chunk = chunk.rename(columns=TM_COLUMNS)
+        elements = chunk['Element'].map(TRADE_ELEMENTS).map(ELEMENT_CODES)
+        values = pd.to_numeric(chunk['Value'], errors='coerce').to_numpy(dtype=np.float64)
+        reporters = chunk['Reporter'].to_numpy()
+        partners = chunk['Partner'].to_numpy()
+        keep = (elements.notna().to_numpy() & (values > 0) & (reporters != partners)
+                & ~is_aggregate_area(reporters) & ~is_aggregate_area(partners))
+        keys = _encode_flow_keys(elements.to_numpy()[keep].astype(np.int64),
+                                 chunk['Year'].to_numpy()[keep], chunk['ItemCode'].to_numpy()[keep],
+                                 reporters[keep], partners[keep])
+        return keys, values[keep].astype(np.float32)
+
+    @classmethod
+    def from_chunks(cls, chunks: Iterable[pd.DataFrame]) -> 'TradeMatrixStore':
+        """Ingesta per blocs: de cada bloc només es guarden la clau int64 i el valor float32"""
+        encoded = [cls.encode_chunk(chunk) for chunk in chunks]
+        if not encoded:
+            return cls.from_keys(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32))
+        return cls.from_keys(np.concatenate([keys for keys, _ in encoded]),
+                             np.concatenate([values for _, values in encoded]))
+
+    @classmethod
+    def from_csv(cls, path: str, chunk_size: int = DEFAULT_TM_CHUNK_SIZE,
+                 encoding: str = 'latin-1') -> 'TradeMatrixStore':
+        """Llegeix el CSV normalitzat de la matriu de comerç de FAOSTAT (o .zip/.gz) per blocs"""
+        dtypes = {'Reporter Country Code': 'int32', 'Partner Country Code': 'int32',
+                  'Item Code': 'int32', 'Element': 'category', 'Year': 'int16', 'Value': 'float64'}
+        with pd.read_csv(path, usecols=list(TM_COLUMNS), dtype=dtypes, chunksize=chunk_size,
+                         encoding=encoding) as reader:
+            return cls.from_chunks(reader)
+
+    def save(self, path: str):
+        """Desa el magatzem en un .npz comprimit"""
+        np.savez_compressed(path, area_codes=self.area_codes, block_elements=self.block_elements,
+                            block_years=self.block_years, block_items=self.block_items,
+                            block_ptr=self.block_ptr, rows=self.rows, cols=self.cols,
+                            values=self.values)
+
+    @classmethod
+    def load(cls, path: str) -> 'TradeMatrixStore':
+        """Carrega un magatzem desat amb save()"""
+        with np.load(path) as arrays:
+            return cls(**{name: arrays[name] for name in arrays.files})
+
+    # ==========================================
+    # CONSULTA
+    # ==========================================
+
+    @property
+    def n_areas(self) -> int:
+        """Nombre de països (files i columnes de cada matriu)"""
+        return len(self.area_codes)
+
+    @property
+    def nnz(self) -> int:
+        """Nombre total de fluxos bilaterals"""
+        return len(self.values)
+
+    @property
+    def years(self) -> np.ndarray:
+        """Anys amb dades"""
+        return np.unique(self.block_years)
+
+    def items(self, year: Optional[int] = None) -> np.ndarray:
+        """Codis de producte amb dades (de l'any indicat, si n'hi ha)"""
+        mask = self.block_years == year if year is not None else slice(None)
+        return np.unique(self.block_items[mask])
+
+    def area_positions(self, area_codes: np.ndarray) -> np.ndarray:
+        """Posició de cada codi FAO a les matrius (-1 si no hi és)"""
+        area_codes = np.asarray(area_codes)
+        if self.n_areas == 0:
+            return np.full(area_codes.shape, -1)
+        positions = np.clip(np.searchsorted(self.area_codes, area_codes), 0, self.n_areas - 1)
+        return np.where(self.area_codes[positions] == area_codes, positions, -1)
+
+    def block_slice(self, year: int, item: int, element: str = 'import') -> slice:
+        """Tram de fluxos d'un (any, producte, element); buit si no n'hi ha"""
+        key = ((ELEMENT_CODES[element] << (_YEAR_BITS + _ITEM_BITS))
+               | ((int(year) - _YEAR_BASE) << _ITEM_BITS) | int(item))
+        position = np.searchsorted(self._block_keys, key)
+        if position == len(self._block_keys) or self._block_keys[position] != key:
+            return slice(0, 0)
+        return slice(int(self.block_ptr[position]), int(self.block_ptr[position + 1]))
+
+    def matrix(self, year: int, item: int, element: str = 'import') -> CSRMatrix:
+        """
+        Matriu declarant × soci d'un (any, producte, element).
+
+        Amb 'import' les files són els importadors i les columnes els seus
+        proveïdors; amb 'export', les files són els exportadors i les columnes
+        els seus clients.
+        """
+        block = self.block_slice(year, item, element)
+        rows = self.rows[block].astype(np.int64)
+        counts = np.bincount(rows, minlength=self.n_areas)
+        indptr = np.concatenate([[0], np.cumsum(counts)])
+        return CSRMatrix(indptr, self.cols[block].astype(np.int32),
+                         self.values[block].astype(np.float64), (self.n_areas, self.n_areas))
+
+    def supply_matrix(self, year: int, item: int) -> CSRMatrix:
+        """
+        Matriu importador × proveïdor d'un (any, producte), amb dades mirall.
+
+        Es fan servir les importacions declarades per cada importador; per als
+        països que no declaren importacions del producte s'usen les
+        exportacions que els declaren els seus proveïdors.
+        """
+        imports = self.block_slice(year, item, 'import')
+        exports = self.block_slice(year, item, 'export')
+        import_rows = self.rows[imports].astype(np.int64)
+        reporting = np.zeros(self.n_areas, dtype=bool)
+        reporting[import_rows] = True
+        # Exportacions declarades (exportador, importador) cap a importadors que no declaren
+        mirror = ~reporting[self.cols[exports]]
+        rows = np.concatenate([import_rows, self.cols[exports][mirror]])
+        cols = np.concatenate([self.cols[imports], self.rows[exports][mirror]]).astype(np.int64)
+        values = np.concatenate([self.values[imports], self.values[exports][mirror]]).astype(np.float64)
+        return CSRMatrix.from_coo(rows, cols, values, (self.n_areas, self.n_areas))
+
+    def flows(self, year: int, item: int, area_names: Optional[Dict[int, str]] = None) -> pd.DataFrame:
+        """Fluxos proveïdor → importador d'un (any, producte) en format llarg, de més gran a més petit"""
+        supply = self.supply_matrix(year, item)
+        frame = pd.DataFrame({
+            'Importer': self.area_codes[supply.row_ids()],
+            'Supplier': self.area_codes[supply.indices],
+            'Quantity': supply.data,
+        })
+        if area_names is not None:
+            frame['ImporterName'] = frame['Importer'].map(area_names)
+            frame['SupplierName'] = frame['Supplier'].map(area_names)
+        return frame.sort_values('Quantity', ascending=False).reset_index(drop=True)
+
+    def summary(self) -> pd.DataFrame:
+        """Fluxos per any i element"""
+        sizes = np.diff(self.block_ptr)
+        elements = np.array(list(ELEMENT_CODES))[self.block_elements]
+        frame = pd.DataFrame({'Year': self.block_years, 'Element': elements, 'Flows': sizes,
+                              'Items': 1})
+        return frame.groupby(['Year', 'Element'], as_index=False).sum()
+
+# ==========================================
+# CONCENTRACIÓ DE PROVEÏDORS
+# ==========================================
+
+def supply_flows(store: TradeMatrixStore, mirror: bool = True,
+                 years: Optional[Iterable[int]] = None) -> tuple:
+    """
+    Fluxos proveïdor → importador de tots els anys (o dels `years`) i productes, ordenats.
+
+    Retorna (claus, valors): la clau empaqueta any, producte, importador i
+    proveïdor (posicions de país), de manera que cada (any, producte,
+    importador) és un tram contigu. Amb `mirror` s'hi afegeixen les
+    exportacions declarades cap als importadors que no declaren el producte.
+    """
+    blocks = np.arange(len(store.block_ptr) - 1)
+    if years is not None:
+        blocks = blocks[np.isin(store.block_years, list(years))]
+    # Índex dels fluxos dels trams seleccionats (concatenació d'intervals sense bucle)
+    lengths = store.block_ptr[blocks + 1] - store.block_ptr[blocks]
+    block_ids = np.repeat(blocks, lengths)
+    flows = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths) \
+        + np.repeat(store.block_ptr[blocks], lengths)
+
+    prefix = (((store.block_years.astype(np.int64) - _YEAR_BASE) << _ITEM_BITS)
+              | store.block_items.astype(np.int64))[block_ids] << (2 * _AREA_BITS)
+    is_import = store.block_elements[block_ids] == ELEMENT_CODES['import']
+    rows, cols = store.rows[flows].astype(np.int64), store.cols[flows].astype(np.int64)
+    flow_values = store.values[flows]
+
+    # Importacions: (importador, proveïdor) = (declarant, soci); exportacions a l'inrevés
+    import_keys = (prefix | (rows << _AREA_BITS) | cols)[is_import]
+    keys, values = [import_keys], [flow_values[is_import]]
+    if mirror:
+        export_keys = (prefix | (cols << _AREA_BITS) | rows)[~is_import]
+        reported = np.unique(import_keys >> _AREA_BITS)
+        position = np.clip(np.searchsorted(reported, export_keys >> _AREA_BITS), 0, max(len(reported) - 1, 0))
+        missing = (reported[position] != (export_keys >> _AREA_BITS)) if len(reported) else np.ones(len(export_keys), dtype=bool)
+        keys.append(export_keys[missing])
+        values.append(flow_values[~is_import][missing])
+
+    keys, values = np.concatenate(keys), np.concatenate(values).astype(np.float64)
+    order = np.argsort(keys, kind='stable')
+    return keys[order], values[order]
+
+def calculate_supplier_concentration(store: TradeMatrixStore, mirror: bool = True) -> pd.DataFrame:
+    """
+    Dependència de proveïdors de cada (importador, producte, any).
+
+    Totes les mètriques són reduccions per trams sobre els fluxos ordenats
+    (np.*.reduceat), sense bucles per any ni per país: HHI (0-10000, com a
+    calculate_diversity_table), quota del principal proveïdor (%), nombre
+    efectiu de proveïdors (1 / Σ quota²) i nombre de proveïdors.
+    """
+    columns = ['Year', 'ItemCode', 'AreaCode', 'ImportQuantity', 'NSuppliers', 'HHI',
+               'TopSupplierShare', 'TopSupplier', 'EffectiveSuppliers']
+    keys, values = supply_flows(store, mirror)
+    if not len(keys):
+        return pd.DataFrame(columns=columns)
+
+    segments = keys >> _AREA_BITS
+    starts = np.flatnonzero(np.r_[True, segments[1:] != segments[:-1]])
+    segment_ids = np.cumsum(np.r_[False, segments[1:] != segments[:-1]])
+    totals = np.add.reduceat(values, starts)
+    shares = values / totals[segment_ids]
+    concentration = np.add.reduceat(shares ** 2, starts)
+    top_values = np.maximum.reduceat(values, starts)
+    # Primer flux de cada tram amb el valor màxim
+    positions = np.where(values == top_values[segment_ids], np.arange(len(values)), len(values))
+    top_positions = np.minimum.reduceat(positions, starts)
+
+    area_mask = (1 << _AREA_BITS) - 1
+    segment_keys = segments[starts]
+    return pd.DataFrame({
+        'Year': ((segment_keys >> (_ITEM_BITS + _AREA_BITS)) + _YEAR_BASE).astype(np.int16),
+        'ItemCode': ((segment_keys >> _AREA_BITS) & ((1 << _ITEM_BITS) - 1)).astype(np.int32),
+        'AreaCode': store.area_codes[segment_keys & area_mask],
+        'ImportQuantity': totals,
+        'NSuppliers': np.diff(np.append(starts, len(values))),
+        'HHI': concentration * 10000,
+        'TopSupplierShare': top_values / totals * 100,
+        'TopSupplier': store.area_codes[keys[top_positions] & area_mask],
+        'EffectiveSuppliers': 1 / concentration,
+    }, columns=columns).astype({'HHI': np.float32, 'TopSupplierShare': np.float32,
+                                'EffectiveSuppliers': np.float32})
+
+def summarize_supplier_concentration(concentration: pd.DataFrame) -> pd.DataFrame:
+    """Mitjanes per (any, importador) de tots els productes, ponderades per la quantitat importada"""
+    metrics = ['HHI', 'TopSupplierShare', 'EffectiveSuppliers']
+    weighted = concentration[metrics].mul(concentration['ImportQuantity'], axis=0)
+    weighted[['Year', 'AreaCode', 'ImportQuantity']] = concentration[['Year', 'AreaCode', 'ImportQuantity']]
+    weighted['NItems'] = 1
+    summary = weighted.groupby(['Year', 'AreaCode'], as_index=False).sum()
+    summary[metrics] = summary[metrics].div(summary['ImportQuantity'], axis=0)
+    return summary[['Year', 'AreaCode', 'ImportQuantity', 'NItems'] + metrics]